@@ -0,0 +1,7 @@
+"""
+Benchmarks offline de los grafos del tutorial.
+
+- offline_model: Chat model determinista con latencia simulada
+- scenarios: Un escenario (grafo + entradas) por solución y grafo de Studio
+- run: Runner que mide cada escenario y escribe un reporte JSON
+"""
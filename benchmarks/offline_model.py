@@ -0,0 +1,228 @@
+"""
+Offline Chat Model
+
+Chat model determinista para ejecutar los grafos sin red ni API keys:
+
+- Las respuestas dependen solo del prompt: mismas entradas, mismas
+  llamadas, mismos tokens y mismo camino por el grafo en cada ejecución.
+- ``rules`` son pares (regex, respuesta) que se prueban contra el
+  último mensaje; sirven para que los nodos de routing que parsean el
+  texto del modelo sigan un camino realista.
+- ``with_structured_output`` y ``bind_tools`` funcionan: los argumentos
+  se generan a partir del JSON schema (primer valor de cada enum, listas
+  de ``list_length`` elementos, strings únicos por campo).
+- Con herramientas sin ``tool_choice`` el modelo llama a la primera
+  herramienta una vez por turno humano y después responde con texto, así
+  que los loops agente → tools terminan.
+- La latencia se simula con ``latency_ms`` por llamada más
+  ``ms_per_token`` por token de salida.
+- ``usage_metadata`` reporta tokens aproximados, que GraphMetrics
+  atribuye a cada nodo.
+
+Ejemplo:
+    >>> restore = patch_chat_models(latency_ms=20)
+    >>> from solution import build_graph   # ChatOpenAI(...) → OfflineChatModel
+    >>> restore()
+"""
+
+import json
+import re
+import time
+from typing import Optional, Dict, Any, List, Callable, Sequence, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from utils.context_window import approximate_token_count
+
+
+_FILLER = (
+    "Respuesta offline determinista con el contenido relevante para la consulta, "
+    "los puntos clave identificados y una recomendación concreta para el usuario."
+)
+
+
+def _resolve(schema: Dict[str, Any], root: Dict[str, Any]) -> Dict[str, Any]:
+    ref = schema.get("$ref")
+    if not ref:
+        return schema
+    node: Any = root
+    for part in ref.lstrip("#/").split("/"):
+        node = node[part]
+    return _resolve(node, root)
+
+
+def sample_from_schema(schema: Dict[str, Any], name: str = "value", list_length: int = 2, root: Optional[Dict[str, Any]] = None) -> Any:
+    """Valor determinista que valida contra un JSON schema."""
+    root = root if root is not None else schema
+    schema = _resolve(schema, root)
+
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [o for o in schema[key] if _resolve(o, root).get("type") != "null"]
+            return sample_from_schema(options[0] if options else schema[key][0], name, list_length, root)
+    if "default" in schema and schema["default"] is not None:
+        return schema["default"]
+
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "string")
+
+    if kind == "object":
+        properties = schema.get("properties", {})
+        return {
+            field: sample_from_schema(subschema, field, list_length, root)
+            for field, subschema in properties.items()
+        }
+    if kind == "array":
+        length = max(schema.get("minItems", 0), min(list_length, schema.get("maxItems", list_length)))
+        items = schema.get("items", {})
+        return [sample_from_schema(items, f"{name}-{i + 1}", list_length, root) for i in range(length)]
+    if kind == "integer":
+        return int(schema.get("minimum", schema.get("exclusiveMinimum", -1) + 1))
+    if kind == "number":
+        return float(schema.get("minimum", 0.5))
+    if kind == "boolean":
+        return False
+    return name
+
+
+class OfflineChatModel(BaseChatModel):
+    """Chat model determinista y sin red (ver el docstring del módulo)."""
+
+    model_name: str = "offline"
+    latency_ms: float = 0.0
+    ms_per_token: float = 0.0
+    response_words: int = 40
+    list_length: int = 2
+    rules: Sequence[Tuple[str, str]] = ()
+
+    def __init__(self, **kwargs: Any):
+        # Acepta los argumentos de ChatOpenAI/ChatAnthropic (temperature, api_key, ...)
+        if "model" in kwargs and "model_name" not in kwargs:
+            kwargs["model_name"] = kwargs["model"]
+        super().__init__(**{k: v for k, v in kwargs.items() if k in type(self).model_fields})
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Respuestas
+    # ------------------------------------------------------------------
+
+    def _text_response(self, messages: List[BaseMessage]) -> str:
+        last = str(messages[-1].content) if messages else ""
+        for pattern, reply in self.rules:
+            if re.search(pattern, last, re.IGNORECASE | re.DOTALL):
+                return reply
+        words = _FILLER.split()
+        return " ".join(words[i % len(words)] for i in range(self.response_words))
+
+    def _tool_call(self, tools: List[Dict[str, Any]], tool_choice: Any, messages: List[BaseMessage]) -> Optional[Dict[str, Any]]:
+        if not tools:
+            return None
+
+        forced = tool_choice not in (None, "auto", "none")
+        if not forced:
+            # Una llamada por turno humano: si ya hay un ToolMessage después del
+            # último HumanMessage, el agente responde con texto
+            for message in reversed(messages):
+                if isinstance(message, ToolMessage):
+                    return None
+                if isinstance(message, HumanMessage):
+                    break
+
+        name = None
+        if isinstance(tool_choice, str) and tool_choice not in ("auto", "any", "required", "none"):
+            name = tool_choice
+        elif isinstance(tool_choice, dict):
+            name = tool_choice.get("function", {}).get("name") or tool_choice.get("name")
+        function = next((t["function"] for t in tools if t["function"]["name"] == name), tools[0]["function"])
+
+        parameters = function.get("parameters", {})
+        return {
+            "name": function["name"],
+            "args": sample_from_schema(parameters, function["name"], self.list_length),
+            "id": f"call_{function['name']}_{len(messages)}",
+            "type": "tool_call",
+        }
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> ChatResult:
+        tool_call = self._tool_call(kwargs.get("tools") or [], kwargs.get("tool_choice"), messages)
+        if tool_call is not None:
+            message = AIMessage(content="", tool_calls=[tool_call])
+            output_text = json.dumps(tool_call["args"], ensure_ascii=False)
+        else:
+            output_text = self._text_response(messages)
+            message = AIMessage(content=output_text)
+
+        input_tokens = sum(approximate_token_count(str(m.content)) for m in messages)
+        output_tokens = approximate_token_count(output_text)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        message.response_metadata = {"model_name": self.model_name, "finish_reason": "stop"}
+
+        delay = self.latency_ms + self.ms_per_token * output_tokens
+        if delay:
+            time.sleep(delay / 1000)
+
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def patch_chat_models(**settings: Any) -> Callable[[], None]:
+    """
+    Sustituye ChatOpenAI y ChatAnthropic por OfflineChatModel.
+
+    Debe llamarse antes de importar los módulos de los grafos, que crean
+    el modelo al importarse (``llm = ChatOpenAI(...)``).
+
+    Args:
+        **settings: Campos de OfflineChatModel (latency_ms, rules, ...)
+
+    Returns:
+        Función que restaura las clases originales
+    """
+    import langchain_openai
+    import langchain_anthropic
+    from utils import llm_config
+
+    def factory(**kwargs: Any) -> OfflineChatModel:
+        return OfflineChatModel(**{**kwargs, **settings})
+
+    originals = [
+        (langchain_openai, "ChatOpenAI", langchain_openai.ChatOpenAI),
+        (langchain_anthropic, "ChatAnthropic", langchain_anthropic.ChatAnthropic),
+        (llm_config, "ChatOpenAI", llm_config.ChatOpenAI),
+        (llm_config, "ChatAnthropic", llm_config.ChatAnthropic),
+    ]
+    for module, name, _ in originals:
+        setattr(module, name, factory)
+
+    def restore():
+        for module, name, original in originals:
+            setattr(module, name, original)
+
+    return restore
@@ -0,0 +1,294 @@
+"""
+Benchmark Runner
+
+Ejecuta cada escenario de benchmarks.scenarios con el modelo offline y
+escribe un reporte JSON con, por grafo:
+
+- runs_per_sec y latencia por ejecución (mean/p50/p95)
+- latencia por nodo (GraphMetrics de utils.logging_config)
+- llamadas al LLM y tokens por invocación
+- peak RSS del proceso
+
+Cada escenario corre en su propio subproceso: los ejercicios se llaman
+todos ``solution.py`` y crean el modelo al importarse, y el peak RSS solo
+es comparable si cada grafo empieza en un proceso limpio.
+
+Uso:
+    python -m benchmarks.run                        # todos los escenarios
+    python -m benchmarks.run --only 4_1 studio.m2   # filtra por prefijo
+    python -m benchmarks.run --baseline traces/benchmarks/baseline.json
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.scenarios import SCENARIOS, Scenario, get_scenario  # noqa: E402
+
+
+DEFAULT_OUTPUT = os.path.join("traces", "benchmarks", "report.json")
+
+# Métricas comparadas contra el baseline: (clave, más alto es mejor)
+TOLERANCE_METRICS = [
+    ("runs_per_sec", True),
+    ("prompt_tokens_per_invocation", False),
+    ("completion_tokens_per_invocation", False),
+    ("peak_rss_mb", False),
+]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _worker_env() -> Dict[str, str]:
+    """Entorno de los subprocesos: sin red, sin trazas y sin caches en disco."""
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-offline")
+    env.update({
+        "LANGCHAIN_TRACING_V2": "false",
+        "LANGSMITH_TRACING": "false",
+        "ROUTING_LOG_DIR": "",
+        "TOOL_CACHE_DIR": "",
+        "SEARCH_CACHE_DIR": "",
+        "SEARCH_BACKEND": "local",
+        "LOCAL_SEARCH_CORPUS": os.path.join(REPO_ROOT, "docs"),
+        "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+    })
+    return env
+
+
+# =============================================================================
+# WORKER (un escenario por proceso)
+# =============================================================================
+
+def _load_module(scenario: Scenario):
+    path = os.path.join(REPO_ROOT, scenario.path)
+    directory = os.path.dirname(path)
+    # Los ejercicios importan módulos vecinos y leen ficheros relativos
+    sys.path.insert(0, directory)
+    os.chdir(directory)
+
+    name = "bench_" + scenario.name.replace(".", "_")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_scenario(scenario: Scenario, runs: int, warmup: int, latency_ms: float, ms_per_token: float) -> Dict[str, Any]:
+    """Mide un escenario en el proceso actual."""
+    from benchmarks.offline_model import patch_chat_models
+    from utils.logging_config import instrument_graph, percentile
+
+    patch_chat_models(latency_ms=latency_ms, ms_per_token=ms_per_token, rules=scenario.rules)
+
+    # Los grafos imprimen su progreso: se descarta para no mezclarlo con el reporte
+    with contextlib.redirect_stdout(io.StringIO()):
+        module = _load_module(scenario)
+        import_rss_mb = _peak_rss_mb()
+        graph, metrics = instrument_graph(scenario.graph(module))
+
+        for _ in range(warmup):
+            for state in scenario.inputs(module):
+                graph.invoke(state, scenario.config)
+        metrics.reset()
+
+        run_ms: List[float] = []
+        invocations = 0
+        started = time.perf_counter()
+        for _ in range(runs):
+            run_started = time.perf_counter()
+            for state in scenario.inputs(module):
+                graph.invoke(state, scenario.config)
+                invocations += 1
+            run_ms.append((time.perf_counter() - run_started) * 1000)
+        wall_s = time.perf_counter() - started
+
+    nodes = metrics.summary()
+    llm_calls = sum(node["llm_calls"] for node in nodes.values())
+    prompt_tokens = sum(node["prompt_tokens"] for node in nodes.values())
+    completion_tokens = sum(node["completion_tokens"] for node in nodes.values())
+
+    return {
+        "path": scenario.path,
+        "runs": runs,
+        "invocations": invocations,
+        "wall_s": round(wall_s, 3),
+        "runs_per_sec": round(runs / wall_s, 3) if wall_s else None,
+        "run_ms": {
+            "mean": round(sum(run_ms) / len(run_ms), 2) if run_ms else 0.0,
+            "p50": round(percentile(run_ms, 50), 2),
+            "p95": round(percentile(run_ms, 95), 2),
+        },
+        "llm_calls_per_invocation": round(llm_calls / invocations, 2) if invocations else 0,
+        "prompt_tokens_per_invocation": round(prompt_tokens / invocations, 1) if invocations else 0,
+        "completion_tokens_per_invocation": round(completion_tokens / invocations, 1) if invocations else 0,
+        "nodes": nodes,
+        "import_rss_mb": import_rss_mb,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+# =============================================================================
+# RUNNER
+# =============================================================================
+
+def spawn_scenario(scenario: Scenario, args: argparse.Namespace) -> Dict[str, Any]:
+    """Ejecuta un escenario en un subproceso y devuelve su resultado (o el error)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        result_file = os.path.join(tmp, "result.json")
+        command = [
+            sys.executable, "-m", "benchmarks.run",
+            "--worker", scenario.name,
+            "--result-file", result_file,
+            "--runs", str(args.runs),
+            "--warmup", str(args.warmup),
+            "--latency-ms", str(args.latency_ms),
+            "--ms-per-token", str(args.ms_per_token),
+        ]
+        process = subprocess.run(command, cwd=REPO_ROOT, env=_worker_env(), capture_output=True, text=True)
+        if process.returncode != 0 or not os.path.exists(result_file):
+            return {"path": scenario.path, "error": process.stderr.strip().splitlines()[-20:]}
+        with open(result_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Regresiones del reporte respecto al baseline.
+
+    - Cambia el número de llamadas al LLM por invocación (forma del grafo)
+    - Tokens, peak RSS o runs/sec empeoran más que ``tolerance``
+    - Un escenario que funcionaba ahora falla
+    """
+    regressions = []
+    for name, before in baseline.get("scenarios", {}).items():
+        after = report["scenarios"].get(name)
+        if after is None or "error" in before:
+            continue
+        if "error" in after:
+            regressions.append(f"{name}: falla ({after['error'][-1] if after['error'] else 'error'})")
+            continue
+
+        if after["llm_calls_per_invocation"] != before["llm_calls_per_invocation"]:
+            regressions.append(
+                f"{name}: llm_calls_per_invocation {before['llm_calls_per_invocation']} → {after['llm_calls_per_invocation']}"
+            )
+        for key, higher_is_better in TOLERANCE_METRICS:
+            old, new = before.get(key), after.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}: {key} {old} → {new} ({change:+.0%})")
+    return regressions
+
+
+def print_table(report: Dict[str, Any]):
+    print(f"{'escenario':<38} {'runs/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'llm':>6} {'tok in':>8} {'tok out':>8} {'rss MB':>7}")
+    print("-" * 100)
+    for name, result in report["scenarios"].items():
+        if "error" in result:
+            print(f"{name:<38} ERROR: {result['error'][-1] if result['error'] else ''}"[:100])
+            continue
+        print(
+            f"{name:<38} {result['runs_per_sec']:>8} {result['run_ms']['p50']:>9} {result['run_ms']['p95']:>9} "
+            f"{result['llm_calls_per_invocation']:>6} {result['prompt_tokens_per_invocation']:>8} "
+            f"{result['completion_tokens_per_invocation']:>8} {result['peak_rss_mb'] or '-':>7}"
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks offline de los grafos del tutorial")
+    parser.add_argument("--runs", type=int, default=5, help="Ejecuciones medidas por escenario")
+    parser.add_argument("--warmup", type=int, default=1, help="Ejecuciones de calentamiento (no se miden)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latencia simulada por llamada al LLM")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="Latencia simulada por token de salida")
+    parser.add_argument("--only", nargs="*", default=None, help="Prefijos de los escenarios a ejecutar")
+    parser.add_argument("--list", action="store_true", help="Lista los escenarios y termina")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Ruta del reporte JSON")
+    parser.add_argument("--baseline", default=None, help="Reporte previo contra el que buscar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento relativo tolerado")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.worker:
+        result = run_scenario(get_scenario(args.worker), args.runs, args.warmup, args.latency_ms, args.ms_per_token)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0
+
+    scenarios = [
+        s for s in SCENARIOS
+        if not args.only or any(s.name.startswith(prefix) for prefix in args.only)
+    ]
+    if args.list:
+        for scenario in scenarios:
+            print(f"{scenario.name:<38} {scenario.path}")
+        return 0
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {
+            "runs": args.runs,
+            "warmup": args.warmup,
+            "latency_ms": args.latency_ms,
+            "ms_per_token": args.ms_per_token,
+        },
+        "scenarios": {},
+    }
+    for scenario in scenarios:
+        print(f"▶ {scenario.name}", file=sys.stderr)
+        report["scenarios"][scenario.name] = spawn_scenario(scenario, args)
+
+    output = os.path.join(REPO_ROOT, args.output) if not os.path.isabs(args.output) else args.output
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print_table(report)
+    print(f"\nReporte: {output}")
+
+    failed = [name for name, result in report["scenarios"].items() if "error" in result]
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} regresiones respecto a {args.baseline}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"\n✅ Sin regresiones respecto a {args.baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
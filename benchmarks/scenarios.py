@@ -0,0 +1,368 @@
+"""
+Escenarios de benchmark
+
+Un escenario por grafo del repositorio (soluciones de los ejercicios y
+grafos de LangGraph Studio). Cada escenario indica:
+
+- path: Módulo del grafo, relativo a la raíz del repositorio
+- graph: módulo → grafo compilado
+- inputs: módulo → estados iniciales de una ejecución (se llama en cada
+  ejecución, así que los estados mutables no se comparten entre ellas)
+- rules: Respuestas del modelo offline para los nodos de routing que
+  parsean su texto (ver benchmarks.offline_model)
+- config: Config de ``invoke`` (p. ej. recursion_limit)
+
+Para añadir un grafo basta con agregar un ``Scenario`` a SCENARIOS.
+"""
+
+from typing import Optional, Dict, Any, List, Callable, Sequence, Tuple
+
+from langchain_core.messages import HumanMessage
+
+
+class Scenario:
+    """Un grafo y las entradas con que se mide."""
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        graph: Callable[[Any], Any],
+        inputs: Callable[[Any], List[Dict[str, Any]]],
+        rules: Sequence[Tuple[str, str]] = (),
+        config: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.path = path
+        self.graph = graph
+        self.inputs = inputs
+        self.rules = list(rules)
+        self.config = {"recursion_limit": 50, **(config or {})}
+
+
+def _contract() -> str:
+    return (
+        "CONTRATO DE PRESTACIÓN DE SERVICIOS\n\n"
+        "PRIMERA. El proveedor desarrollará una plataforma de análisis por $120,000 USD, "
+        "pagaderos en tres hitos antes del 30 de junio de 2025.\n\n"
+        "SEGUNDA. Penalización del 2% por cada semana de retraso en la entrega.\n\n"
+        "TERCERA. El cliente proporcionará acceso a sus sistemas y datos de prueba.\n\n"
+        "CUARTA. Confidencialidad durante 5 años tras la terminación del contrato."
+    )
+
+
+def _document_state(document: str, document_type: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "document": document,
+        "document_type": document_type,
+        "extracted_data": None,
+        "summary": None,
+        "validated": False,
+        "messages": [],
+        "iteration_count": 0,
+        "tools_used": [],
+        "current_phase": "start",
+        "errors": []
+    }
+
+
+SCENARIOS: List[Scenario] = [
+    # -------------------------------------------------------------------------
+    # Módulo 1
+    # -------------------------------------------------------------------------
+    Scenario(
+        "1_1_workflow_simple",
+        "ejercicios/modulo_1/ejercicio_1_1_workflow_simple/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [{
+            "article": (
+                "LangGraph es un framework para construir aplicaciones multi-agente con LLMs. "
+                "Permite definir grafos con estado, ciclos y control fino del flujo."
+            ),
+            "key_points": "",
+            "summary": "",
+            "translation": ""
+        }],
+    ),
+    Scenario(
+        "1_2_agente_basico",
+        "ejercicios/modulo_1/ejercicio_1_2_agente_basico/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [
+            {"messages": [HumanMessage(content="¿Cuánto es 15% de 250?")]},
+            {"messages": [HumanMessage(content="¿Cuál es el horario de la tienda?")]},
+        ],
+    ),
+    # -------------------------------------------------------------------------
+    # Módulo 2
+    # -------------------------------------------------------------------------
+    Scenario(
+        "2_1_routing",
+        "ejercicios/modulo_2/ejercicio_2_1_routing/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [
+            {"query": query, "category": "", "response": ""}
+            for query in (
+                "Mi aplicación no inicia, me da error 404 al intentar acceder",
+                "¿Cuánto cuesta el plan empresarial y qué incluye?",
+                "Hola, quisiera saber más sobre la empresa",
+            )
+        ],
+    ),
+    Scenario(
+        "2_2_parallelization",
+        "ejercicios/modulo_2/ejercicio_2_2_parallelization/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [{
+            "review": "El producto es excelente y el envío fue rápido, pero el manual está en inglés.",
+            "optimistic_analysis": "",
+            "pessimistic_analysis": "",
+            "neutral_analysis": "",
+            "final_analysis": ""
+        }],
+    ),
+    Scenario(
+        "2_3_orchestrator",
+        "ejercicios/modulo_2/ejercicio_2_3_orchestrator/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [{
+            "document": (
+                "Resumen Ejecutivo\n\nEste proyecto propone una iniciativa estratégica de automatización.\n\n"
+                "Detalles Técnicos\n\nEl sistema usará una arquitectura de microservicios con API REST "
+                "y base de datos PostgreSQL.\n\n"
+                "Análisis Financiero\n\nLa inversión inicial es de $250,000 USD con un ROI de 18 meses."
+            ),
+            "executive": "",
+            "technical": "",
+            "financial": "",
+            "executive_analysis": "",
+            "technical_analysis": "",
+            "financial_analysis": "",
+            "final_report": ""
+        }],
+    ),
+    # -------------------------------------------------------------------------
+    # Módulo 3
+    # -------------------------------------------------------------------------
+    Scenario(
+        "3_1_agente_autonomo",
+        "ejercicios/modulo_3/ejercicio_3_1_agente_autonomo/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [{
+            "objective": "Investiga sobre inteligencia artificial y calcula cuánto es 15% de 1000",
+            "plan": "",
+            "current_step": 0,
+            "observations": [],
+            "decision": "",
+            "final_response": ""
+        }],
+        rules=[(
+            r"PLAN:\s*$",
+            "1. Buscar aplicaciones de inteligencia artificial con search_web\n"
+            "2. Calcular 15% de 1000 con calculator\n"
+            "3. Redactar el reporte final"
+        )],
+    ),
+    Scenario(
+        "3_2_red_colaborativa",
+        "ejercicios/modulo_3/ejercicio_3_2_red_colaborativa/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [
+            m.create_initial_state(
+                "Mi aplicación web no puede conectarse a la base de datos. El código usa SQLAlchemy "
+                "y el firewall podría estar bloqueando el puerto 5432."
+            ),
+            m.create_initial_state("El servidor no responde en el puerto 443, creo que hay un problema con el certificado SSL."),
+        ],
+    ),
+    Scenario(
+        "3_3_memoria_compartida",
+        "ejercicios/modulo_3/ejercicio_3_3_memoria_compartida/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [
+            {
+                "query": query,
+                "user_id": user_id,
+                "similar_cases": [],
+                "solution": "",
+                "should_save": False,
+                "memory": memory
+            }
+            # La memoria se comparte entre las consultas de una ejecución, no entre ejecuciones
+            for memory in [{}]
+            for user_id, query in (
+                ("user_001", "No puedo conectarme a la base de datos PostgreSQL, me da error de conexión rechazada"),
+                ("user_002", "Mi aplicación no puede acceder a PostgreSQL, dice connection refused"),
+            )
+        ],
+    ),
+    # -------------------------------------------------------------------------
+    # Módulo 4
+    # -------------------------------------------------------------------------
+    Scenario(
+        "4_1_atencion_cliente",
+        "ejercicios/modulo_4/ejercicio_4_1_atencion_cliente/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [
+            m.create_initial_state("¿La Laptop Pro X15 es buena para diseño gráfico? ¿Cuánta RAM tiene?", "user_001"),
+            m.create_initial_state("Quiero devolver un producto que compré hace 15 días. ¿Cuál es el proceso?", "user_003"),
+        ],
+    ),
+    Scenario(
+        "4_1_atencion_cliente_speculative",
+        "ejercicios/modulo_4/ejercicio_4_1_atencion_cliente/solution.py",
+        graph=lambda m: m.build_graph(speculative=True),
+        inputs=lambda m: [
+            m.create_initial_state("¿La Laptop Pro X15 es buena para diseño gráfico? ¿Cuánta RAM tiene?", "user_001"),
+            m.create_initial_state("Quiero devolver un producto que compré hace 15 días. ¿Cuál es el proceso?", "user_003"),
+        ],
+    ),
+    Scenario(
+        "4_2_analisis_datos",
+        "ejercicios/modulo_4/ejercicio_4_2_analisis_datos/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [{
+            "document_text": _contract(),
+            "document_type": "contract",
+            "cleaned_text": "",
+            "sections": {},
+            "metadata": {},
+            "financial_analysis": {},
+            "risk_analysis": {},
+            "legal_analysis": {},
+            "obligations_analysis": {},
+            "combined_insights": [],
+            "executive_summary": "",
+            "validation_results": {},
+            "confidence_score": 0.0,
+            "requires_human_review": False,
+            "review_reasons": []
+        }],
+    ),
+    Scenario(
+        "4_3_investigacion",
+        "ejercicios/modulo_4/ejercicio_4_3_investigacion/solution.py",
+        graph=lambda m: m.build_graph(),
+        inputs=lambda m: [m.create_initial_state("Adopción de IA en el sector salud")],
+    ),
+    Scenario(
+        "4_4_debugging",
+        "ejercicios/modulo_4/ejercicio_4_4_debugging/solution.py",
+        graph=lambda m: m.create_document_analyzer_graph(),
+        inputs=lambda m: [
+            _document_state("sample_document.pdf - Este es un documento PDF con información importante."),
+            _document_state('{"data": "structured_content.json"}'),
+        ],
+    ),
+    # -------------------------------------------------------------------------
+    # LangGraph Studio
+    # -------------------------------------------------------------------------
+    Scenario(
+        "studio.m1.simple",
+        "notebooks/modulo_1/studio/simple.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [{"graph_state": "Hola, soy Lance."}],
+    ),
+    Scenario(
+        "studio.m1.graph",
+        "notebooks/modulo_1/studio/graph.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [
+            {"ticket_id": ticket_id, "mensaje": mensaje, "prioridad": "", "estado": "nuevo", "asignado_a": ""}
+            for ticket_id, mensaje in (
+                ("TICKET-001", "El servidor de producción está caído"),
+                ("TICKET-002", "¿Cómo cambio mi contraseña?"),
+            )
+        ],
+    ),
+    Scenario(
+        "studio.m1.router",
+        "notebooks/modulo_1/studio/router.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [{"messages": [HumanMessage(content="Multiplica 2 por 3")]}],
+    ),
+    Scenario(
+        "studio.m1.agent",
+        "notebooks/modulo_1/studio/agent.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [{"messages": [HumanMessage(content="Suma 3 y 4, multiplica el resultado por 2 y divide entre 5")]}],
+    ),
+    Scenario(
+        "studio.m2.map_reduce",
+        "notebooks/modulo_2/studio/map_reduce.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [{"topic": "animals"}],
+    ),
+    Scenario(
+        "studio.m2.orchestrator_workers",
+        "notebooks/modulo_2/studio/orchestrator_workers.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [{"query": "Investiga tendencias de LangGraph y proyecta su adopción", "plan": "", "worker_results": [], "final_answer": ""}],
+        rules=[
+            (r"RESULTADOS PREVIOS:\nNinguno aún", "search_worker"),
+            (r"RESULTADOS PREVIOS:\n- [^\n]*\n\n", "analyze_worker"),
+            (r"RESULTADOS PREVIOS:\n- [^\n]*\n- [^\n]*\n\n", "calculate_worker"),
+        ],
+    ),
+    Scenario(
+        "studio.m2.orchestrator_workers_dag",
+        "notebooks/modulo_2/studio/orchestrator_workers.py",
+        graph=lambda m: m.dag_graph,
+        inputs=lambda m: [{"query": "Investiga tendencias de LangGraph y proyecta su adopción"}],
+    ),
+    Scenario(
+        "studio.m2.parallel_analysis",
+        "notebooks/modulo_2/studio/parallel_analysis.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [{
+            "document": "Apple anunció en Cupertino un nuevo producto. Tim Cook lo presentó ante inversores optimistas.",
+            "sentiment": "",
+            "entities": [],
+            "summary": "",
+            "final_report": ""
+        }],
+    ),
+    Scenario(
+        "studio.m2.parallelization",
+        "notebooks/modulo_2/studio/parallelization.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [{"question": "How does LangGraph handle parallel nodes?"}],
+    ),
+    Scenario(
+        "studio.m2.research_assistant",
+        "notebooks/modulo_2/studio/research_assistant.py",
+        # Sin interrupt_before: el feedback humano ya viene aprobado en el input
+        graph=lambda m: m.builder.compile(),
+        inputs=lambda m: [{"topic": "LangGraph multi-agent patterns", "max_analysts": 3, "human_analyst_feedback": "approve"}],
+    ),
+    Scenario(
+        "studio.m2.routing_support",
+        "notebooks/modulo_2/studio/routing_support.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [
+            {"query": query, "intent": "", "response": ""}
+            for query in ("Mi API devuelve error 500 al autenticar", "¿Dónde está la documentación de la plataforma?")
+        ],
+        rules=[(r"Responde con UNA SOLA palabra: technical, billing, o general", "general")],
+    ),
+    Scenario(
+        "studio.m2.sub_graphs",
+        "notebooks/modulo_2/studio/sub_graphs.py",
+        graph=lambda m: m.graph,
+        inputs=lambda m: [{
+            "raw_logs": [
+                {"id": f"log-{i}", "question": "How can I import ChatOllama?", "answer": "..."}
+                if i % 10 else
+                {"id": f"log-{i}", "question": "How can I use Chroma?", "answer": "...", "grade": 0, "grader": "Document Relevance Recall"}
+                for i in range(1000)
+            ]
+        }],
+    ),
+]
+
+
+def get_scenario(name: str) -> Scenario:
+    for scenario in SCENARIOS:
+        if scenario.name == name:
+            return scenario
+    raise KeyError(f"Escenario desconocido: {name}")
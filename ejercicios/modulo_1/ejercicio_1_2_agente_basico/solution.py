@@ -14,6 +14,8 @@ Conceptos implementados:
 - ToolNode para ejecución de herramientas
 """
 
+import os
+import sys
 from typing import Annotated, Sequence, Literal
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
@@ -23,6 +25,12 @@ from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.context_window import ContextWindowManager
+from utils.safe_math import safe_eval
+from utils.tool_cache import cached_tool
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -100,16 +108,16 @@ def calculator(expression: str) -> str:
                 result = (percent / 100) * number
                 return str(result)
 
-        # Evaluar expresión matemática
-        # NOTA: En producción, usar una librería más segura que eval()
-        # como simpleeval o crear un parser propio
-        result = eval(expression)
+        # Evaluar expresión matemática con un evaluador seguro (AST):
+        # nunca se ejecuta código arbitrario generado por el modelo
+        result = safe_eval(expression)
         return str(result)
     except Exception as e:
         return f"Error al calcular: {str(e)}"
 
 
 @tool
+@cached_tool(pure=True)
 def search_knowledge(query: str) -> str:
     """
     Busca información en una base de conocimiento simulada.
@@ -185,6 +193,11 @@ Cuando recibas una pregunta:
 
 Siempre explica tu razonamiento brevemente."""
 
+# Presupuesto de tokens por llamada al LLM. En loops largos de herramientas
+# solo se envían el system prompt, la tarea original y los pasos más
+# recientes (cada tool call junto con sus resultados).
+context_window = ContextWindowManager(max_tokens=3000)
+
 
 # =============================================================================
 # DEFINICIÓN DE NODOS
@@ -195,7 +208,7 @@ def agent_node(state: AgentState) -> dict:
     Nodo del agente: razona y decide qué hacer.
 
     Este es el "cerebro" del agente. En cada llamada:
-    1. Recibe todo el historial de mensajes (contexto completo)
+    1. Recibe el historial de mensajes (recortado a un presupuesto de tokens)
     2. El LLM analiza el contexto y decide:
        - Opción A: Llamar una o más herramientas (tool_calls)
        - Opción B: Responder directamente al usuario
@@ -203,7 +216,7 @@ def agent_node(state: AgentState) -> dict:
 
     El LLM ve:
     - El system prompt con instrucciones
-    - Todos los mensajes previos (contexto)
+    - La tarea original y los mensajes más recientes (contexto)
     - Las herramientas disponibles (via bind_tools)
     - Los resultados de herramientas previas (ToolMessages)
 
@@ -216,12 +229,11 @@ def agent_node(state: AgentState) -> dict:
     print("\n🤖 Agente pensando...")
 
     # 1. Obtener mensajes del estado
-    messages = state["messages"]
-
-    # 2. Agregar system prompt si es el primer mensaje del usuario
-    # Solo lo agregamos una vez al inicio
-    if len(messages) == 1:
-        messages = [SystemMessage(content=SYSTEM_PROMPT)] + list(messages)
+    # 2. Anteponer el system prompt y ajustar el historial al presupuesto
+    # de tokens (los pares tool call / resultado nunca se separan)
+    messages = context_window.fit(
+        state["messages"], system=SystemMessage(content=SYSTEM_PROMPT)
+    )
 
     # 3. Invocar el LLM con herramientas vinculadas
     # El LLM decidirá si necesita usar herramientas o responder
@@ -17,7 +17,8 @@ from solution import (
     should_continue,
     AgentState,
 )
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+import solution
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
 
 
 # =============================================================================
@@ -65,6 +66,21 @@ def test_calculator_error_handling():
     assert "Error" in result
 
 
+def test_calculator_rejects_unsafe_expressions():
+    """
+    Test: La calculadora no ejecuta código ni cálculos desmedidos
+    """
+    assert "Error" in calculator.invoke({"expression": "__import__('os').getcwd()"})
+    assert "Error" in calculator.invoke({"expression": "(1).__class__"})
+    assert "Error" in calculator.invoke({"expression": "9 ** 9 ** 9"})
+
+    from utils.safe_math import default_evaluator
+    results = default_evaluator.evaluate_many("price * (1 + tax)", [
+        {"price": 100, "tax": 0.5}, {"price": 10, "tax": 0.1}
+    ])
+    assert results == [150.0, 11.0]
+
+
 def test_search_knowledge_finds_information():
     """
     Test: search_knowledge debe encontrar información existente
@@ -85,6 +101,59 @@ def test_search_knowledge_handles_missing():
     assert "No se encontró" in result
 
 
+def test_search_knowledge_results_are_cached(monkeypatch):
+    """
+    Test: Repetir la misma búsqueda entre ejecuciones no vuelve a
+    ejecutar la herramienta y los aciertos aparecen en las métricas
+    """
+    from utils.logging_config import instrument_graph
+    from utils.tool_cache import ToolCache
+    import utils.tool_cache as tool_cache
+
+    monkeypatch.setattr(tool_cache, "default_tool_cache", ToolCache())
+
+    class ScriptedLLM:
+        def invoke(self, messages):
+            if isinstance(messages[-1], ToolMessage):
+                return AIMessage(content=messages[-1].content)
+            return AIMessage(content="", tool_calls=[
+                {"name": "search_knowledge", "args": {"query": "horario"}, "id": "call_1"}
+            ])
+
+    monkeypatch.setattr(solution, "llm_with_tools", ScriptedLLM())
+    app, metrics = instrument_graph(build_graph())
+
+    for _ in range(3):
+        result = app.invoke({"messages": [HumanMessage(content="¿Cuál es el horario?")]})
+        assert "9:00" in result["messages"][-1].content
+
+    stats = tool_cache.default_tool_cache.stats()["search_knowledge"]
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+    assert metrics.summary()["tools"]["tool_cache_hits"] == 2
+
+
+def test_tool_cache_survives_unwritable_cache_dir(tmp_path):
+    """
+    Test: Si no se puede escribir en TOOL_CACHE_DIR la herramienta
+    devuelve su resultado y la cache sigue funcionando en memoria
+    """
+    from utils.tool_cache import ToolCache, cached_tool
+
+    # Un fichero donde debería ir el directorio: makedirs falla con OSError
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    calls = []
+
+    @cached_tool(pure=True, cache=ToolCache(cache_dir=str(blocked)))
+    def lookup(query: str) -> str:
+        calls.append(query)
+        return query.upper()
+
+    assert lookup("horario") == "HORARIO"
+    assert lookup("horario") == "HORARIO"
+    assert calls == ["horario"]
+
 # =============================================================================
 # TESTS DEL NODO DEL AGENTE
 # =============================================================================
@@ -126,6 +195,62 @@ def test_agent_node_can_call_tools():
     assert hasattr(ai_message, "content")
 
 
+def test_agent_node_trims_long_history(monkeypatch):
+    """
+    Test: En loops largos el agente envía un historial acotado y sin
+    separar tool calls de sus resultados
+    """
+    sent = []
+
+    class RecordingLLM:
+        def invoke(self, messages):
+            sent.append(messages)
+            return AIMessage(content="Listo")
+
+    monkeypatch.setattr(solution, "llm_with_tools", RecordingLLM())
+
+    messages = [HumanMessage(content="Calcula muchas cosas", id="task")]
+    for i in range(60):
+        messages.append(AIMessage(
+            content="",
+            tool_calls=[{"name": "calculator", "args": {"expression": f"{i} * 2"}, "id": f"call_{i}"}],
+            id=f"ai_{i}"
+        ))
+        messages.append(ToolMessage(content="resultado " * 40, tool_call_id=f"call_{i}", id=f"tool_{i}"))
+
+    agent_node({"messages": messages})
+
+    window = sent[0]
+    assert isinstance(window[0], SystemMessage)
+    assert any(m.id == "task" for m in window)
+    assert len(window) < len(messages)
+    # Cada ToolMessage enviado va precedido por el AIMessage que lo pidió
+    sent_call_ids = {tc["id"] for m in window if isinstance(m, AIMessage) for tc in m.tool_calls}
+    assert all(m.tool_call_id in sent_call_ids for m in window if isinstance(m, ToolMessage))
+    assert solution.context_window.last_stats["sent_tokens"] < solution.context_window.last_stats["input_tokens"]
+
+
+def test_context_window_never_sends_orphan_tool_message():
+    """
+    Test: Un ToolMessage cuyo AIMessage no está en la ventana no se envía,
+    aunque sea la única unidad reciente
+    """
+    from utils.context_window import ContextWindowManager
+
+    context = ContextWindowManager(max_tokens=50)
+    messages = [
+        HumanMessage(content="Calcula", id="task"),
+        AIMessage(content="", tool_calls=[{"name": "calculator", "args": {"expression": "1+1"}, "id": "call_a"}], id="ai_a"),
+        HumanMessage(content="otra cosa " * 30, id="interrupt"),
+        ToolMessage(content="2", tool_call_id="call_a", id="tool_a"),
+    ]
+
+    window = context.fit(messages)
+
+    assert not any(isinstance(m, ToolMessage) for m in window)
+    assert window[-1].id == "task"
+
+
 # =============================================================================
 # TESTS DE ROUTING
 # =============================================================================
@@ -13,12 +13,18 @@ Conceptos implementados:
 - Conditional edges con múltiples destinos
 """
 
+import os
+import sys
 from typing import TypedDict, Literal
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import StateGraph, END
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.routing import LocalRouter, routing_log_path
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -67,34 +73,25 @@ llm = ChatOpenAI(
 # NODO CLASIFICADOR
 # =============================================================================
 
-def classifier_node(state: RouterState) -> dict:
-    """
-    Nodo que clasifica la consulta del usuario en una categoría.
-
-    Este es el componente más crítico del sistema de routing:
-    - Si clasifica correctamente → la consulta va al agente apropiado
-    - Si clasifica incorrectamente → experiencia de usuario pobre
-
-    Estrategias para mejorar la clasificación:
-    1. Prompt claro con ejemplos (few-shot)
-    2. Descripciones precisas de cada categoría
-    3. Pedir solo la categoría (no explicación)
-    4. Temperature=0 para consistencia
-    5. Validar que la respuesta sea una categoría válida
+# Clasificador local: reglas de alta precisión + modelo entrenado con las
+# etiquetas del LLM. Solo las consultas dudosas llegan al LLM.
+router = LocalRouter(
+    labels=["technical", "sales", "support"],
+    keyword_rules={
+        "technical": ["error", "bug", "no funciona", "no inicia", "configuro", "configurar", "instalar"],
+        "sales": ["precio", "cuánto cuesta", "comprar", "licencias", "descuento", "promociones"],
+        "support": ["devolver", "devolución", "reembolso", "garantía", "cancelar"],
+    },
+    log_path=routing_log_path("ejercicio_2_1_classifier")
+)
 
-    Args:
-        state: Estado con la consulta del usuario
 
-    Returns:
-        Diccionario con la categoría asignada
+def llm_classify(query: str) -> str:
     """
-    print("\n" + "="*70)
-    print("🔍 CLASIFICADOR: Analizando consulta...")
-    print("="*70)
-
-    query = state["query"]
-    print(f"Consulta: {query}")
+    Clasifica la consulta con el LLM.
 
+    Solo se usa cuando el clasificador local no tiene confianza suficiente.
+    """
     # Construir prompt de clasificación
     # Nota: Este prompt es crucial para el rendimiento del sistema
     prompt = f"""Analiza la siguiente consulta del cliente y clasifícala en UNA categoría.
@@ -122,7 +119,42 @@ No agregues explicación ni puntuación."""
         print(f"⚠️  Categoría inválida '{category}', usando 'technical' como default")
         category = "technical"
 
-    print(f"✓ Categoría detectada: {category.upper()}")
+    return category
+
+
+def classifier_node(state: RouterState) -> dict:
+    """
+    Nodo que clasifica la consulta del usuario en una categoría.
+
+    Este es el componente más crítico del sistema de routing:
+    - Si clasifica correctamente → la consulta va al agente apropiado
+    - Si clasifica incorrectamente → experiencia de usuario pobre
+
+    Estrategias para mejorar la clasificación:
+    1. Prompt claro con ejemplos (few-shot)
+    2. Descripciones precisas de cada categoría
+    3. Pedir solo la categoría (no explicación)
+    4. Temperature=0 para consistencia
+    5. Validar que la respuesta sea una categoría válida
+    6. Resolver localmente las consultas repetitivas (ver router)
+
+    Args:
+        state: Estado con la consulta del usuario
+
+    Returns:
+        Diccionario con la categoría asignada
+    """
+    print("\n" + "="*70)
+    print("🔍 CLASIFICADOR: Analizando consulta...")
+    print("="*70)
+
+    query = state["query"]
+    print(f"Consulta: {query}")
+
+    decision = router.classify(query, fallback=llm_classify)
+    category = decision.label
+
+    print(f"✓ Categoría detectada: {category.upper()} (vía {decision.source})")
     return {"category": category}
 
 
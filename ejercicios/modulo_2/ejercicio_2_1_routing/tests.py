@@ -18,6 +18,8 @@ from solution import (
     support_agent,
     RouterState,
 )
+import solution
+from utils.routing import LocalRouter
 
 
 # =============================================================================
@@ -103,6 +105,46 @@ def test_classifier_returns_valid_category():
         f"Categoría inválida: {result['category']}"
 
 
+def test_classifier_resolves_clear_queries_locally(monkeypatch):
+    """
+    Test: Las consultas con palabras clave claras no llaman al LLM
+    """
+    class FailingLLM:
+        def invoke(self, prompt):
+            raise AssertionError("No debería llamarse al LLM")
+
+    monkeypatch.setattr(solution, "llm", FailingLLM())
+
+    for query, expected in [
+        ("Mi app no funciona", "technical"),
+        ("Quiero comprar 5 licencias", "sales"),
+        ("Necesito un reembolso", "support"),
+    ]:
+        result = classifier_node({"query": query, "category": "", "response": ""})
+        assert result["category"] == expected
+
+
+def test_local_router_learns_from_llm_labels():
+    """
+    Test: El modelo local aprende de las etiquetas del LLM y deja de llamarlo
+    """
+    router = LocalRouter(labels=["technical", "sales", "support"], min_examples=6, retrain_every=6)
+    examples = {
+        "la pantalla se congela al abrir": "technical",
+        "quisiera saber los planes anuales": "sales",
+        "cambiar la dirección de mi pedido": "support",
+    }
+    for _ in range(3):
+        for query, label in examples.items():
+            router.classify(query, fallback=lambda q: examples[q])
+    # El reentrenamiento corre en segundo plano
+    router.wait_for_training()
+
+    decision = router.classify("la pantalla se congela al abrir", fallback=lambda q: "sales")
+    assert decision.source == "model"
+    assert decision.label == "technical"
+
+
 # =============================================================================
 # TESTS DE ROUTING
 # =============================================================================
@@ -4,11 +4,17 @@ Ejercicio 2.3: Orchestrator-Workers Pattern - SOLUCIÓN COMPLETA
 Implementa el pattern orchestrator-workers para análisis de documentos complejos.
 """
 
-from typing import TypedDict
+import os
+import sys
+from typing import TypedDict, List, Optional
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.keyword_classifier import KeywordClassifier
+
 load_dotenv()
 
 # =============================================================================
@@ -29,6 +35,28 @@ class DocumentAnalysisState(TypedDict):
 
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
 
+# Sección → (nodo worker, clave del análisis, texto de sección vacía, análisis por defecto)
+WORKERS = {
+    "executive": (
+        "executive_worker", "executive_analysis",
+        "Sin sección ejecutiva.", "No se encontró contenido ejecutivo para analizar."
+    ),
+    "technical": (
+        "technical_worker", "technical_analysis",
+        "Sin sección técnica.", "No se encontró contenido técnico para analizar."
+    ),
+    "financial": (
+        "financial_worker", "financial_analysis",
+        "Sin sección financiera.", "No se encontró contenido financiero para analizar."
+    ),
+}
+
+
+def is_empty_section(state: DocumentAnalysisState, section: str) -> bool:
+    """True si el orchestrator no asignó contenido a la sección."""
+    content = state.get(section, "")
+    return not content or content == WORKERS[section][2]
+
 
 # =============================================================================
 # ORCHESTRATOR - PLANIFICACIÓN
@@ -56,6 +84,11 @@ def orchestrator_plan(state: DocumentAnalysisState) -> dict:
     print(f"   - Técnico: {len(sections['technical'])} caracteres")
     print(f"   - Financiero: {len(sections['financial'])} caracteres")
 
+    # Las secciones vacías ya tienen su análisis: su worker no necesita ejecutarse
+    for section, (_, analysis_key, _, default_analysis) in WORKERS.items():
+        if is_empty_section(sections, section):
+            sections[analysis_key] = default_analysis
+
     return sections
 
 
@@ -71,8 +104,8 @@ def executive_summary_worker(state: DocumentAnalysisState) -> dict:
 
     section = state["executive"]
 
-    if not section or section == "Sin sección ejecutiva.":
-        return {"executive_analysis": "No se encontró contenido ejecutivo para analizar."}
+    if is_empty_section(state, "executive"):
+        return {"executive_analysis": WORKERS["executive"][3]}
 
     prompt = f"""Como consultor ejecutivo senior, analiza esta sección de un documento:
 
@@ -100,8 +133,8 @@ def technical_details_worker(state: DocumentAnalysisState) -> dict:
 
     section = state["technical"]
 
-    if not section or section == "Sin sección técnica.":
-        return {"technical_analysis": "No se encontró contenido técnico para analizar."}
+    if is_empty_section(state, "technical"):
+        return {"technical_analysis": WORKERS["technical"][3]}
 
     prompt = f"""Como arquitecto técnico senior, analiza esta sección:
 
@@ -129,8 +162,8 @@ def financial_analysis_worker(state: DocumentAnalysisState) -> dict:
 
     section = state["financial"]
 
-    if not section or section == "Sin sección financiera.":
-        return {"financial_analysis": "No se encontró contenido financiero para analizar."}
+    if is_empty_section(state, "financial"):
+        return {"financial_analysis": WORKERS["financial"][3]}
 
     prompt = f"""Como analista financiero, analiza esta sección:
 
@@ -206,59 +239,46 @@ REPORTE EJECUTIVO INTEGRADO:"""
 # FUNCIONES AUXILIARES
 # =============================================================================
 
-def extract_sections_smart(document: str) -> dict:
-    """
-    Extrae secciones del documento usando clasificación por keywords.
-
-    En un sistema de producción, considerarías:
-    - Usar un LLM para clasificar cada párrafo
-    - Embeddings para similaridad semántica
-    - Análisis de estructura (headers, bullets, etc.)
-    - Patrones de lenguaje específicos del dominio
-    """
-    paragraphs = [p.strip() for p in document.split("\n\n") if p.strip()]
-
-    executive = []
-    technical = []
-    financial = []
-
-    # Keywords para clasificación
-    executive_keywords = [
+# Taxonomía de secciones: lista (peso 1.0 por palabra) o dict palabra → peso.
+# Se puede ampliar con section_classifier.extend("financial", {"capex": 2.0})
+SECTION_TAXONOMY = {
+    "executive": [
         "resumen", "ejecutivo", "overview", "estrategia", "objetivo",
         "visión", "iniciativa", "propone", "proyecto"
-    ]
-
-    technical_keywords = [
+    ],
+    "technical": [
         "técnico", "sistema", "arquitectura", "implementación",
         "api", "base de datos", "tecnología", "desarrollo",
         "infraestructura", "monitoreo"
-    ]
-
-    financial_keywords = [
+    ],
+    "financial": [
         "costo", "precio", "inversión", "financiero", "presupuesto",
         "roi", "ahorro", "económico", "usd", "$"
-    ]
+    ],
+}
+
+section_classifier = KeywordClassifier(SECTION_TAXONOMY)
+
 
-    for para in paragraphs:
-        para_lower = para.lower()
+def extract_sections_smart(document: str, classifier: Optional[KeywordClassifier] = None) -> dict:
+    """
+    Extrae secciones del documento usando clasificación por keywords.
 
-        # Contar matches de cada categoría
-        exec_score = sum(1 for kw in executive_keywords if kw in para_lower)
-        tech_score = sum(1 for kw in technical_keywords if kw in para_lower)
-        fin_score = sum(1 for kw in financial_keywords if kw in para_lower)
+    Cada keyword cuenta su peso (1.0 por defecto) si aparece en el
+    párrafo. Cada párrafo va a la categoría con mayor score; a igualdad
+    gana la primera de la taxonomía (ejecutivo, técnico, financiero).
 
-        # Asignar a la categoría con mayor score
-        if exec_score >= tech_score and exec_score >= fin_score:
-            executive.append(para)
-        elif tech_score >= fin_score:
-            technical.append(para)
-        else:
-            financial.append(para)
+    En un sistema de producción, considerarías:
+    - Usar un LLM para clasificar cada párrafo
+    - Embeddings para similaridad semántica
+    - Análisis de estructura (headers, bullets, etc.)
+    - Patrones de lenguaje específicos del dominio
+    """
+    sections = (classifier or section_classifier).split(document)
 
     return {
-        "executive": "\n\n".join(executive) if executive else "Sin sección ejecutiva.",
-        "technical": "\n\n".join(technical) if technical else "Sin sección técnica.",
-        "financial": "\n\n".join(financial) if financial else "Sin sección financiera."
+        section: "\n\n".join(sections.get(section, [])) or empty_text
+        for section, (_, _, empty_text, _) in WORKERS.items()
     }
 
 
@@ -266,7 +286,22 @@ def extract_sections_smart(document: str) -> dict:
 # CONSTRUCCIÓN DEL GRAFO
 # =============================================================================
 
-def build_graph():
+def route_to_workers(state: DocumentAnalysisState, skip_empty_sections: bool = True) -> List[str]:
+    """
+    Decide qué workers lanzar tras la planificación.
+
+    Todos los nodos devueltos se ejecutan en paralelo (mismo superstep).
+    Con skip_empty_sections=True los workers cuya sección está vacía no se
+    ejecutan; si no queda ninguno se pasa directamente a la síntesis.
+    """
+    workers = [
+        node for section, (node, *_) in WORKERS.items()
+        if not (skip_empty_sections and is_empty_section(state, section))
+    ]
+    return workers or ["orchestrator_synthesize"]
+
+
+def build_graph(skip_empty_sections: bool = True):
     """
     Construye el grafo orchestrator-workers.
 
@@ -274,6 +309,10 @@ def build_graph():
     - Orchestrator de planificación divide el trabajo
     - Workers especializados procesan en paralelo
     - Orchestrator de síntesis ensambla los resultados
+
+    Args:
+        skip_empty_sections: No ejecutar (ni pagar) los workers cuya
+            sección quedó vacía (p. ej. "Sin sección financiera.")
     """
     workflow = StateGraph(DocumentAnalysisState)
 
@@ -287,12 +326,15 @@ def build_graph():
     # Entry point: orchestrator de planificación
     workflow.set_entry_point("orchestrator_plan")
 
-    # Paralelismo: del orchestrator a los workers
-    workflow.add_edge("orchestrator_plan", "executive_worker")
-    workflow.add_edge("orchestrator_plan", "technical_worker")
-    workflow.add_edge("orchestrator_plan", "financial_worker")
+    # Paralelismo: del orchestrator a los workers con contenido
+    workflow.add_conditional_edges(
+        "orchestrator_plan",
+        lambda state: route_to_workers(state, skip_empty_sections),
+        [node for node, *_ in WORKERS.values()] + ["orchestrator_synthesize"]
+    )
 
     # Convergencia: de los workers al orchestrator de síntesis
+    # (se ejecuta una sola vez, cuando terminan todos los workers lanzados)
     workflow.add_edge("executive_worker", "orchestrator_synthesize")
     workflow.add_edge("technical_worker", "orchestrator_synthesize")
     workflow.add_edge("financial_worker", "orchestrator_synthesize")
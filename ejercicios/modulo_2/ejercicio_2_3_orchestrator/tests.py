@@ -12,6 +12,8 @@ from solution import (
     orchestrator_synthesize,
     DocumentAnalysisState,
     extract_sections_smart,
+    route_to_workers,
+    KeywordClassifier,
 )
 
 
@@ -106,6 +108,26 @@ def test_orchestrator_synthesize_creates_report():
     assert len(result["final_report"]) > 0
 
 
+def test_route_skips_empty_sections():
+    """Test: Los workers con sección vacía no se ejecutan"""
+    state: DocumentAnalysisState = {
+        "document": "",
+        "executive": "Este proyecto es estratégico para la empresa.",
+        "technical": "La arquitectura será microservicios con Docker.",
+        "financial": "Sin sección financiera.",
+        "executive_analysis": "",
+        "technical_analysis": "",
+        "financial_analysis": "",
+        "final_report": ""
+    }
+
+    assert route_to_workers(state) == ["executive_worker", "technical_worker"]
+    assert len(route_to_workers(state, skip_empty_sections=False)) == 3
+
+    state["executive"] = state["technical"] = ""
+    assert route_to_workers(state) == ["orchestrator_synthesize"]
+
+
 def test_graph_builds():
     """Test: El grafo debe construirse sin errores"""
     app = build_graph()
@@ -165,5 +187,21 @@ def test_extract_sections_identifies_financial():
     assert len(sections["financial"]) > 0
 
 
+def test_extract_sections_with_weighted_taxonomy():
+    """Test: Las taxonomías aceptan pesos y se pueden ampliar"""
+    doc = "El proyecto migra la infraestructura a Kubernetes.\n\nEl capex del proyecto es alto."
+    classifier = KeywordClassifier({
+        "executive": ["proyecto"],
+        "technical": {"infraestructura": 2.0},
+        "financial": [],
+    })
+    classifier.extend("financial", {"capex": 2.0})
+
+    sections = extract_sections_smart(doc, classifier)
+    assert "Kubernetes" in sections["technical"]
+    assert "capex" in sections["financial"]
+    assert sections["executive"] == "Sin sección ejecutiva."
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -4,6 +4,8 @@ Ejercicio 3.1: Agente Autónomo con Planificación Dinámica - SOLUCIÓN COMPLET
 Implementa el pattern Plan-Execute-Evaluate para agentes autónomos avanzados.
 """
 
+import os
+import sys
 from typing import TypedDict, Literal, List, Dict
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
@@ -12,6 +14,12 @@ from langchain_core.tools import tool
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.safe_math import safe_eval
+from utils.tool_cache import cached_tool
+from utils.tool_executor import ToolExecutor
+
 load_dotenv()
 
 # =============================================================================
@@ -29,6 +37,7 @@ class PlanExecuteState(TypedDict):
 
 
 @tool
+@cached_tool(ttl_seconds=600)
 def search_web(query: str) -> str:
     """Busca información en la web (simulado)."""
     simulated_results = {
@@ -50,7 +59,7 @@ def search_web(query: str) -> str:
 def calculator(expression: str) -> str:
     """Calcula expresiones matemáticas."""
     try:
-        result = eval(expression)
+        result = safe_eval(expression)
         return str(result)
     except Exception as e:
         return f"Error al calcular: {str(e)}"
@@ -60,6 +69,10 @@ tools = [search_web, calculator]
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 llm_with_tools = llm.bind_tools(tools)
 
+# Ejecuta en paralelo las tool calls de un mismo turno (índice por nombre
+# construido una sola vez, timeouts por herramienta, orden preservado)
+tool_executor = ToolExecutor(tools, timeouts={"search_web": 15.0, "calculator": 5.0})
+
 
 # =============================================================================
 # NODO DE PLANIFICACIÓN
@@ -180,19 +193,11 @@ Proporciona el resultado de manera concisa."""
     if hasattr(response, 'tool_calls') and response.tool_calls:
         print(f"   → Usando herramientas: {[tc['name'] for tc in response.tool_calls]}")
 
-        # Ejecutar cada herramienta
-        tool_results = []
-        for tool_call in response.tool_calls:
-            tool_name = tool_call['name']
-            tool_args = tool_call['args']
-
-            # Encontrar y ejecutar la herramienta
-            tool_func = next((t for t in tools if t.name == tool_name), None)
-            if tool_func:
-                result = tool_func.invoke(tool_args)
-                tool_results.append(result)
+        # Ejecutar las herramientas concurrentemente; los resultados
+        # llegan en el mismo orden que las tool calls
+        tool_messages = tool_executor.execute(response.tool_calls)
 
-        result_text = " | ".join(tool_results)
+        result_text = " | ".join(message.content for message in tool_messages)
 
     observation = {
         "step": current_step,
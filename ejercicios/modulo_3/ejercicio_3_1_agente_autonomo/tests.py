@@ -115,5 +115,76 @@ def test_graph_end_to_end():
     assert len(final_state["observations"]) > 0
 
 
+def test_tool_executor_runs_calls_concurrently_in_order():
+    """Test: Las tool calls se ejecutan en paralelo y conservan su orden"""
+    import threading
+    from langchain_core.tools import tool
+    from utils.tool_executor import ToolExecutor
+
+    # Solo se cruza la barrera si las tres llamadas corren a la vez
+    barrier = threading.Barrier(3, timeout=5)
+
+    @tool
+    def echo_together(text: str) -> str:
+        """Devuelve el texto cuando las tres llamadas han empezado."""
+        barrier.wait()
+        return text
+
+    executor = ToolExecutor([echo_together], timeouts={"echo_together": 10.0})
+    results = executor.execute([
+        {"name": "echo_together", "args": {"text": "a"}, "id": "1"},
+        {"name": "echo_together", "args": {"text": "b"}, "id": "2"},
+        {"name": "echo_together", "args": {"text": "c"}, "id": "3"},
+        {"name": "no_existe", "args": {}, "id": "4"},
+    ])
+
+    assert [m.content for m in results[:3]] == ["a", "b", "c"]
+    assert [m.tool_call_id for m in results] == ["1", "2", "3", "4"]
+    assert results[3].status == "error"
+
+
+def test_tool_executor_timeout_ignores_queue_time_and_frees_the_slot():
+    """
+    Test: El timeout cuenta desde que la herramienta empieza (no desde que
+    espera un hueco), y una herramienta que expira no bloquea las siguientes
+    """
+    import threading
+    import time
+    from langchain_core.tools import tool
+    from utils.tool_executor import ToolExecutor
+
+    release = threading.Event()
+
+    @tool
+    def sleepy(delay: float) -> str:
+        """Espera delay segundos."""
+        time.sleep(delay)
+        return "ok"
+
+    @tool
+    def stuck() -> str:
+        """No termina hasta que el test lo libera."""
+        release.wait(30)
+        return "tarde"
+
+    executor = ToolExecutor([sleepy, stuck], max_workers=1, timeouts={"sleepy": 2.0, "stuck": 0.2})
+
+    # Con un solo hueco la segunda espera a la primera: en total supera 2s
+    queued = executor.execute([
+        {"name": "sleepy", "args": {"delay": 1.2}, "id": "1"},
+        {"name": "sleepy", "args": {"delay": 1.2}, "id": "2"},
+    ])
+    assert [m.status for m in queued] == ["success", "success"]
+
+    timed_out = executor.execute([{"name": "stuck", "args": {}, "id": "3"}])
+    assert timed_out[0].status == "error"
+    assert "timeout" in timed_out[0].content
+
+    # stuck sigue corriendo, pero ya devolvió su hueco
+    after = executor.execute([{"name": "sleepy", "args": {"delay": 0.0}, "id": "4"}])
+    assert after[0].status == "success"
+    release.set()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
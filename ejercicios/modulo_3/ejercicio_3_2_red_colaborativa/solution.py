@@ -4,11 +4,18 @@ Ejercicio 3.2: Red Colaborativa con Handoffs - SOLUCIÓN COMPLETA
 Implementa una red de agentes especializados que colaboran mediante handoffs.
 """
 
-from typing import TypedDict, Literal, List, Dict
+import os
+import sys
+from typing import TypedDict, Literal, List, Dict, Iterator, AsyncIterator
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.routing import LocalRouter, routing_log_path
+from utils.streaming import stream_graph, astream_graph
+
 load_dotenv()
 
 # =============================================================================
@@ -39,22 +46,20 @@ llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 # AGENTE DE TRIAGE
 # =============================================================================
 
-def triage_agent(state: CollaborativeState) -> dict:
-    """
-    Agente de triage que analiza la consulta y deriva al especialista apropiado.
-
-    Este es el punto de entrada del sistema. Su decisión determina
-    qué especialista atenderá primero la consulta.
-
-    La clasificación debe ser precisa porque afecta todo el flujo.
-    """
-    print("\n" + "="*70)
-    print("🎯 TRIAGE AGENT: Analizando consulta...")
-    print("="*70)
+# Clasificador local del triage: solo las consultas ambiguas llegan al LLM
+triage_router = LocalRouter(
+    labels=["CODE", "NETWORK", "SECURITY"],
+    keyword_rules={
+        "CODE": ["bug", "función", "código", "excepción", "stack trace", "refactor"],
+        "NETWORK": ["puerto", "firewall", "dns", "latencia", "conectividad", "timeout"],
+        "SECURITY": ["vulnerabilidad", "autenticación", "cifrado", "certificado", "ssl", "permisos"],
+    },
+    log_path=routing_log_path("ejercicio_3_2_triage")
+)
 
-    query = state["query"]
 
-    # Usar LLM para clasificar la consulta
+def llm_triage(query: str) -> str:
+    """Clasifica la consulta con el LLM (CODE, NETWORK o SECURITY)."""
     prompt = f"""Analiza esta consulta de soporte técnico y clasifica en UNA categoría:
 
 Consulta: {query}
@@ -71,14 +76,7 @@ Clasificación:"""
     response = llm.invoke(prompt)
     category = response.content.strip().upper()
 
-    # Validar y mapear a nombre de agente
-    category_map = {
-        "CODE": "code_agent",
-        "NETWORK": "network_agent",
-        "SECURITY": "security_agent"
-    }
-
-    if category not in category_map:
+    if category not in ("CODE", "NETWORK", "SECURITY"):
         # Fallback: clasificar por keywords
         query_lower = query.lower()
         if any(kw in query_lower for kw in ["código", "code", "bug", "función", "error"]):
@@ -88,6 +86,34 @@ Clasificación:"""
         else:
             category = "SECURITY"
 
+    return category
+
+
+def triage_agent(state: CollaborativeState) -> dict:
+    """
+    Agente de triage que analiza la consulta y deriva al especialista apropiado.
+
+    Este es el punto de entrada del sistema. Su decisión determina
+    qué especialista atenderá primero la consulta.
+
+    La clasificación debe ser precisa porque afecta todo el flujo.
+    """
+    print("\n" + "="*70)
+    print("🎯 TRIAGE AGENT: Analizando consulta...")
+    print("="*70)
+
+    query = state["query"]
+
+    # Clasificar localmente o, si hay dudas, con el LLM
+    category = triage_router.classify(query, fallback=llm_triage).label
+
+    # Mapear a nombre de agente
+    category_map = {
+        "CODE": "code_agent",
+        "NETWORK": "network_agent",
+        "SECURITY": "security_agent"
+    }
+
     agent_name = category_map[category]
 
     print(f"   → Consulta clasificada como: {category}")
@@ -650,6 +676,52 @@ def build_graph():
     return workflow.compile()
 
 
+# =============================================================================
+# STREAMING
+# =============================================================================
+
+# Límite de recursión para evitar loops de handoffs
+RECURSION_LIMIT = 20
+
+
+def create_initial_state(query: str) -> CollaborativeState:
+    """Estado inicial para una consulta."""
+    return {
+        "query": query,
+        "current_agent": "",
+        "conversation_history": [],
+        "specialist_reports": {},
+        "handoff_reason": "",
+        "final_response": ""
+    }
+
+
+def stream_collaboration(query: str, app=None) -> Iterator[dict]:
+    """
+    Ejecuta la red emitiendo cada handoff como evento de progreso y los
+    tokens de la respuesta integrada del agente final.
+    """
+    app = app or build_graph()
+    yield from stream_graph(
+        app,
+        create_initial_state(query),
+        token_nodes=["final"],
+        config={"recursion_limit": RECURSION_LIMIT}
+    )
+
+
+async def astream_collaboration(query: str, app=None) -> AsyncIterator[dict]:
+    """Versión asíncrona de stream_collaboration."""
+    app = app or build_graph()
+    async for event in astream_graph(
+        app,
+        create_initial_state(query),
+        token_nodes=["final"],
+        config={"recursion_limit": RECURSION_LIMIT}
+    ):
+        yield event
+
+
 # =============================================================================
 # EJECUCIÓN Y DEMO
 # =============================================================================
@@ -673,17 +745,10 @@ def main():
         print(f"{'='*70}")
         print(f"{query}")
 
-        initial_state = {
-            "query": query,
-            "current_agent": "",
-            "conversation_history": [],
-            "specialist_reports": {},
-            "handoff_reason": "",
-            "final_response": ""
-        }
+        initial_state = create_initial_state(query)
 
         # Ejecutar con límite de recursión para evitar loops
-        final_state = app.invoke(initial_state, {"recursion_limit": 20})
+        final_state = app.invoke(initial_state, {"recursion_limit": RECURSION_LIMIT})
 
         print("\n" + "="*70)
         print("📊 RESPUESTA FINAL")
@@ -4,12 +4,24 @@ Ejercicio 4.1: Sistema de Atención al Cliente - SOLUCIÓN COMPLETA
 Sistema completo que integra routing, especialización, KB search y escalamiento.
 """
 
-from typing import TypedDict, List, Dict, Literal
+import os
+import sys
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict, List, Dict, Literal, Optional, Iterator, AsyncIterator, Tuple
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.prompt_cache import CacheablePrompt
+from utils.routing import LocalRouter, routing_log_path
+from utils.semantic_cache import SemanticCache
+from utils.streaming import stream_graph, astream_graph
+
 load_dotenv()
 
 # =============================================================================
@@ -31,10 +43,14 @@ class CustomerSupportState(TypedDict):
     confidence_score: float         # Score de confianza (0-1)
     should_escalate: bool           # Si escalar a humano
     escalation_reason: str          # Razón del escalamiento
+    speculative_hit: bool           # Si el especialista especulativo acertó
 
 
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
 
+# Marcador que el synthesizer añade cuando la consulta debe escalarse
+ESCALATION_MARKER = "[REQUIERE_ESCALAMIENTO]"
+
 
 # =============================================================================
 # KNOWLEDGE BASE (Simulado)
@@ -198,20 +214,27 @@ def search_knowledge_base(query: str, category: str, kb: Dict = knowledge_base)
 # AGENTES
 # =============================================================================
 
-def intake_agent(state: CustomerSupportState) -> dict:
-    """
-    Agente inicial que clasifica la consulta y busca en KB.
-
-    Este agente es el punto de entrada del sistema y establece
-    el contexto para todo el flujo posterior.
-    """
-    print("\n" + "="*70)
-    print("🎯 INTAKE AGENT: Clasificando consulta...")
-    print("="*70)
-
-    query = state["user_query"]
-
-    # Clasificación usando LLM
+# Clasificadores locales del intake. Categoría y urgencia se deciden por
+# separado; si alguno duda, una sola llamada al LLM resuelve ambos.
+category_router = LocalRouter(
+    labels=["product", "support", "order"],
+    keyword_rules={
+        "product": ["cuánto cuesta", "precio", "especificaciones", "specs"],
+        "support": ["no enciende", "no carga", "no funciona", "sobrecalienta"],
+        "order": ["pedido", "devolver", "devuelvo", "devolución", "reembolso", "rastreo", "envío"],
+    },
+    log_path=routing_log_path("ejercicio_4_1_category")
+)
+
+urgency_router = LocalRouter(
+    labels=["low", "medium", "high"],
+    keyword_rules={"high": ["urgente", "inmediatamente", "ya!", "¡ya"]},
+    log_path=routing_log_path("ejercicio_4_1_urgency")
+)
+
+
+def llm_classify_intake(query: str) -> Tuple[str, str]:
+    """Clasifica categoría y urgencia con el LLM."""
     classification_prompt = f"""Eres un agente de clasificación de consultas de atención al cliente para TechStore (tienda de tecnología).
 
 CONSULTA DEL USUARIO:
@@ -251,6 +274,37 @@ CLASIFICACIÓN:"""
             if urg in ["low", "medium", "high"]:
                 urgency = urg
 
+    return category, urgency
+
+
+def intake_agent(state: CustomerSupportState) -> dict:
+    """
+    Agente inicial que clasifica la consulta y busca en KB.
+
+    Este agente es el punto de entrada del sistema y establece
+    el contexto para todo el flujo posterior.
+    """
+    print("\n" + "="*70)
+    print("🎯 INTAKE AGENT: Clasificando consulta...")
+    print("="*70)
+
+    query = state["user_query"]
+
+    # Clasificación local; el LLM solo se llama (una vez) si algún router duda
+    llm_labels = {}
+
+    def classify_with_llm(text: str) -> Dict[str, str]:
+        if not llm_labels:
+            llm_labels["category"], llm_labels["urgency"] = llm_classify_intake(text)
+        return llm_labels
+
+    category = category_router.classify(
+        query, fallback=lambda text: classify_with_llm(text)["category"]
+    ).label
+    urgency = urgency_router.classify(
+        query, fallback=lambda text: classify_with_llm(text)["urgency"]
+    ).label
+
     # Buscar en knowledge base
     kb_results = search_knowledge_base(query, category)
 
@@ -416,6 +470,47 @@ ANÁLISIS DE ORDEN:"""
     return {"order_analysis": analysis}
 
 
+SYNTHESIS_PROMPT = CacheablePrompt(
+    static="""Eres un agente que genera respuestas finales profesionales para atención al cliente de TechStore.
+
+Recibirás la consulta original del usuario, el análisis del especialista,
+información de la base de conocimiento y la urgencia.
+
+Genera una RESPUESTA FINAL PROFESIONAL que:
+
+1. SALUDO: Comienza con "Estimado cliente,"
+
+2. CUERPO PRINCIPAL:
+   - Sea clara, específica y directa
+   - Use información del análisis del especialista
+   - Incluya todos los detalles relevantes
+   - Sea estructurada (usa listas, secciones si es apropiado)
+   - Proporcione pasos accionables cuando aplique
+
+3. CIERRE:
+   - Ofrezca ayuda adicional
+   - Sea cortés y profesional
+   - Firma: "Saludos, Sistema de Atención TechStore"
+
+IMPORTANTE:
+- Si el análisis menciona que necesita información de sistemas externos (órdenes, RMA, etc.)
+  que no tienes, incluye al final: [REQUIERE_ESCALAMIENTO]
+- Si la urgencia es HIGH y el problema es complejo, incluye: [REQUIERE_ESCALAMIENTO]
+- Si hay incertidumbre significativa, incluye: [REQUIERE_ESCALAMIENTO]""",
+    dynamic="""CONSULTA ORIGINAL DEL USUARIO:
+{query}
+
+ANÁLISIS DEL ESPECIALISTA ({category}):
+{specialist_analysis}
+
+{kb_summary}
+
+URGENCIA: {urgency}
+
+RESPUESTA FINAL:"""
+)
+
+
 def synthesizer_agent(state: CustomerSupportState) -> dict:
     """
     Sintetiza la respuesta final y decide si escalar.
@@ -447,44 +542,18 @@ def synthesizer_agent(state: CustomerSupportState) -> dict:
     if kb_results:
         kb_summary = f"\n\nSe encontraron {len(kb_results)} recursos en la base de conocimiento."
 
-    # Síntesis de respuesta
-    synthesis_prompt = f"""Eres un agente que genera respuestas finales profesionales para atención al cliente de TechStore.
-
-CONSULTA ORIGINAL DEL USUARIO:
-{query}
-
-ANÁLISIS DEL ESPECIALISTA ({category.upper()}):
-{specialist_analysis}
-
-{kb_summary}
-
-URGENCIA: {urgency.upper()}
-
-Genera una RESPUESTA FINAL PROFESIONAL que:
-
-1. SALUDO: Comienza con "Estimado cliente,"
-
-2. CUERPO PRINCIPAL:
-   - Sea clara, específica y directa
-   - Use información del análisis del especialista
-   - Incluya todos los detalles relevantes
-   - Sea estructurada (usa listas, secciones si es apropiado)
-   - Proporcione pasos accionables cuando aplique
-
-3. CIERRE:
-   - Ofrezca ayuda adicional
-   - Sea cortés y profesional
-   - Firma: "Saludos, Sistema de Atención TechStore"
-
-IMPORTANTE:
-- Si el análisis menciona que necesita información de sistemas externos (órdenes, RMA, etc.)
-  que no tienes, incluye al final: [REQUIERE_ESCALAMIENTO]
-- Si la urgencia es HIGH y el problema es complejo, incluye: [REQUIERE_ESCALAMIENTO]
-- Si hay incertidumbre significativa, incluye: [REQUIERE_ESCALAMIENTO]
-
-RESPUESTA FINAL:"""
-
-    response = llm.invoke(synthesis_prompt)
+    # Síntesis de respuesta: instrucciones estáticas primero, datos de la
+    # consulta al final. Las instrucciones (~250 tokens) no alcanzan el
+    # prefijo mínimo cacheable (SYNTHESIS_PROMPT.cacheable es False), así que
+    # esta llamada no obtiene descuento de prompt caching
+    response = llm.invoke(SYNTHESIS_PROMPT.messages(
+        llm,
+        query=query,
+        category=category.upper(),
+        specialist_analysis=specialist_analysis,
+        kb_summary=kb_summary,
+        urgency=urgency.upper()
+    ))
     final_response = response.content
 
     # Calcular confidence score
@@ -518,11 +587,11 @@ RESPUESTA FINAL:"""
     escalation_reason = ""
 
     # Criterio 1: Respuesta indica que requiere escalamiento
-    if "[REQUIERE_ESCALAMIENTO]" in final_response:
+    if ESCALATION_MARKER in final_response:
         should_escalate = True
         escalation_reason = "La consulta requiere acceso a sistemas externos o validación manual"
         # Remover el tag de la respuesta
-        final_response = final_response.replace("[REQUIERE_ESCALAMIENTO]", "").strip()
+        final_response = final_response.replace(ESCALATION_MARKER, "").strip()
 
     # Criterio 2: Confidence muy bajo
     elif confidence < 0.5:
@@ -585,6 +654,92 @@ def escalate_node(state: CustomerSupportState) -> dict:
     return {}
 
 
+# =============================================================================
+# EJECUCIÓN ESPECULATIVA
+# =============================================================================
+
+def pre_classify(query: str) -> Tuple[Optional[str], float]:
+    """
+    Pre-clasificación barata, sin LLM: la decisión local de
+    category_router (mismas reglas de palabras clave y modelo que el intake).
+
+    Returns:
+        (categoría, confianza), o (None, 0.0) si el router no tiene
+        confianza suficiente y no hay evidencia para especular.
+    """
+    decision = category_router.predict_local(query)
+    if decision is None:
+        return None, 0.0
+    return decision.label, decision.confidence
+
+
+def speculative_intake_agent(state: CustomerSupportState) -> dict:
+    """
+    Intake con ejecución especulativa del especialista.
+
+    Solo especula cuando el intake va a necesitar al LLM, es decir, cuando
+    category_router o urgency_router dudan. Si ambos deciden localmente el
+    intake no tiene latencia que ocultar y se ejecuta el flujo normal, sin
+    thread pool ni llamadas extra.
+
+    El especialista supuesto es la categoría local (pre_classify) si la
+    hay: entonces solo duda la urgencia y la especulación siempre acierta.
+    Si duda la categoría, se usa la suposición del router (reglas ambiguas
+    o modelo por debajo del umbral). El especialista corre en paralelo con
+    la clasificación LLM del intake; si coinciden, el análisis ya está
+    listo y el grafo pasa directo al synthesizer; si no, se descarta.
+
+    Costo de fallar: ``future.cancel()`` no detiene un especialista que ya
+    está en ejecución, así que su llamada al LLM se completa y sus tokens se
+    pagan igual: cada especulación fallida cuesta una llamada de
+    especialista extra.
+    """
+    query = state["user_query"]
+    local_category, _ = pre_classify(query)
+    # El intake llama al LLM si cualquiera de los dos routers duda
+    needs_llm = local_category is None or urgency_router.predict_local(query) is None
+    if local_category is not None:
+        predicted = local_category
+    else:
+        guess = category_router.guess(query)
+        predicted = guess.label if guess is not None else None
+
+    if not needs_llm or predicted is None:
+        return {**intake_agent(state), "speculative_hit": False}
+
+    specialists = {
+        "product": product_agent,
+        "support": support_agent,
+        "order": order_agent,
+    }
+    speculative_state = {
+        **state,
+        "category": predicted,
+        "kb_results": search_knowledge_base(query, predicted)
+    }
+
+    # Cada hilo copia el contexto para conservar callbacks y tracing del nodo
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        intake_future = executor.submit(contextvars.copy_context().run, intake_agent, state)
+        specialist_future = executor.submit(
+            contextvars.copy_context().run, specialists[predicted], speculative_state
+        )
+        intake_result = intake_future.result()
+
+        if intake_result["category"] == predicted:
+            print(f"   ⚡ Especulación acertada: {predicted.upper()}")
+            return {**intake_result, **specialist_future.result(), "speculative_hit": True}
+
+        print(f"   ⚡ Especulación descartada: {predicted.upper()} ≠ {intake_result['category'].upper()}")
+        # Solo evita el especialista si aún no empezó; si ya corre, su llamada se paga
+        specialist_future.cancel()
+        return {**intake_result, "speculative_hit": False}
+    finally:
+        # No esperar a un especialista descartado: su resultado se ignora
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
 # =============================================================================
 # FUNCIONES DE ROUTING
 # =============================================================================
@@ -607,6 +762,15 @@ def route_to_specialist(state: CustomerSupportState) -> Literal["product", "supp
     return next_node
 
 
+def route_after_speculative_intake(
+    state: CustomerSupportState
+) -> Literal["product", "support", "order", "synthesizer"]:
+    """Salta al synthesizer si el especialista especulativo ya respondió."""
+    if state.get("speculative_hit"):
+        return "synthesizer"
+    return route_to_specialist(state)
+
+
 def route_after_synthesis(state: CustomerSupportState) -> Literal["respond", "escalate"]:
     """Decide si responder directamente o escalar a humano."""
     should_escalate = state["should_escalate"]
@@ -621,7 +785,7 @@ def route_after_synthesis(state: CustomerSupportState) -> Literal["respond", "es
 # CONSTRUCCIÓN DEL GRAFO
 # =============================================================================
 
-def build_graph():
+def build_graph(speculative: bool = False):
     """
     Construye el grafo del sistema de atención al cliente.
 
@@ -631,11 +795,16 @@ def build_graph():
     - Especialista analiza en su dominio
     - Synthesizer integra y decide escalamiento
     - Router final decide responder o escalar
+
+    Args:
+        speculative: Si el intake necesita al LLM, ejecutar el especialista
+                     más probable en paralelo con la clasificación
+                     (ver speculative_intake_agent)
     """
     workflow = StateGraph(CustomerSupportState)
 
     # Agregar todos los nodos
-    workflow.add_node("intake", intake_agent)
+    workflow.add_node("intake", speculative_intake_agent if speculative else intake_agent)
     workflow.add_node("product", product_agent)
     workflow.add_node("support", support_agent)
     workflow.add_node("order", order_agent)
@@ -647,15 +816,27 @@ def build_graph():
     workflow.set_entry_point("intake")
 
     # Routing condicional a especialista
-    workflow.add_conditional_edges(
-        "intake",
-        route_to_specialist,
-        {
-            "product": "product",
-            "support": "support",
-            "order": "order"
-        }
-    )
+    if speculative:
+        workflow.add_conditional_edges(
+            "intake",
+            route_after_speculative_intake,
+            {
+                "product": "product",
+                "support": "support",
+                "order": "order",
+                "synthesizer": "synthesizer"
+            }
+        )
+    else:
+        workflow.add_conditional_edges(
+            "intake",
+            route_to_specialist,
+            {
+                "product": "product",
+                "support": "support",
+                "order": "order"
+            }
+        )
 
     # Todos los especialistas van a synthesizer
     workflow.add_edge("product", "synthesizer")
@@ -679,6 +860,164 @@ def build_graph():
     return workflow.compile()
 
 
+# =============================================================================
+# STREAMING
+# =============================================================================
+
+def create_initial_state(query: str, user_id: str) -> CustomerSupportState:
+    """Estado inicial para una consulta."""
+    return {
+        "user_query": query,
+        "user_id": user_id,
+        "conversation_history": [HumanMessage(content=query)],
+        "category": "",
+        "urgency": "",
+        "product_analysis": "",
+        "support_analysis": "",
+        "order_analysis": "",
+        "kb_results": [],
+        "final_response": "",
+        "confidence_score": 0.0,
+        "should_escalate": False,
+        "escalation_reason": "",
+        "speculative_hit": False
+    }
+
+
+def stream_support_response(query: str, user_id: str = "anonymous", app=None) -> Iterator[dict]:
+    """
+    Ejecuta el grafo emitiendo el progreso de cada nodo y los tokens de
+    la respuesta final a medida que el synthesizer los genera.
+
+    El marcador de escalamiento se filtra del stream igual que se elimina
+    de final_response. El último evento ("final") trae el estado completo.
+    """
+    app = app or build_graph()
+    yield from stream_graph(
+        app,
+        create_initial_state(query, user_id),
+        token_nodes=["synthesizer"],
+        hidden_markers=[ESCALATION_MARKER]
+    )
+
+
+async def astream_support_response(query: str, user_id: str = "anonymous", app=None) -> AsyncIterator[dict]:
+    """Versión asíncrona de stream_support_response."""
+    app = app or build_graph()
+    async for event in astream_graph(
+        app,
+        create_initial_state(query, user_id),
+        token_nodes=["synthesizer"],
+        hidden_markers=[ESCALATION_MARKER]
+    ):
+        yield event
+
+
+# =============================================================================
+# CACHE SEMÁNTICA DE RESPUESTAS
+# =============================================================================
+
+# Versión de la knowledge base: se incrementa en cada escritura, así la
+# cache compara un entero en cada consulta en lugar de serializar la KB
+_knowledge_base_version = 0
+_knowledge_base_lock = threading.Lock()
+
+
+def knowledge_base_version() -> int:
+    """Versión actual de la knowledge base (cambia con cada escritura)."""
+    return _knowledge_base_version
+
+
+def add_to_knowledge_base(section: str, entry: Dict) -> int:
+    """
+    Añade una entrada a una sección de la KB ("products", "faqs",
+    "technical_docs") e incrementa la versión.
+
+    Las escrituras deben pasar por aquí: una modificación directa del
+    dict no invalida las respuestas cacheadas.
+
+    Returns:
+        Nueva versión de la knowledge base
+    """
+    global _knowledge_base_version
+    with _knowledge_base_lock:
+        knowledge_base.setdefault(section, []).append(entry)
+        _knowledge_base_version += 1
+        return _knowledge_base_version
+
+
+# Nombres de producto del catálogo: distinguen consultas aunque el usuario
+# los escriba en minúsculas ("laptop pro x15" vs "laptop pro x15 gaming")
+PRODUCT_TERMS = sorted({
+    word for product in knowledge_base["products"] for word in product["name"].split()
+})
+
+# Las respuestas cacheadas dependen de la KB: si cambia, la cache se vacía
+response_cache = SemanticCache(
+    threshold=0.85,
+    version_fn=knowledge_base_version,
+    key_terms=PRODUCT_TERMS
+)
+
+
+def invalidate_response_cache(category: Optional[str] = None):
+    """Hook para invalidar la cache tras actualizar la knowledge base."""
+    response_cache.invalidate(category)
+
+
+def answer_query(
+    query: str,
+    user_id: str = "anonymous",
+    app=None,
+    cache: Optional[SemanticCache] = None
+) -> dict:
+    """
+    Responde una consulta pasando primero por la cache semántica.
+
+    La categoría se obtiene con el clasificador local (sin LLM); si no
+    hay confianza suficiente no se consulta la cache y se ejecuta el
+    grafo. Solo se cachean respuestas que no se escalaron a un humano.
+
+    Returns:
+        Estado final (o equivalente desde cache) con la clave "cache":
+        {"hit": False} o la procedencia de la respuesta cacheada.
+    """
+    cache = cache or response_cache
+
+    local = category_router.predict_local(query)
+    if local is not None:
+        hit = cache.lookup(query, local.label)
+        if hit is not None:
+            print(f"   ⚡ Respuesta desde cache (similitud {hit['similarity']:.2f})")
+            return {
+                **create_initial_state(query, user_id),
+                "category": local.label,
+                "final_response": hit["response"],
+                "confidence_score": hit["metadata"].get("confidence_score", 0.0),
+                "cache": {
+                    "hit": True,
+                    "similarity": hit["similarity"],
+                    "cached_query": hit["cached_query"],
+                    "cached_at": hit["created_at"],
+                    "hits": hit["hits"],
+                    "kb_version": hit["version"]
+                }
+            }
+
+    app = app or build_graph()
+    final_state = app.invoke(create_initial_state(query, user_id))
+
+    if not final_state["should_escalate"] and final_state["final_response"]:
+        cache.store(
+            query,
+            final_state["category"],
+            final_state["final_response"],
+            metadata={"confidence_score": final_state["confidence_score"]}
+        )
+
+    return {**final_state, "cache": {"hit": False}}
+
+
 # =============================================================================
 # EJECUCIÓN Y DEMO
 # =============================================================================
@@ -710,21 +1049,7 @@ def main():
         print(f"{'='*70}")
         print(f"Query: {query}")
 
-        initial_state = {
-            "user_query": query,
-            "user_id": user_id,
-            "conversation_history": [HumanMessage(content=query)],
-            "category": "",
-            "urgency": "",
-            "product_analysis": "",
-            "support_analysis": "",
-            "order_analysis": "",
-            "kb_results": [],
-            "final_response": "",
-            "confidence_score": 0.0,
-            "should_escalate": False,
-            "escalation_reason": ""
-        }
+        initial_state = create_initial_state(query, user_id)
 
         # Ejecutar grafo
         final_state = app.invoke(initial_state)
@@ -15,8 +15,19 @@ from solution import (
     route_after_synthesis,
     CustomerSupportState,
     knowledge_base,
+    stream_support_response,
+    ESCALATION_MARKER,
+    create_initial_state,
+    pre_classify,
+    answer_query,
+    knowledge_base_version,
+    add_to_knowledge_base,
+    PRODUCT_TERMS,
 )
-from langchain_core.messages import HumanMessage
+from utils.semantic_cache import SemanticCache
+import solution
+from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
 
 
 def test_search_knowledge_base_finds_products():
@@ -431,5 +442,167 @@ def test_kb_search_relevance_ranking():
         assert results[0].get("relevance", 0) >= results[1].get("relevance", 0)
 
 
+def test_stream_support_response_emits_final_tokens(monkeypatch):
+    """Test: El streaming emite progreso de nodos y tokens solo del synthesizer"""
+    fake_llm = GenericFakeChatModel(messages=iter([
+        AIMessage(content="CATEGORY: SUPPORT\nURGENCY: LOW"),
+        AIMessage(content="Reiniciar el equipo y revisar el cargador."),
+        AIMessage(content=f"Estimado cliente, reinicie el equipo. {ESCALATION_MARKER}"),
+    ]))
+    monkeypatch.setattr(solution, "llm", fake_llm)
+
+    events = list(stream_support_response("Mi teléfono no carga", "user_002"))
+
+    started = [e["node"] for e in events if e["type"] == "node_start"]
+    assert started[:3] == ["intake", "support", "synthesizer"]
+
+    tokens = [e for e in events if e["type"] == "token"]
+    assert tokens and all(e["node"] == "synthesizer" for e in tokens)
+
+    final_state = events[-1]["state"]
+    assert events[-1]["type"] == "final"
+    streamed = "".join(e["content"] for e in tokens)
+    # El marcador de escalamiento no llega al usuario
+    assert ESCALATION_MARKER not in streamed
+    assert streamed.strip() == final_state["final_response"]
+    assert final_state["should_escalate"]
+
+
+class _ClassifyingLLM:
+    """LLM de prueba: clasifica con una categoría fija y registra las llamadas."""
+
+    def __init__(self, category: str):
+        self.category = category
+        self.prompts = []
+
+    def invoke(self, prompt: str) -> AIMessage:
+        self.prompts.append(prompt)
+        if "Clasifica la consulta" in prompt:
+            return AIMessage(content=f"CATEGORY: {self.category}\nURGENCY: LOW")
+        return AIMessage(content="Análisis detallado " * 10)
+
+
+def test_pre_classify_uses_keywords():
+    """Test: El pre-clasificador usa las reglas del router de categorías"""
+    assert pre_classify("Mi teléfono no carga")[0] == "support"
+    assert pre_classify("Quiero devolver mi pedido")[0] == "order"
+    assert pre_classify("Hola")[1] == 0
+
+
+def test_speculative_graph_skips_specialist_on_hit(monkeypatch):
+    """Test: Si la especulación acierta, el especialista no se ejecuta dos veces"""
+    fake_llm = _ClassifyingLLM("SUPPORT")
+    monkeypatch.setattr(solution, "llm", fake_llm)
+
+    # Reglas de dos categorías (support y order): el intake necesita al LLM
+    app = build_graph(speculative=True)
+    final_state = app.invoke(create_initial_state("Mi pedido llegó y no carga", "user_002"))
+
+    assert final_state["speculative_hit"]
+    assert final_state["support_analysis"]
+    specialist_calls = [p for p in fake_llm.prompts if "ANÁLISIS DE SOPORTE TÉCNICO" in p]
+    assert len(specialist_calls) == 1
+
+
+def test_speculative_graph_discards_on_mismatch(monkeypatch):
+    """Test: Si la especulación falla, se usa el especialista del intake"""
+    monkeypatch.setattr(solution, "llm", _ClassifyingLLM("ORDER"))
+
+    app = build_graph(speculative=True)
+    final_state = app.invoke(create_initial_state("Mi pedido llegó y no carga", "user_002"))
+
+    assert not final_state["speculative_hit"]
+    assert final_state["category"] == "order"
+    assert final_state["order_analysis"]
+    assert final_state["support_analysis"] == ""
+
+
+def test_speculative_graph_speculates_when_only_urgency_needs_llm(monkeypatch):
+    """Test: Sin palabras de urgencia el intake llama al LLM, así que se especula con la categoría local"""
+    fake_llm = _ClassifyingLLM("SUPPORT")
+    monkeypatch.setattr(solution, "llm", fake_llm)
+
+    app = build_graph(speculative=True)
+    final_state = app.invoke(create_initial_state("Mi teléfono no carga", "user_002"))
+
+    assert final_state["speculative_hit"]
+    assert final_state["category"] == "support"
+    assert final_state["support_analysis"]
+    specialist_calls = [p for p in fake_llm.prompts if "ANÁLISIS DE SOPORTE TÉCNICO" in p]
+    assert len(specialist_calls) == 1
+
+
+def test_speculative_graph_does_not_speculate_on_local_decisions(monkeypatch):
+    """Test: Si el router decide localmente no hay especulación ni clasificación LLM"""
+    fake_llm = _ClassifyingLLM("ORDER")
+    monkeypatch.setattr(solution, "llm", fake_llm)
+
+    app = build_graph(speculative=True)
+    final_state = app.invoke(create_initial_state("Mi teléfono no carga, es urgente", "user_002"))
+
+    assert not final_state["speculative_hit"]
+    assert final_state["category"] == "support"
+    assert not any("Clasifica la consulta" in p for p in fake_llm.prompts)
+    assert not final_state["order_analysis"]
+
+
+def test_answer_query_serves_near_duplicates_from_cache(monkeypatch):
+    """Test: Una consulta casi idéntica se responde desde cache sin LLM"""
+    fake_llm = _ClassifyingLLM("SUPPORT")
+    monkeypatch.setattr(solution, "llm", fake_llm)
+    cache = SemanticCache(threshold=0.85, version_fn=knowledge_base_version, key_terms=PRODUCT_TERMS)
+    app = build_graph()
+
+    first = answer_query("Mi smartphone no carga", "user_001", app=app, cache=cache)
+    assert not first["cache"]["hit"]
+    calls = len(fake_llm.prompts)
+
+    second = answer_query("mi smartphone ya no carga", "user_002", app=app, cache=cache)
+    assert second["cache"]["hit"]
+    assert second["cache"]["cached_query"] == "Mi smartphone no carga"
+    assert second["final_response"] == first["final_response"]
+    assert len(fake_llm.prompts) == calls
+
+
+def test_answer_query_cache_invalidated_when_kb_changes(monkeypatch):
+    """Test: Cambiar la knowledge base invalida las respuestas cacheadas"""
+    monkeypatch.setattr(solution, "llm", _ClassifyingLLM("SUPPORT"))
+    cache = SemanticCache(threshold=0.85, version_fn=knowledge_base_version, key_terms=PRODUCT_TERMS)
+    app = build_graph()
+
+    answer_query("Mi smartphone no carga", "user_001", app=app, cache=cache)
+    # Copia restaurada al terminar el test; la escritura incrementa la versión
+    monkeypatch.setitem(knowledge_base, "faqs", list(knowledge_base["faqs"]))
+    add_to_knowledge_base("faqs", {"question": "¿Hay cargadores?", "answer": "Sí, originales.", "category": "policy"})
+
+    result = answer_query("Mi smartphone no carga", "user_001", app=app, cache=cache)
+    assert not result["cache"]["hit"]
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_semantic_cache_does_not_mix_products():
+    """Test: Consultas casi idénticas sobre productos distintos no comparten respuesta"""
+    cache = SemanticCache(threshold=0.85, key_terms=PRODUCT_TERMS)
+    cache.store("¿Cuánto cuesta la Laptop Pro X15?", "product", "$1,299.99")
+    cache.store("¿Tienen la X1 en stock?", "product", "Sí, X1 disponible")
+    cache.store("Precio del Galaxy S23", "product", "$799")
+
+    assert cache.lookup("¿Cuánto cuesta la Laptop Pro X15 Gaming?", "product") is None
+    assert cache.lookup("¿cuánto cuesta la laptop pro x15 gaming?", "product") is None
+    assert cache.lookup("¿Tienen la X2 en stock?", "product") is None
+    assert cache.lookup("Precio del Galaxy S24", "product") is None
+    # La misma consulta con otro formato sí es un acierto
+    assert cache.lookup("cuanto cuesta la laptop pro x15", "product")["response"] == "$1,299.99"
+
+
+def test_semantic_cache_does_not_serve_negated_queries():
+    """Test: Una consulta negada no recibe la respuesta de la afirmativa"""
+    cache = SemanticCache(threshold=0.85, key_terms=PRODUCT_TERMS)
+    cache.store("Quiero devolver mi pedido", "order", "Inicie la devolución")
+
+    assert cache.lookup("No quiero devolver mi pedido", "order") is None
+    assert cache.lookup("quiero devolver mi pedido", "order")["response"] == "Inicie la devolución"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
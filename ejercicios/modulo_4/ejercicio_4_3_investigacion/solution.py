@@ -2,11 +2,17 @@
 Ejercicio 4.3: Asistente de Investigación - SOLUCIÓN COMPLETA
 """
 
-from typing import TypedDict, List, Dict
+import os
+import sys
+from typing import TypedDict, List, Dict, Iterator, AsyncIterator
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.streaming import stream_graph, astream_graph
+
 load_dotenv()
 
 class ResearchState(TypedDict):
@@ -205,6 +211,30 @@ def build_graph():
 
     return workflow.compile()
 
+def create_initial_state(topic: str) -> ResearchState:
+    """Estado inicial para un tema de investigación."""
+    return {
+        "topic": topic,
+        "research_plan": "",
+        "web_findings": [],
+        "doc_findings": [],
+        "analysis": "",
+        "report": "",
+        "confidence": 0.0,
+        "validated": False
+    }
+
+def stream_research(topic: str, app=None) -> Iterator[dict]:
+    """Ejecuta la investigación emitiendo progreso y los tokens del reporte."""
+    app = app or build_graph()
+    yield from stream_graph(app, create_initial_state(topic), token_nodes=["synthesizer"])
+
+async def astream_research(topic: str, app=None) -> AsyncIterator[dict]:
+    """Versión asíncrona de stream_research."""
+    app = app or build_graph()
+    async for event in astream_graph(app, create_initial_state(topic), token_nodes=["synthesizer"]):
+        yield event
+
 def main():
     print("="*70)
     print("🔬 ASISTENTE DE INVESTIGACIÓN EMPRESARIAL")
@@ -222,16 +252,7 @@ def main():
         print(f"📊 INVESTIGACIÓN {i}: {topic}")
         print(f"{'='*70}")
 
-        initial_state = {
-            "topic": topic,
-            "research_plan": "",
-            "web_findings": [],
-            "doc_findings": [],
-            "analysis": "",
-            "report": "",
-            "confidence": 0.0,
-            "validated": False
-        }
+        initial_state = create_initial_state(topic)
 
         final_state = app.invoke(initial_state)
 
@@ -22,6 +22,7 @@ from utils.langsmith_config import (
     trace_agent
 )
 from utils.llm_config import get_llm
+from utils.tool_cache import cached_tool
 
 
 # ============================================================================
@@ -69,6 +70,7 @@ class DocumentState(TypedDict):
 # ✅ CORRECCIÓN: Descripciones claras y específicas
 
 @tool
+@cached_tool(pure=True)
 def extract_pdf_text(document: str) -> str:
     """
     Extract text from PDF documents.
@@ -628,6 +630,10 @@ Pasos para verificar en LangSmith:
 2. Filtra por tag:comparison
 3. Compara métricas de runs individuales
 4. Exporta datos para análisis detallado
+
+Las cifras anteriores son estimaciones. Para medir llamadas LLM, tokens y
+latencia por nodo sin API keys (y detectar regresiones):
+   python -m benchmarks.run --only 4_4
 """)
 
 
@@ -185,7 +185,7 @@ notebooks_to_create = [
                 "execution_count": None,
                 "metadata": {},
                 "outputs": [],
-                "source": "from typing import Annotated\nfrom langchain_core.messages import HumanMessage\nfrom langchain_core.tools import tool\nfrom langgraph.prebuilt import ToolNode\nimport operator\n\nclass AgentState(TypedDict):\n    messages: Annotated[list, operator.add]\n\n# Herramientas\n@tool\ndef search_web(query: str) -> str:\n    '''Busca en internet. Usa para info actual.'''\n    return f'Resultados: {query}'\n\n@tool\ndef calculator(expression: str) -> str:\n    '''Calcula. Usa para matemáticas.'''\n    return f'Resultado: {eval(expression)}'\n\nprint('✅ Herramientas definidas')"
+                "source": "from typing import Annotated\nfrom langchain_core.messages import HumanMessage\nfrom langchain_core.tools import tool\nfrom langgraph.prebuilt import ToolNode\nimport operator\n\nfrom utils.safe_math import safe_eval  # evaluador aritmético seguro (sin eval)\n\nclass AgentState(TypedDict):\n    messages: Annotated[list, operator.add]\n\n# Herramientas\n@tool\ndef search_web(query: str) -> str:\n    '''Busca en internet. Usa para info actual.'''\n    return f'Resultados: {query}'\n\n@tool\ndef calculator(expression: str) -> str:\n    '''Calcula. Usa para matemáticas.'''\n    return f'Resultado: {safe_eval(expression)}'\n\nprint('✅ Herramientas definidas')"
             },
             {
                 "cell_type": "code",
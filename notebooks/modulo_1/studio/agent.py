@@ -1,9 +1,16 @@
+import os
+import sys
+
 from langchain_core.messages import SystemMessage
 from langchain_openai import ChatOpenAI
 
 from langgraph.graph import START, StateGraph, MessagesState
 from langgraph.prebuilt import tools_condition, ToolNode
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.context_window import ContextWindowManager
+
 def add(a: int, b: int) -> int:
     """Adds a and b.
 
@@ -40,9 +47,13 @@ llm_with_tools = llm.bind_tools(tools)
 # System message
 sys_msg = SystemMessage(content="You are a helpful assistant tasked with writing performing arithmetic on a set of inputs.")
 
+# Token budget per LLM call: keeps the task and the most recent tool steps
+context_window = ContextWindowManager(max_tokens=3000)
+
 # Node
 def assistant(state: MessagesState):
-   return {"messages": [llm_with_tools.invoke([sys_msg] + state["messages"])]}
+   messages = context_window.fit(state["messages"], system=sys_msg)
+   return {"messages": [llm_with_tools.invoke(messages)]}
 
 # Build graph
 builder = StateGraph(MessagesState)
@@ -1,4 +1,6 @@
 import operator
+import os
+import sys
 from typing import Annotated
 from typing_extensions import TypedDict
 
@@ -6,9 +8,13 @@ from pydantic import BaseModel
 
 from langchain_openai import ChatOpenAI 
 
-from langgraph.constants import Send
 from langgraph.graph import END, StateGraph, START
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.batching import StructuredBatcher
+from utils.fanout import SendScheduler
+
 # Prompts we will use
 subjects_prompt = """Generate a list of 3 sub-topics that are all related to this overall topic: {topic}."""
 joke_prompt = """Generate a joke about {subject}"""
@@ -29,22 +35,27 @@ class OverallState(TypedDict):
     subjects: list
     jokes: Annotated[list, operator.add]
     best_selected_joke: str
+    jokes_dispatched: int
 
 def generate_topics(state: OverallState):
     prompt = subjects_prompt.format(topic=state["topic"])
     response = model.with_structured_output(Subjects).invoke(prompt)
-    return {"subjects": response.subjects}
+    return {"subjects": response.subjects, **joke_scheduler.reset()}
 
 class JokeState(TypedDict):
-    subject: str
+    subjects: list
 
 class Joke(BaseModel):
     joke: str
 
+# Several jokes per structured-output call (split / retried automatically)
+JOKES_PER_CALL = 5
+joke_batcher = StructuredBatcher(model, Joke, max_batch_size=JOKES_PER_CALL)
+
 def generate_joke(state: JokeState):
-    prompt = joke_prompt.format(subject=state["subject"])
-    response = model.with_structured_output(Joke).invoke(prompt)
-    return {"jokes": [response.joke]}
+    prompts = [joke_prompt.format(subject=subject) for subject in state["subjects"]]
+    responses = joke_batcher.map(prompts)
+    return {"jokes": [response.joke for response in responses]}
 
 def best_joke(state: OverallState):
     jokes = "\n\n".join(state["jokes"])
@@ -52,17 +63,28 @@ def best_joke(state: OverallState):
     response = model.with_structured_output(BestJoke).invoke(prompt)
     return {"best_selected_joke": state["jokes"][response.id]}
 
-def continue_to_jokes(state: OverallState):
-    return [Send("generate_joke", {"subject": s}) for s in state["subjects"]]
+# Send one generate_joke per batch of subjects, at most 4 at a time
+joke_scheduler = SendScheduler(
+    node="generate_joke",
+    items_key="subjects",
+    make_input=lambda state, subjects: {"subjects": subjects},
+    cursor_key="jokes_dispatched",
+    max_concurrency=4,
+    batch_size=JOKES_PER_CALL
+)
+
+continue_to_jokes = joke_scheduler.route(then="best_joke")
 
 # Construct the graph: here we put everything together to construct our graph
 graph_builder = StateGraph(OverallState)
 graph_builder.add_node("generate_topics", generate_topics)
+graph_builder.add_node("schedule_jokes", joke_scheduler.schedule)
 graph_builder.add_node("generate_joke", generate_joke)
 graph_builder.add_node("best_joke", best_joke)
 graph_builder.add_edge(START, "generate_topics")
-graph_builder.add_conditional_edges("generate_topics", continue_to_jokes, ["generate_joke"])
-graph_builder.add_edge("generate_joke", "best_joke")
+graph_builder.add_edge("generate_topics", "schedule_jokes")
+graph_builder.add_conditional_edges("schedule_jokes", continue_to_jokes, ["generate_joke", "best_joke"])
+graph_builder.add_edge("generate_joke", "schedule_jokes")
 graph_builder.add_edge("best_joke", END)
 
 # Compile the graph
@@ -10,25 +10,38 @@ Conceptos:
 - Routing dinámico basado en decisiones del orchestrator
 - Loops: Re-planificación hasta completar la tarea
 - Arquitectura de coordinación inteligente
+- Modo DAG: el plan completo en una llamada y workers independientes en paralelo
 
 Este grafo se puede abrir en LangGraph Studio.
 """
 
-from typing import TypedDict, List
+import operator
+from typing import Annotated, TypedDict, List, Dict, Literal
+from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 
 
 # =============================================================================
 # State Definition
 # =============================================================================
 
+def merge_task_results(left: Dict[str, str], right: Dict[str, str]) -> Dict[str, str]:
+    """Reducer: combina los resultados por tarea de workers en paralelo."""
+    return {**(left or {}), **(right or {})}
+
+
 class OrchestratorState(TypedDict):
     """Estado del sistema orchestrator-workers."""
     query: str                  # Consulta original del usuario
     plan: str                   # Plan actual del orchestrator
-    worker_results: List[str]   # Resultados de workers ejecutados
+    worker_results: Annotated[List[str], operator.add]  # Resultados de workers ejecutados
     final_answer: str           # Respuesta final consolidada
+    # Modo DAG
+    tasks: List[dict]           # Tareas del plan: id, worker, instruction, depends_on
+    task_results: Annotated[Dict[str, str], merge_task_results]  # Resultado por id de tarea
+    replans: int                # Re-planificaciones hechas
 
 
 # =============================================================================
@@ -136,13 +149,11 @@ Instrucciones:
     response = llm.invoke(prompt)
     result = f"[SEARCH] {response.content}"
 
-    # Agregar a resultados existentes
-    current_results = state.get('worker_results', [])
-    updated_results = current_results + [result]
+    # El reducer operator.add lo agrega a los resultados existentes
 
     print(f'   ✅ Búsqueda completada')
 
-    return {'worker_results': updated_results}
+    return {'worker_results': [result]}
 
 
 def analyze_worker(state: OrchestratorState) -> dict:
@@ -172,13 +183,11 @@ Instrucciones:
     response = llm.invoke(prompt)
     result = f"[ANALYZE] {response.content}"
 
-    # Agregar a resultados existentes
-    current_results = state.get('worker_results', [])
-    updated_results = current_results + [result]
+    # El reducer operator.add lo agrega a los resultados existentes
 
     print(f'   ✅ Análisis completado')
 
-    return {'worker_results': updated_results}
+    return {'worker_results': [result]}
 
 
 def calculate_worker(state: OrchestratorState) -> dict:
@@ -208,13 +217,11 @@ Instrucciones:
     response = llm.invoke(prompt)
     result = f"[CALCULATE] {response.content}"
 
-    # Agregar a resultados existentes
-    current_results = state.get('worker_results', [])
-    updated_results = current_results + [result]
+    # El reducer operator.add lo agrega a los resultados existentes
 
     print(f'   ✅ Cálculos completados')
 
-    return {'worker_results': updated_results}
+    return {'worker_results': [result]}
 
 
 # =============================================================================
@@ -288,14 +295,253 @@ def route_decision(state: OrchestratorState) -> str:
         return 'synthesize'
 
 
+# =============================================================================
+# DAG Planning Mode
+# =============================================================================
+#
+# En el modo loop cada worker cuesta una llamada extra al orchestrator y los
+# workers corren uno detrás de otro. En el modo DAG el orchestrator planifica
+# TODAS las tareas (con sus dependencias) en una sola llamada; las tareas sin
+# dependencias pendientes se lanzan en paralelo con Send, y solo se vuelve a
+# planificar si el resultado de un worker invalida el plan.
+
+MAX_REPLANS = 2
+REPLAN_MARKER = "REPLAN:"
+
+WORKER_ROLES = {
+    "search_worker": ("búsqueda de información", "SEARCH", "Búsqueda completada"),
+    "analyze_worker": ("análisis de datos", "ANALYZE", "Análisis completado"),
+    "calculate_worker": ("cálculos y operaciones", "CALCULATE", "Cálculo completado"),
+}
+
+
+class PlannedTask(BaseModel):
+    """Una tarea del plan."""
+    id: str = Field(description="Identificador corto y único, p. ej. 't1'")
+    worker: Literal["search_worker", "analyze_worker", "calculate_worker"]
+    instruction: str = Field(description="Qué debe hacer el worker, en una frase")
+    depends_on: List[str] = Field(default_factory=list, description="Ids de tareas cuyo resultado necesita")
+
+
+class WorkerPlan(BaseModel):
+    """Plan completo: un DAG de tareas."""
+    tasks: List[PlannedTask]
+
+
+class TaskState(TypedDict):
+    """Input de un worker en modo DAG (vía Send)."""
+    query: str
+    task: dict
+    context: List[str]
+
+
+def normalize_plan(tasks: List[PlannedTask], version: int) -> List[dict]:
+    """
+    Convierte el plan del LLM en un DAG válido.
+
+    Los ids se prefijan con la versión del plan para no chocar con tareas de
+    planes anteriores, y las tareas se ordenan topológicamente: una tarea
+    puede depender de otra que el modelo listó después. Solo se descarta lo
+    que no se puede ejecutar, y se avisa de ello:
+    - ids repetidos (se queda la primera tarea con ese id)
+    - dependencias hacia ids que no existen en el plan
+    - tareas en un ciclo, o que dependen de una tarea en un ciclo
+    """
+    by_id: Dict[str, PlannedTask] = {}
+    for task in tasks:
+        if task.id in by_id:
+            print(f"   ⚠️  Tarea {task.id} repetida en el plan: se ignora la copia")
+            continue
+        by_id[task.id] = task
+
+    depends_on: Dict[str, List[str]] = {}
+    for task_id, task in by_id.items():
+        unknown = [dep for dep in task.depends_on if dep not in by_id]
+        if unknown:
+            print(f"   ⚠️  {task_id}: se ignoran dependencias desconocidas {unknown}")
+        depends_on[task_id] = list(dict.fromkeys(dep for dep in task.depends_on if dep in by_id))
+
+    # Kahn por oleadas, conservando el orden del plan dentro de cada oleada
+    ordered: List[str] = []
+    pending = list(by_id)
+    while pending:
+        placed = set(ordered)
+        ready = [task_id for task_id in pending if all(dep in placed for dep in depends_on[task_id])]
+        if not ready:
+            print(f"   ⚠️  Se descartan tareas en un ciclo (o que dependen de uno): {pending}")
+            break
+        ordered.extend(ready)
+        pending = [task_id for task_id in pending if task_id not in ready]
+
+    return [
+        {
+            "id": f"p{version}.{task_id}",
+            "worker": by_id[task_id].worker,
+            "instruction": by_id[task_id].instruction,
+            "depends_on": [f"p{version}.{dep}" for dep in depends_on[task_id]],
+        }
+        for task_id in ordered
+    ]
+
+
+def dag_planner(state: OrchestratorState) -> dict:
+    """
+    Orchestrator en modo DAG: planifica todas las tareas en una llamada.
+
+    En una re-planificación recibe los resultados ya obtenidos y el motivo
+    de la invalidación del plan actual (las de planes anteriores ya se
+    tuvieron en cuenta), y solo planifica el trabajo que falta.
+    """
+    query = state['query']
+    task_results = state.get('task_results') or {}
+    replans = state.get('replans') or 0
+    invalidations = [
+        task_results[task['id']] for task in state.get('tasks') or []
+        if task_results.get(task['id'], '').startswith(REPLAN_MARKER)
+    ]
+    is_replan = bool(task_results)
+
+    print(f'\n🎼 ORCHESTRATOR (DAG) {"re-planificando" if is_replan else "planificando"}...')
+
+    previous = "\n".join(f"- {r}" for r in task_results.values() if not r.startswith(REPLAN_MARKER))
+    prompt = f'''Eres un orchestrator que coordina workers especializados.
+
+CONSULTA ORIGINAL: {query}
+
+WORKERS DISPONIBLES:
+- search_worker: Busca información en bases de conocimiento
+- analyze_worker: Analiza y procesa datos
+- calculate_worker: Realiza cálculos y operaciones
+
+RESULTADOS YA OBTENIDOS:
+{previous or "Ninguno aún"}
+{chr(10).join(f"PLAN INVALIDADO: {r}" for r in invalidations)}
+
+INSTRUCCIONES:
+- Planifica TODAS las tareas que faltan (máximo 4) en un solo plan
+- Indica en depends_on solo las dependencias reales: las tareas
+  independientes se ejecutarán en paralelo
+- No repitas trabajo que ya está en los resultados obtenidos'''
+
+    # Cada plan tiene su propia versión para que sus ids no choquen con los anteriores
+    version = replans + 1 if is_replan else 0
+    plan = llm.with_structured_output(WorkerPlan).invoke(prompt)
+    tasks = normalize_plan(plan.tasks if plan else [], version=version)
+
+    for task in tasks:
+        deps = f" (tras {', '.join(task['depends_on'])})" if task['depends_on'] else ""
+        print(f"   {task['id']}: {task['worker']}{deps}")
+
+    return {
+        'tasks': tasks,
+        'plan': 'dag',
+        'replans': version,
+    }
+
+
+def ready_tasks(state: OrchestratorState) -> List[dict]:
+    """Tareas pendientes cuyas dependencias ya tienen resultado."""
+    done = state.get('task_results') or {}
+    return [
+        task for task in state.get('tasks') or []
+        if task['id'] not in done and all(dep in done for dep in task['depends_on'])
+    ]
+
+
+def plan_invalidated(state: OrchestratorState) -> bool:
+    """True si un worker del plan actual pidió re-planificar."""
+    done = state.get('task_results') or {}
+    return any(
+        done.get(task['id'], '').startswith(REPLAN_MARKER)
+        for task in state.get('tasks') or []
+    )
+
+
+def dispatch_tasks(state: OrchestratorState):
+    """
+    Conditional edge del modo DAG.
+
+    Lanza en paralelo (Send) todas las tareas listas; re-planifica si un
+    resultado invalidó el plan; sintetiza cuando no queda nada por hacer.
+
+    Agotadas las re-planificaciones, las tareas que dependen de un resultado
+    REPLAN: no se ejecutan (ni las que dependen de ellas): su contexto sería
+    el motivo de la invalidación, no un resultado.
+    """
+    if plan_invalidated(state) and (state.get('replans') or 0) < MAX_REPLANS:
+        return 'planner'
+
+    done = state.get('task_results') or {}
+    ready = []
+    for task in ready_tasks(state):
+        invalid = [dep for dep in task['depends_on'] if done[dep].startswith(REPLAN_MARKER)]
+        if invalid:
+            print(f"   ⚠️  {task['id']} no se ejecuta: depende de tareas invalidadas {invalid}")
+            continue
+        ready.append(task)
+    if not ready:
+        return 'synthesize'
+
+    return [
+        Send('worker', {
+            'query': state['query'],
+            'task': task,
+            'context': [done[dep] for dep in task['depends_on']],
+        })
+        for task in ready
+    ]
+
+
+def dag_worker(state: TaskState) -> dict:
+    """Ejecuta una tarea del plan con el worker indicado."""
+    task = state['task']
+    specialty, tag, done_label = WORKER_ROLES[task['worker']]
+
+    print(f"\n⚙️  WORKER {task['id']} ({tag}) ejecutando...")
+
+    prompt = f'''Eres un worker especializado en {specialty}.
+
+Consulta original: {state['query']}
+Tarea: {task['instruction']}
+
+Contexto de tareas previas:
+{chr(10).join(state['context']) if state['context'] else "Ninguno"}
+
+Instrucciones:
+- Formato: "{done_label}: [resultado]"
+- Máximo 80 palabras
+- Si descubres que la tarea no tiene sentido o el plan parte de una premisa
+  falsa, responde SOLO "{REPLAN_MARKER} [motivo]"'''
+
+    response = llm.invoke(prompt).content.strip()
+    result = response if response.startswith(REPLAN_MARKER) else f"[{tag}] {response}"
+
+    print(f"   ✅ {task['id']} completada")
+
+    return {
+        'task_results': {task['id']: result},
+        'worker_results': [] if result.startswith(REPLAN_MARKER) else [result],
+    }
+
+
+def join_tasks(state: OrchestratorState) -> dict:
+    """Barrera: se ejecuta una vez cuando terminan todos los workers en paralelo."""
+    return {}
+
+
 # =============================================================================
 # Graph Construction
 # =============================================================================
 
-def create_graph():
+def create_graph(mode: str = "loop"):
     """
     Construye el grafo orchestrator-workers.
 
+    Args:
+        mode: "loop" (un worker por decisión del orchestrator) o "dag"
+              (plan completo en una llamada y workers en paralelo, ver
+              create_dag_graph)
+
     Arquitectura (con LOOP de re-planificación):
 
         START
@@ -321,6 +567,11 @@ def create_graph():
     Returns:
         CompiledGraph: Grafo compilado listo para ejecutar
     """
+    if mode == "dag":
+        return create_dag_graph()
+    if mode != "loop":
+        raise ValueError(f"mode debe ser 'loop' o 'dag' (recibido {mode!r})")
+
     # 1. Crear el builder
     builder = StateGraph(OrchestratorState)
     print("✅ StateGraph creado")
@@ -366,11 +617,49 @@ def create_graph():
     return graph
 
 
+def create_dag_graph():
+    """
+    Construye el grafo orchestrator-workers en modo DAG.
+
+    Arquitectura:
+
+        START
+          ↓
+       planner ←─────────────┐ (solo si un resultado invalida el plan)
+          ↓                   │
+    dispatch_tasks ──Send──→ worker × N (en paralelo)
+          ↑                   ↓
+          └─────────────── join
+          ↓
+      synthesize → END
+
+    Returns:
+        CompiledGraph: Grafo compilado listo para ejecutar
+    """
+    builder = StateGraph(OrchestratorState)
+    builder.add_node("planner", dag_planner)
+    builder.add_node("worker", dag_worker)
+    builder.add_node("join", join_tasks)
+    builder.add_node("synthesize", synthesize)
+
+    builder.add_edge(START, "planner")
+    builder.add_conditional_edges("planner", dispatch_tasks, ["worker", "planner", "synthesize"])
+    builder.add_edge("worker", "join")
+    builder.add_conditional_edges("join", dispatch_tasks, ["worker", "planner", "synthesize"])
+    builder.add_edge("synthesize", END)
+
+    graph = builder.compile()
+    print("🎉 Grafo orchestrator-workers (DAG) compilado exitosamente\n")
+
+    return graph
+
+
 # =============================================================================
 # Create the graph (for LangGraph Studio)
 # =============================================================================
 
 graph = create_graph()
+dag_graph = create_graph(mode="dag")
 
 
 # =============================================================================
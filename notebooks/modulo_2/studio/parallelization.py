@@ -1,19 +1,27 @@
 import operator
+import os
+import sys
 from typing import Annotated
 from typing_extensions import TypedDict
 
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from langchain_community.document_loaders import WikipediaLoader
-from langchain_tavily import TavilySearch  # updated 1.0
-
 from langchain_openai import ChatOpenAI
 
 from langgraph.graph import StateGraph, START, END
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.search import search_provider
+
 llm = ChatOpenAI(model="gpt-4o", temperature=0) 
 
+# Shared search clients with a query -> results cache (TTL).
+# Set SEARCH_BACKEND=local and LOCAL_SEARCH_CORPUS to run offline.
+web_search = search_provider("web", max_results=3)
+wikipedia_search = search_provider("wikipedia", max_results=2)
+
 class State(TypedDict):
     question: str
     answer: str
@@ -24,14 +32,12 @@ def search_web(state):
     """ Retrieve docs from web search """
 
     # Search
-    tavily_search = TavilySearch(max_results=3)
-    data = tavily_search.invoke({"query": state['question']})
-    search_docs = data.get("results", data)
+    search_docs = web_search.search(state['question'])
 
      # Format
     formatted_search_docs = "\n\n---\n\n".join(
         [
-            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
+            f'<Document href="{doc.metadata["source"]}"/>\n{doc.page_content}\n</Document>'
             for doc in search_docs
         ]
     )
@@ -43,8 +49,7 @@ def search_wikipedia(state):
     """ Retrieve docs from wikipedia """
 
     # Search
-    search_docs = WikipediaLoader(query=state['question'], 
-                                  load_max_docs=2).load()
+    search_docs = wikipedia_search.search(state['question'])
 
      # Format
     formatted_search_docs = "\n\n---\n\n".join(
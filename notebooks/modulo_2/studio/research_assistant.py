@@ -1,16 +1,22 @@
 import operator
+import os
+import sys
 from pydantic import BaseModel, Field
 from typing import Annotated, List
 from typing_extensions import TypedDict
 
-from langchain_community.document_loaders import WikipediaLoader
-from langchain_tavily import TavilySearch  # updated 1.0
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
 from langchain_openai import ChatOpenAI
 
-from langgraph.constants import Send
 from langgraph.graph import END, MessagesState, START, StateGraph
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.context_store import merge_sources, reference_list, render_context, to_source
+from utils.fanout import SendScheduler
+from utils.prompt_cache import CacheablePrompt
+from utils.search import search_provider
+
 ### LLM
 
 llm = ChatOpenAI(model="gpt-4o", temperature=0) 
@@ -47,7 +53,7 @@ class GenerateAnalystsState(TypedDict):
 
 class InterviewState(MessagesState):
     max_num_turns: int # Number turns of conversation
-    context: Annotated[list, operator.add] # Source docs
+    context: Annotated[list, merge_sources] # Source docs, deduplicated by URL / content hash
     analyst: Analyst # Analyst asking questions
     interview: str # Interview transcript
     sections: list # Final key we duplicate in outer state for Send() API
@@ -61,6 +67,7 @@ class ResearchGraphState(TypedDict):
     human_analyst_feedback: str # Human feedback
     analysts: List[Analyst] # Analyst asking questions
     sections: Annotated[list, operator.add] # Send() API key
+    interviews_dispatched: int # Progress of the bounded interview fan-out
     introduction: str # Introduction for the final report
     content: str # Content for the final report
     conclusion: str # Conclusion for the final report
@@ -102,8 +109,8 @@ def create_analysts(state: GenerateAnalystsState):
     # Generate question 
     analysts = structured_llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")])
     
-    # Write the list of analysis to state
-    return {"analysts": analysts.analysts}
+    # Write the list of analysis to state (and restart the interview fan-out)
+    return {"analysts": analysts.analysts, **interview_scheduler.reset()}
 
 def human_feedback(state: GenerateAnalystsState):
     """ No-op node that should be interrupted on """
@@ -154,30 +161,24 @@ Pay particular attention to the final question posed by the analyst.
 
 Convert this final question into a well-structured web search query""")
 
+# Shared search clients with a query -> results cache (TTL).
+# Set SEARCH_BACKEND=local and LOCAL_SEARCH_CORPUS to run offline.
+web_search = search_provider("web", max_results=3)
+wikipedia_search = search_provider("wikipedia", max_results=2)
+
 def search_web(state: InterviewState):
     
     """ Retrieve docs from web search """
 
-    # Search
-    tavily_search = TavilySearch(max_results=3)
-
     # Search query
     structured_llm = llm.with_structured_output(SearchQuery)
     search_query = structured_llm.invoke([search_instructions]+state['messages'])
     
     # Search
-    data = tavily_search.invoke({"query": search_query.search_query})
-    search_docs = data.get("results", data)
-
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    search_docs = web_search.search(search_query.search_query)
 
-    return {"context": [formatted_search_docs]} 
+    # Sources already in the context are dropped by the merge_sources reducer
+    return {"context": [to_source(doc) for doc in search_docs]}
 
 def search_wikipedia(state: InterviewState):
     
@@ -188,18 +189,13 @@ def search_wikipedia(state: InterviewState):
     search_query = structured_llm.invoke([search_instructions]+state['messages'])
     
     # Search
-    search_docs = WikipediaLoader(query=search_query.search_query, 
-                                  load_max_docs=2).load()
-
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    search_docs = wikipedia_search.search(search_query.search_query)
+
+    return {"context": [to_source(doc) for doc in search_docs]}
 
-    return {"context": [formatted_search_docs]} 
+# Token budgets for the rendered sources (only the most relevant passages are sent)
+ANSWER_CONTEXT_TOKENS = 3000
+SECTION_CONTEXT_TOKENS = 4000
 
 # Generate expert answer
 answer_instructions = """You are an expert being interviewed by an analyst.
@@ -237,7 +233,9 @@ def generate_answer(state: InterviewState):
     # Get state
     analyst = state["analyst"]
     messages = state["messages"]
-    context = state["context"]
+
+    # Passages ranked against the analyst's last question
+    context = render_context(state["context"], query=messages[-1].content, max_tokens=ANSWER_CONTEXT_TOKENS)
 
     # Answer question
     system_message = answer_instructions.format(goals=analyst.persona, context=context)
@@ -305,8 +303,7 @@ a. Title (## header)
 b. Summary (### header)
 c. Sources (### header)
 
-4. Make your title engaging based upon the focus area of the analyst: 
-{focus}
+4. Make your title engaging based upon the focus area of the analyst (given at the end of these instructions).
 
 5. For the summary section:
 - Set up summary with general background / context related to the focus area of the analyst
@@ -340,18 +337,31 @@ There should be no redundant sources. It should simply be:
 - Include no preamble before the title of the report
 - Check that all guidelines have been followed"""
 
+# Instrucciones estáticas primero y el foco del analista al final. Son ~500
+# tokens, por debajo del prefijo mínimo cacheable (~1024): hoy no hay ahorro
+# de prompt caching, el orden solo lo prepara si las instrucciones crecen
+section_writer_prompt = CacheablePrompt(
+    static=section_writer_instructions,
+    dynamic="Focus area of the analyst:\n{focus}",
+    human="""Use this source to write your section: {context}
+
+Sources gathered in the interview (deduplicated), use these names in the Sources section:
+{references}"""
+)
+
 def write_section(state: InterviewState):
 
     """ Node to write a section """
 
     # Get state
     interview = state["interview"]
-    context = state["context"]
     analyst = state["analyst"]
+    context = render_context(state["context"], query=analyst.description, max_tokens=SECTION_CONTEXT_TOKENS)
    
     # Write section using either the gathered source docs from interview (context) or the interview itself (interview)
-    system_message = section_writer_instructions.format(focus=analyst.description)
-    section = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {context}")]) 
+    section = llm.invoke(section_writer_prompt.messages(
+        llm, focus=analyst.description, context=context, references=reference_list(state["context"])
+    ))
                 
     # Append it to state
     return {"sections": [section.content]}
@@ -375,6 +385,28 @@ interview_builder.add_conditional_edges("answer_question", route_messages,['ask_
 interview_builder.add_edge("save_interview", "write_section")
 interview_builder.add_edge("write_section", END)
 
+def interview_input(state: ResearchGraphState, analyst: Analyst):
+
+    """ Input of the interview subgraph for one analyst """
+
+    topic = state["topic"]
+    return {"analyst": analyst,
+            "messages": [HumanMessage(
+                content=f"So you said you were writing an article on {topic}?"
+            )]}
+
+# At most MAX_CONCURRENT_INTERVIEWS interview subgraphs run at the same time;
+# each wave's sections reach the reducer before the next wave starts
+MAX_CONCURRENT_INTERVIEWS = 4
+
+interview_scheduler = SendScheduler(
+    node="conduct_interview",
+    items_key="analysts",
+    make_input=interview_input,
+    cursor_key="interviews_dispatched",
+    max_concurrency=MAX_CONCURRENT_INTERVIEWS
+)
+
 def initiate_all_interviews(state: ResearchGraphState):
 
     """ Conditional edge to initiate all interviews via Send() API or return to create_analysts """    
@@ -385,19 +417,12 @@ def initiate_all_interviews(state: ResearchGraphState):
         # Return to create_analysts
         return "create_analysts"
 
-    # Otherwise kick off interviews in parallel via Send() API
+    # Otherwise kick off interviews in bounded waves via Send() API
     else:
-        topic = state["topic"]
-        return [Send("conduct_interview", {"analyst": analyst,
-                                           "messages": [HumanMessage(
-                                               content=f"So you said you were writing an article on {topic}?"
-                                           )
-                                                       ]}) for analyst in state["analysts"]]
+        return "schedule_interviews"
 
 # Write a report based on the interviews
-report_writer_instructions = """You are a technical writer creating a report on this overall topic: 
-
-{topic}
+report_writer_instructions = """You are a technical writer creating a report on an overall topic (given after these instructions).
     
 You have a team of analysts. Each analyst has done two things: 
 
@@ -423,11 +448,18 @@ To format your report:
 8. List your sources in order and do not repeat.
 
 [1] Source 1
-[2] Source 2
+[2] Source 2"""
+
+# Mismo orden estático → dinámico (~300 tokens estáticos: tampoco se cachea)
+report_writer_prompt = CacheablePrompt(
+    static=report_writer_instructions,
+    dynamic="""Overall topic: {topic}
 
 Here are the memos from your analysts to build your report from: 
 
-{context}"""
+{context}""",
+    human="Write a report based upon these memos."
+)
 
 def write_report(state: ResearchGraphState):
 
@@ -441,8 +473,7 @@ def write_report(state: ResearchGraphState):
     formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
     
     # Summarize the sections into a final report
-    system_message = report_writer_instructions.format(topic=topic, context=formatted_str_sections)    
-    report = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")]) 
+    report = llm.invoke(report_writer_prompt.messages(llm, topic=topic, context=formatted_str_sections))
     return {"content": report.content}
 
 # Write the introduction or conclusion
@@ -527,6 +558,7 @@ def finalize_report(state: ResearchGraphState):
 builder = StateGraph(ResearchGraphState)
 builder.add_node("create_analysts", create_analysts)
 builder.add_node("human_feedback", human_feedback)
+builder.add_node("schedule_interviews", interview_scheduler.schedule)
 builder.add_node("conduct_interview", interview_builder.compile())
 builder.add_node("write_report",write_report)
 builder.add_node("write_introduction",write_introduction)
@@ -536,10 +568,11 @@ builder.add_node("finalize_report",finalize_report)
 # Logic
 builder.add_edge(START, "create_analysts")
 builder.add_edge("create_analysts", "human_feedback")
-builder.add_conditional_edges("human_feedback", initiate_all_interviews, ["create_analysts", "conduct_interview"])
-builder.add_edge("conduct_interview", "write_report")
-builder.add_edge("conduct_interview", "write_introduction")
-builder.add_edge("conduct_interview", "write_conclusion")
+builder.add_conditional_edges("human_feedback", initiate_all_interviews, ["create_analysts", "schedule_interviews"])
+builder.add_conditional_edges("schedule_interviews",
+                              interview_scheduler.route(then=["write_report", "write_introduction", "write_conclusion"]),
+                              ["conduct_interview", "write_report", "write_introduction", "write_conclusion"])
+builder.add_edge("conduct_interview", "schedule_interviews")
 builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "finalize_report")
 builder.add_edge("finalize_report", END)
 
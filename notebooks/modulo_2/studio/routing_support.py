@@ -13,10 +13,16 @@ Conceptos:
 Este grafo se puede abrir en LangGraph Studio.
 """
 
+import os
+import sys
 from typing import TypedDict
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, START, END
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.routing import LocalRouter, routing_log_path
+
 
 # =============================================================================
 # State Definition
@@ -40,24 +46,22 @@ llm = ChatOpenAI(model='gpt-4o-mini', temperature=0)
 # Classifier Node
 # =============================================================================
 
-def classify_intent(state: SupportState) -> dict:
-    """
-    Nodo clasificador: Determina la intención del usuario.
-
-    Usa un LLM para categorizar la consulta en una de tres categorías:
-    - technical: Problemas técnicos, API, código, errores
-    - billing: Facturación, pagos, suscripciones
-    - general: Otras consultas generales
+# Clasificador local: reglas + modelo entrenado con las etiquetas del LLM
+intent_router = LocalRouter(
+    labels=['technical', 'billing', 'general'],
+    keyword_rules={
+        'technical': ['error', 'api', 'bug', 'excepción', 'timeout'],
+        'billing': ['factura', 'pago', 'cobro', 'suscripción', 'precio', 'reembolso'],
+    },
+    log_path=routing_log_path('routing_support_intent')
+)
 
-    Args:
-        state: Estado actual con la consulta del usuario
 
-    Returns:
-        Dict con el campo 'intent' actualizado
-    """
+def llm_classify_intent(query: str) -> str:
+    """Clasifica la consulta con el LLM (technical, billing o general)."""
     prompt = f'''Clasifica esta consulta de soporte técnico en una categoría.
 
-Consulta del usuario: {state["query"]}
+Consulta del usuario: {query}
 
 Categorías disponibles:
 - technical: Problemas técnicos, errores de API, problemas de código, bugs
@@ -71,9 +75,31 @@ Instrucciones:
 - No incluyas explicaciones, solo la categoría'''
 
     response = llm.invoke(prompt)
-    intent = response.content.strip().lower()
+    return response.content.strip().lower()
+
+
+def classify_intent(state: SupportState) -> dict:
+    """
+    Nodo clasificador: Determina la intención del usuario.
+
+    Categoriza la consulta en una de tres categorías:
+    - technical: Problemas técnicos, API, código, errores
+    - billing: Facturación, pagos, suscripciones
+    - general: Otras consultas generales
+
+    Las consultas claras se resuelven localmente (intent_router);
+    solo las dudosas se envían al LLM.
+
+    Args:
+        state: Estado actual con la consulta del usuario
+
+    Returns:
+        Dict con el campo 'intent' actualizado
+    """
+    decision = intent_router.classify(state["query"], fallback=llm_classify_intent)
+    intent = decision.label
 
-    print(f'🎯 Clasificador: "{state["query"][:50]}..." → {intent.upper()}')
+    print(f'🎯 Clasificador: "{state["query"][:50]}..." → {intent.upper()} ({decision.source})')
 
     return {'intent': intent}
 
@@ -1,8 +1,14 @@
+import os
+import sys
 from operator import add
 from typing import List, Optional, Annotated
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 
+# utils/ está en la raíz del repositorio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from utils.log_stream import LOG_BATCH_SIZE, LogSource, iter_log_batches
+
 # The structure of the logs
 class Log(TypedDict):
     id: str
@@ -13,29 +19,39 @@ class Log(TypedDict):
     grader: Optional[str]
     feedback: Optional[str]
 
+# Logs are read from the source (a list of logs or the path of a JSONL file)
+# in batches of LOG_BATCH_SIZE inside a single node of each sub-graph, so only
+# one batch is in memory at a time and the number of graph steps does not
+# grow with the source (no recursion limit to hit with millions of logs).
+
+def clean_log(log: Log) -> Optional[Log]:
+    """ Data cleaning for a single log (None drops it) """
+    return log
+
 # Failure Analysis Sub-graph
 class FailureAnalysisState(TypedDict):
-    cleaned_logs: List[Log]
-    failures: List[Log]
+    cleaned_logs: LogSource
+    failures: Annotated[List[str], add] # ids of the logs that contain a failure
     fa_summary: str
-    processed_logs: List[str]
+    processed_logs: Annotated[List[str], add]
 
 class FailureAnalysisOutputState(TypedDict):
     fa_summary: str
     processed_logs: List[str]
 
 def get_failures(state):
-    """ Get logs that contain a failure """
-    cleaned_logs = state["cleaned_logs"]
-    failures = [log for log in cleaned_logs if "grade" in log]
-    return {"failures": failures}
+    """ Get logs that contain a failure, reading one batch at a time """
+    failures = []
+    for batch in iter_log_batches(state["cleaned_logs"], batch_size=LOG_BATCH_SIZE, clean=clean_log):
+        failures.extend(batch.failure_ids())
+    return {"failures": failures, "processed_logs": [f"failure-analysis-on-log-{log_id}" for log_id in failures]}
 
 def generate_summary(state):
     """ Generate summary of failures """
     failures = state["failures"]
     # Add fxn: fa_summary = summarize(failures)
     fa_summary = "Poor quality retrieval of Chroma documentation."
-    return {"fa_summary": fa_summary, "processed_logs": [f"failure-analysis-on-log-{failure['id']}" for failure in failures]}
+    return {"fa_summary": fa_summary}
 
 fa_builder = StateGraph(FailureAnalysisState,output_schema=FailureAnalysisOutputState)
 fa_builder.add_node("get_failures", get_failures)
@@ -46,20 +62,27 @@ fa_builder.add_edge("generate_summary", END)
 
 # Summarization subgraph
 class QuestionSummarizationState(TypedDict):
-    cleaned_logs: List[Log]
+    cleaned_logs: LogSource
     qs_summary: str
     report: str
-    processed_logs: List[str]
+    processed_logs: Annotated[List[str], add]
 
 class QuestionSummarizationOutputState(TypedDict):
     report: str
     processed_logs: List[str]
 
+def summarize_batches(state):
+    """ Summarize the questions of the logs, one batch at a time """
+    processed_logs = []
+    for batch in iter_log_batches(state["cleaned_logs"], batch_size=LOG_BATCH_SIZE, clean=clean_log):
+        # Add fxn: partial summary = summarize(batch.questions)
+        processed_logs.extend(f"summary-on-log-{log_id}" for log_id in batch.ids)
+    return {"processed_logs": processed_logs}
+
 def generate_summary(state):
-    cleaned_logs = state["cleaned_logs"]
-    # Add fxn: summary = summarize(generate_summary)
+    # Add fxn: summary = summarize(partial summaries)
     summary = "Questions focused on usage of ChatOllama and Chroma vector store."
-    return {"qs_summary": summary, "processed_logs": [f"summary-on-log-{log['id']}" for log in cleaned_logs]}
+    return {"qs_summary": summary}
 
 def send_to_slack(state):
     qs_summary = state["qs_summary"]
@@ -68,16 +91,18 @@ def send_to_slack(state):
     return {"report": report}
 
 qs_builder = StateGraph(QuestionSummarizationState,output_schema=QuestionSummarizationOutputState)
+qs_builder.add_node("summarize_batches", summarize_batches)
 qs_builder.add_node("generate_summary", generate_summary)
 qs_builder.add_node("send_to_slack", send_to_slack)
-qs_builder.add_edge(START, "generate_summary")
+qs_builder.add_edge(START, "summarize_batches")
+qs_builder.add_edge("summarize_batches", "generate_summary")
 qs_builder.add_edge("generate_summary", "send_to_slack")
 qs_builder.add_edge("send_to_slack", END)
 
 # Entry Graph
 class EntryGraphState(TypedDict):
-    raw_logs: List[Log]
-    cleaned_logs: List[Log]
+    raw_logs: LogSource # List of logs or path of a JSONL file with one log per line
+    cleaned_logs: LogSource
     fa_summary: str # This will only be generated in the FA sub-graph
     report: str # This will only be generated in the QS sub-graph
     processed_logs:  Annotated[List[int], add] # This will be generated in BOTH sub-graphs
@@ -85,7 +110,8 @@ class EntryGraphState(TypedDict):
 def clean_logs(state):
     # Get logs
     raw_logs = state["raw_logs"]
-    # Data cleaning raw_logs -> docs 
+    # Data cleaning raw_logs -> docs is applied per batch (clean_log) while
+    # the sub-graphs read the source, so the logs are never copied
     cleaned_logs = raw_logs
     return {"cleaned_logs": cleaned_logs}
 
@@ -100,4 +126,4 @@ entry_builder.add_edge("clean_logs", "question_summarization")
 entry_builder.add_edge("failure_analysis", END)
 entry_builder.add_edge("question_summarization", END)
 
-graph = entry_builder.compile()
\ No newline at end of file
+graph = entry_builder.compile()
@@ -4,6 +4,20 @@ Utilidades compartidas para el tutorial de LangGraph Multi-Agent.
 Este paquete contiene funciones y clases helper usadas en múltiples módulos:
 - llm_config: Configuración de modelos de lenguaje
 - logging_config: Configuración de logging
+- streaming: Streaming de tokens y progreso de nodos
+- routing: Clasificador local con fallback al LLM
+- semantic_cache: Cache semántica de respuestas
+- prompt_cache: Prompts con prefijo estático para prompt caching
+- context_window: Historial de mensajes acotado a un presupuesto de tokens
+- tool_executor: Ejecución concurrente de tool calls
+- tool_cache: Cache de resultados de herramientas con TTL
+- safe_math: Evaluador aritmético seguro para calculadoras
+- search: Proveedores de búsqueda compartidos, cacheados y offline
+- context_store: Fuentes deduplicadas y contexto con presupuesto de tokens
+- fanout: Fan-out con Send en oleadas de concurrencia acotada
+- batching: Varios prompts con structured output en una sola llamada
+- keyword_classifier: Clasificación de párrafos por palabras clave ponderadas
+- log_stream: Lectura de logs por lotes en formato columnar
 - evaluation: Métricas y evaluación (TODO)
 - visualization: Visualización de grafos (TODO)
 """
@@ -29,6 +43,44 @@ from .logging_config import (
     log_tool_execution,
     log_state_update,
     log_graph_step,
+    GraphMetrics,
+    instrument_graph,
+    shutdown_async_logging,
+    JSONFormatter,
+)
+
+from .routing import (
+    LocalRouter,
+    routing_log_path,
+)
+
+from .semantic_cache import SemanticCache
+
+from .prompt_cache import CacheablePrompt, cached_token_usage
+
+from .context_window import ContextWindowManager
+
+from .tool_executor import ToolExecutor
+
+from .tool_cache import ToolCache, cached_tool
+
+from .safe_math import ArithmeticEvaluator, ExpressionError, safe_eval
+
+from .search import LocalCorpusProvider, search_provider
+
+from .context_store import merge_sources, render_context, to_source
+
+from .fanout import SendScheduler
+
+from .batching import StructuredBatcher
+
+from .keyword_classifier import KeywordClassifier
+
+from .log_stream import LogBatch, iter_log_batches, read_log_batch
+
+from .streaming import (
+    stream_graph,
+    astream_graph,
 )
 
 __all__ = [
@@ -51,4 +103,47 @@ __all__ = [
     "log_tool_execution",
     "log_state_update",
     "log_graph_step",
+    "GraphMetrics",
+    "instrument_graph",
+    "shutdown_async_logging",
+    "JSONFormatter",
+    # Routing
+    "LocalRouter",
+    "routing_log_path",
+    # Semantic cache
+    "SemanticCache",
+    # Prompt caching
+    "CacheablePrompt",
+    "cached_token_usage",
+    # Context window
+    "ContextWindowManager",
+    # Tool execution
+    "ToolExecutor",
+    # Tool cache
+    "ToolCache",
+    "cached_tool",
+    # Safe math
+    "ArithmeticEvaluator",
+    "ExpressionError",
+    "safe_eval",
+    # Search
+    "LocalCorpusProvider",
+    "search_provider",
+    # Context store
+    "merge_sources",
+    "render_context",
+    "to_source",
+    # Fan-out
+    "SendScheduler",
+    # Batching
+    "StructuredBatcher",
+    # Keyword classifier
+    "KeywordClassifier",
+    # Log stream
+    "LogBatch",
+    "iter_log_batches",
+    "read_log_batch",
+    # Streaming
+    "stream_graph",
+    "astream_graph",
 ]
@@ -0,0 +1,195 @@
+"""
+Batched Structured Output
+
+Agrupa N prompts homogéneos (uno por elemento de un map-reduce) en una
+sola llamada con structured output que devuelve una lista. Para
+elementos pequeños (chistes, títulos, etiquetas) cambia N round trips
+por uno.
+
+- El modelo recibe los prompts numerados y devuelve un elemento por
+  prompt con su ``index``.
+- Si la respuesta se trunca (``finish_reason == "length"``) o no se
+  puede parsear, el lote se divide en dos y se reintenta cada mitad.
+- Los elementos que faltan o no validan contra el schema se reintentan
+  uno a uno con ``with_structured_output(schema)``.
+
+Ejemplo:
+    >>> batcher = StructuredBatcher(model, Joke, max_batch_size=10)
+    >>> jokes = batcher.map([f"Generate a joke about {s}" for s in subjects])
+"""
+
+import json
+import threading
+from typing import Optional, Dict, Any, List, Type, Sequence
+
+from pydantic import BaseModel, Field, ValidationError, create_model
+from langchain_core.exceptions import OutputParserException
+
+
+BATCH_INSTRUCTIONS = """You will receive {count} independent tasks, numbered from 0 to {last}.
+Solve each task separately and return exactly one item per task, in the same
+order, setting "index" to the task number.
+
+{tasks}"""
+
+
+class _BatchFailed(Exception):
+    """El lote no se pudo parsear o la respuesta se truncó."""
+
+
+class StructuredBatcher:
+    """
+    Ejecuta muchos prompts con el mismo schema en pocas llamadas.
+
+    Es thread-safe: los contadores de ``stats`` están protegidos por un
+    lock y el mismo batcher puede usarse desde varios nodos en paralelo.
+    """
+
+    def __init__(
+        self,
+        llm,
+        schema: Type[BaseModel],
+        max_batch_size: int = 10,
+        max_retries: int = 2
+    ):
+        """
+        Args:
+            llm: Chat model con soporte de with_structured_output
+            schema: Modelo Pydantic de cada elemento
+            max_batch_size: Prompts máximos por llamada
+            max_retries: Reintentos por elemento cuando falla la validación
+        """
+        self.llm = llm
+        self.schema = schema
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+
+        indexed = create_model(
+            f"Indexed{schema.__name__}",
+            __base__=schema,
+            index=(int, Field(description="Number of the task this item answers.")),
+        )
+        self.batch_schema = create_model(
+            f"{schema.__name__}Batch",
+            items=(List[indexed], Field(description="One item per task, in order.")),
+        )
+
+        self._lock = threading.Lock()
+        self._counts = {"batch_calls": 0, "single_calls": 0, "splits": 0, "retries": 0}
+
+    def _count(self, key: str, value: int = 1):
+        with self._lock:
+            self._counts[key] += value
+
+    # ------------------------------------------------------------------
+    # Llamadas
+    # ------------------------------------------------------------------
+
+    def invoke_one(self, prompt: str) -> BaseModel:
+        """Un solo prompt, con reintentos si la salida no valida."""
+        structured = self.llm.with_structured_output(self.schema)
+        error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+            self._count("single_calls")
+            try:
+                result = structured.invoke(prompt)
+                if result is not None:
+                    return result
+                error = ValueError("El modelo no devolvió un resultado estructurado")
+            except (ValidationError, OutputParserException, ValueError) as e:
+                error = e
+        raise error
+
+    @staticmethod
+    def _raw_items(raw) -> List[Any]:
+        """Elementos de la respuesta sin validar (tool call o JSON en content)."""
+        tool_calls = getattr(raw, "tool_calls", None) or []
+        if tool_calls:
+            payload = tool_calls[0].get("args") or {}
+        else:
+            try:
+                payload = json.loads(raw.content) if isinstance(raw.content, str) else {}
+            except ValueError:
+                return []
+        items = payload.get("items") if isinstance(payload, dict) else None
+        return items if isinstance(items, list) else []
+
+    def _invoke_batch(self, prompts: Sequence[str]) -> List[Optional[BaseModel]]:
+        """Un lote; devuelve None en la posición de cada elemento inválido o ausente."""
+        tasks = "\n\n".join(f"[{i}] {prompt}" for i, prompt in enumerate(prompts))
+        message = BATCH_INSTRUCTIONS.format(count=len(prompts), last=len(prompts) - 1, tasks=tasks)
+
+        self._count("batch_calls")
+        result = self.llm.with_structured_output(self.batch_schema, include_raw=True).invoke(message)
+        raw = result.get("raw")
+        metadata = getattr(raw, "response_metadata", None) or {}
+        if metadata.get("finish_reason") == "length":
+            raise _BatchFailed("respuesta truncada")
+
+        if result.get("parsed") is not None:
+            candidates = [item.model_dump() for item in result["parsed"].items]
+        else:
+            # El lote completo no validó: rescatar los elementos válidos
+            candidates = self._raw_items(raw)
+            if not candidates:
+                raise _BatchFailed(str(result.get("parsing_error")))
+
+        items: List[Optional[BaseModel]] = [None] * len(prompts)
+        for candidate in candidates:
+            if not isinstance(candidate, dict):
+                continue
+            index = candidate.get("index")
+            if not isinstance(index, int) or not 0 <= index < len(prompts) or items[index] is not None:
+                continue
+            try:
+                items[index] = self.schema.model_validate(
+                    {k: v for k, v in candidate.items() if k != "index"}
+                )
+            except ValidationError:
+                continue
+        return items
+
+    # ------------------------------------------------------------------
+    # Map
+    # ------------------------------------------------------------------
+
+    def _map_chunk(self, prompts: Sequence[str], indices: List[int], results: List[Optional[BaseModel]]):
+        if len(indices) == 1:
+            results[indices[0]] = self.invoke_one(prompts[indices[0]])
+            return
+
+        try:
+            items = self._invoke_batch([prompts[i] for i in indices])
+        except (_BatchFailed, OutputParserException):
+            self._count("splits")
+            middle = len(indices) // 2
+            self._map_chunk(prompts, indices[:middle], results)
+            self._map_chunk(prompts, indices[middle:], results)
+            return
+
+        for i, item in zip(indices, items):
+            if item is None:
+                self._count("retries")
+                item = self.invoke_one(prompts[i])
+            results[i] = item
+
+    def map(self, prompts: Sequence[str]) -> List[BaseModel]:
+        """
+        Resultado estructurado de cada prompt, en el mismo orden.
+
+        Raises:
+            La última excepción de validación si un elemento sigue
+            fallando tras ``max_retries`` reintentos individuales
+        """
+        results: List[Optional[BaseModel]] = [None] * len(prompts)
+        indices = list(range(len(prompts)))
+        for start in range(0, len(indices), self.max_batch_size):
+            self._map_chunk(prompts, indices[start:start + self.max_batch_size], results)
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """Llamadas en lote e individuales, divisiones y reintentos."""
+        with self._lock:
+            return dict(self._counts)
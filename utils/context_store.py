@@ -0,0 +1,189 @@
+"""
+Context Store
+
+Fuentes recuperadas durante una entrevista (búsquedas web, Wikipedia,
+corpus local), deduplicadas y renderizadas dentro de un presupuesto de
+tokens. Con un reducer ``operator.add`` sobre strings formateados, cada
+turno vuelve a añadir las mismas fuentes y el prompt crece sin límite.
+
+- ``merge_sources`` es un reducer de LangGraph: descarta documentos cuya
+  fuente (URL/ruta + página) o cuyo contenido (hash) ya están en el estado.
+- ``render_context`` parte las fuentes en pasajes, los ordena por
+  relevancia para la pregunta y solo incluye los mejores que caben en el
+  presupuesto, agrupados por fuente. Un pasaje que no cabe entero se
+  recorta si queda espacio para al menos MIN_PASSAGE_TOKENS.
+- ``reference_list`` devuelve la lista compacta de referencias [n].
+
+Ejemplo:
+    >>> class InterviewState(MessagesState):
+    ...     context: Annotated[list, merge_sources]
+    >>> return {"context": [to_source(doc) for doc in search_docs]}
+    >>> prompt_context = render_context(state["context"], query=question, max_tokens=2000)
+"""
+
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+
+from .context_window import approximate_token_count
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+# Tokens mínimos de un pasaje recortado (uno más corto no aporta contexto)
+MIN_PASSAGE_TOKENS = 50
+
+
+def content_hash(text: str) -> str:
+    """Hash del contenido normalizado (minúsculas, espacios colapsados)."""
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def to_source(doc) -> Dict[str, Any]:
+    """
+    Convierte un Document de LangChain en una entrada del context store.
+
+    Returns:
+        {"source", "page", "title", "content", "hash"}
+    """
+    metadata = doc.metadata or {}
+    return {
+        "source": str(metadata.get("source", "")),
+        "page": str(metadata.get("page", "")),
+        "title": metadata.get("title", ""),
+        "content": doc.page_content,
+        "hash": content_hash(doc.page_content),
+    }
+
+
+def _source_key(entry: Dict[str, Any]) -> Tuple[str, str]:
+    return entry["source"].strip().rstrip("/").lower(), entry.get("page", "")
+
+
+def merge_sources(left: Optional[List], right: Optional[List]) -> List:
+    """
+    Reducer de LangGraph que deduplica fuentes por URL/ruta y por hash.
+
+    Las entradas que no son dicts del context store (p. ej. strings de un
+    estado antiguo) se conservan tal cual.
+    """
+    merged = list(left or [])
+    seen_sources = {_source_key(e) for e in merged if isinstance(e, dict) and e.get("source")}
+    seen_hashes = {e["hash"] for e in merged if isinstance(e, dict)}
+
+    for entry in right or []:
+        if not isinstance(entry, dict):
+            merged.append(entry)
+            continue
+        key = _source_key(entry)
+        if entry["hash"] in seen_hashes or (entry.get("source") and key in seen_sources):
+            continue
+        merged.append(entry)
+        seen_hashes.add(entry["hash"])
+        if entry.get("source"):
+            seen_sources.add(key)
+    return merged
+
+
+def reference_list(sources: Sequence) -> str:
+    """Lista compacta de referencias: ``[1] fuente, page N``."""
+    lines = []
+    for i, entry in enumerate(e for e in sources if isinstance(e, dict)):
+        page = f", page {entry['page']}" if entry.get("page") else ""
+        lines.append(f"[{i + 1}] {entry['source'] or entry.get('title', '')}{page}")
+    return "\n".join(lines)
+
+
+def _document_tag(entry: Dict[str, Any]) -> str:
+    if entry["source"].startswith(("http://", "https://")):
+        return f'<Document href="{entry["source"]}"/>'
+    return f'<Document source="{entry["source"]}" page="{entry.get("page", "")}"/>'
+
+
+def _truncate(text: str, max_tokens: int, token_counter) -> str:
+    """Prefijo del texto (cortado por palabras) que cabe en ``max_tokens``."""
+    words = text.split()
+    low, high = 0, len(words)
+    # Búsqueda binaria del mayor número de palabras que cabe
+    while low < high:
+        middle = (low + high + 1) // 2
+        if token_counter(" ".join(words[:middle]) + " …") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + " …" if low else ""
+
+
+def render_context(
+    sources: Sequence,
+    query: str = "",
+    max_tokens: int = 2000,
+    token_counter=approximate_token_count
+) -> str:
+    """
+    Renderiza las fuentes más relevantes dentro de un presupuesto.
+
+    Args:
+        sources: Entradas del context store (state["context"])
+        query: Texto con el que se rankean los pasajes (pregunta, foco)
+        max_tokens: Presupuesto de tokens del contexto renderizado
+        token_counter: Función texto → tokens
+
+    Returns:
+        Documentos en formato ``<Document .../>`` separados por ``---``,
+        cada uno solo con sus pasajes seleccionados
+    """
+    entries = [e for e in sources if isinstance(e, dict)]
+    legacy = [str(e) for e in sources if not isinstance(e, dict)]
+
+    # Pasajes: (documento, índice, texto, tokens)
+    passages: List[Tuple[int, int, str, List[str]]] = []
+    for doc_id, entry in enumerate(entries):
+        for index, text in enumerate(p.strip() for p in _PARAGRAPH_RE.split(entry["content"])):
+            if text:
+                passages.append((doc_id, index, text, _TOKEN_RE.findall(text.lower())))
+
+    # TF-IDF de los términos de la consulta sobre los pasajes
+    query_terms = set(_TOKEN_RE.findall(query.lower()))
+    document_frequency = Counter(
+        term for *_, tokens in passages for term in set(tokens) if term in query_terms
+    )
+    total = len(passages) or 1
+
+    def score(tokens: List[str]) -> float:
+        if not tokens:
+            return 0.0
+        counts = Counter(tokens)
+        return sum(
+            counts[term] * math.log(1 + total / document_frequency[term])
+            for term in query_terms if counts[term]
+        ) / math.sqrt(len(tokens))
+
+    # Más relevantes primero; a igualdad, el orden original
+    ranked = sorted(passages, key=lambda p: (-score(p[3]), p[0], p[1]))
+
+    budget = max_tokens - sum(token_counter(text) for text in legacy)
+    selected: Dict[int, List[Tuple[int, str]]] = {}
+    for doc_id, index, text, _ in ranked:
+        tag_cost = 0 if doc_id in selected else token_counter(_document_tag(entries[doc_id])) + 4
+        cost = token_counter(text) + tag_cost
+        if cost > budget:
+            # Recortar el pasaje si queda espacio útil; si no, probar con el siguiente
+            if budget - tag_cost < MIN_PASSAGE_TOKENS:
+                continue
+            text = _truncate(text, budget - tag_cost, token_counter)
+            if not text:
+                continue
+            cost = token_counter(text) + tag_cost
+        budget -= cost
+        selected.setdefault(doc_id, []).append((index, text))
+
+    rendered = list(legacy)
+    for doc_id in sorted(selected):
+        texts = [text for _, text in sorted(selected[doc_id])]
+        rendered.append(f"{_document_tag(entries[doc_id])}\n" + "\n\n".join(texts) + "\n</Document>")
+    return "\n\n---\n\n".join(rendered)
@@ -0,0 +1,279 @@
+"""
+Context Window Manager
+
+Limita el historial de mensajes que un agente envía al LLM en cada
+iteración. Sin límite, un loop agente → tools → agente reenvía todo el
+historial en cada vuelta y el costo total en tokens crece de forma
+cuadrática; con un presupuesto fijo por llamada crece de forma lineal.
+
+Reglas:
+- El system prompt y el primer mensaje del usuario (la tarea) se
+  conservan siempre.
+- Un AIMessage con tool_calls y sus ToolMessages forman una unidad
+  atómica: nunca se envía un ToolMessage sin la llamada que lo originó.
+- Se conservan las unidades más recientes que caben en el presupuesto.
+- Las unidades descartadas se omiten ("window") o se resumen con un LLM
+  ("summarize"); el resumen es incremental y se reutiliza entre vueltas.
+- El conteo de tokens se cachea por mensaje.
+
+Ejemplo:
+    >>> context = ContextWindowManager(max_tokens=3000)
+    >>> messages = context.fit(state["messages"], system=SystemMessage(content=PROMPT))
+    >>> response = llm_with_tools.invoke(messages)
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable, Sequence, Tuple
+
+from langchain_core.messages import (
+    BaseMessage,
+    AIMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+    get_buffer_string,
+)
+
+
+# Tokens fijos por mensaje (rol, separadores) en el formato de chat
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def approximate_token_count(text: str) -> int:
+    """Aproximación de ~4 caracteres por token (sin dependencias)."""
+    return (len(text) + 3) // 4
+
+
+SUMMARY_PROMPT = """Resume de forma concisa la siguiente conversación entre un usuario,
+un asistente y sus herramientas. Conserva datos concretos (números, resultados
+de herramientas, decisiones) que puedan necesitarse después.
+
+{previous_summary}
+CONVERSACIÓN:
+{conversation}
+
+RESUMEN:"""
+
+
+class ContextWindowManager:
+    """
+    Ajusta un historial de mensajes a un presupuesto de tokens.
+
+    Es thread-safe y puede compartirse entre ejecuciones: la cache de
+    tokens se indexa por id de mensaje (add_messages asigna uno a cada
+    mensaje del estado) y los resúmenes por conversación.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 4000,
+        strategy: str = "window",
+        summarizer=None,
+        token_counter: Optional[Callable[[str], int]] = None,
+        keep_first_human: bool = True,
+        cache_size: int = 10000,
+        max_conversations: int = 1000
+    ):
+        """
+        Args:
+            max_tokens: Presupuesto de tokens de entrada por llamada
+            strategy: "window" (descartar lo antiguo) o "summarize"
+            summarizer: LLM para la estrategia "summarize"
+            token_counter: Función texto → tokens (por defecto aproximada);
+                           p. ej. ``llm.get_num_tokens``
+            keep_first_human: Conservar siempre el primer HumanMessage
+            cache_size: Entradas máximas de la cache de conteos
+            max_conversations: Resúmenes máximos guardados (se descartan
+                               los de las conversaciones menos recientes)
+        """
+        if strategy not in ("window", "summarize"):
+            raise ValueError(f"strategy debe ser 'window' o 'summarize' (recibido {strategy!r})")
+        if strategy == "summarize" and summarizer is None:
+            raise ValueError("La estrategia 'summarize' requiere un summarizer")
+
+        self.max_tokens = max_tokens
+        self.strategy = strategy
+        self.summarizer = summarizer
+        self.token_counter = token_counter or approximate_token_count
+        self.keep_first_human = keep_first_human
+        self.cache_size = cache_size
+        self.max_conversations = max_conversations
+
+        self._lock = threading.Lock()
+        self._token_cache: "OrderedDict[Tuple, int]" = OrderedDict()
+        # conversación -> (id del último mensaje resumido, resumen)
+        self._summaries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self.last_stats: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------------
+    # Conteo de tokens
+    # ------------------------------------------------------------------
+
+    def _cache_key(self, message: BaseMessage) -> Tuple:
+        tool_calls = len(getattr(message, "tool_calls", None) or [])
+        # El tamaño del contenido protege contra mensajes modificados in-place
+        return (message.id or id(message), message.type, len(str(message.content)), tool_calls)
+
+    def count_tokens(self, message: BaseMessage) -> int:
+        """Tokens de un mensaje (cacheado por id)."""
+        key = self._cache_key(message)
+        with self._lock:
+            cached = self._token_cache.get(key)
+            if cached is not None:
+                self._token_cache.move_to_end(key)
+                return cached
+
+        text = str(message.content)
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            text += f"{tool_call.get('name', '')}{tool_call.get('args', '')}"
+        tokens = self.token_counter(text) + MESSAGE_OVERHEAD_TOKENS
+
+        with self._lock:
+            self._token_cache[key] = tokens
+            while len(self._token_cache) > self.cache_size:
+                self._token_cache.popitem(last=False)
+        return tokens
+
+    def count_messages(self, messages: Sequence[BaseMessage]) -> int:
+        return sum(self.count_tokens(message) for message in messages)
+
+    # ------------------------------------------------------------------
+    # Agrupación y recorte
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def group_units(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+        """
+        Agrupa los mensajes en unidades atómicas: un AIMessage con
+        tool_calls junto con los ToolMessages que responden a esas llamadas.
+        """
+        units: List[List[BaseMessage]] = []
+        open_calls: set = set()
+
+        for message in messages:
+            if isinstance(message, ToolMessage) and units and message.tool_call_id in open_calls:
+                units[-1].append(message)
+                open_calls.discard(message.tool_call_id)
+                continue
+
+            units.append([message])
+            open_calls = {
+                tool_call["id"] for tool_call in (getattr(message, "tool_calls", None) or [])
+            } if isinstance(message, AIMessage) else set()
+
+        return units
+
+    def fit(
+        self,
+        messages: Sequence[BaseMessage],
+        system: Optional[SystemMessage] = None
+    ) -> List[BaseMessage]:
+        """
+        Devuelve los mensajes a enviar al LLM dentro del presupuesto.
+
+        Args:
+            messages: Historial completo (state["messages"])
+            system: System prompt a anteponer (siempre se conserva)
+
+        Returns:
+            [system?, resumen?, primer HumanMessage?, ...unidades recientes]
+        """
+        messages = list(messages)
+        system_part: List[BaseMessage] = []
+        task_part: List[BaseMessage] = []
+        body = messages
+
+        if system is not None:
+            system_part.append(system)
+        elif body and isinstance(body[0], SystemMessage):
+            system_part.append(body[0])
+            body = body[1:]
+
+        if self.keep_first_human and body and isinstance(body[0], HumanMessage):
+            task_part.append(body[0])
+            body = body[1:]
+
+        head = system_part + task_part
+
+        budget = self.max_tokens - self.count_messages(head)
+        units = self.group_units(body)
+
+        kept: List[List[BaseMessage]] = []
+        used = 0
+        for unit in reversed(units):
+            tokens = self.count_messages(unit)
+            # La unidad más reciente se envía siempre, aunque exceda el presupuesto
+            if kept and used + tokens > budget:
+                break
+            kept.append(unit)
+            used += tokens
+        kept.reverse()
+
+        # Un ToolMessage huérfano (sin su AIMessage) no se envía nunca, ni
+        # siquiera si es la única unidad: el proveedor rechaza la llamada
+        while kept and isinstance(kept[0][0], ToolMessage):
+            kept.pop(0)
+
+        dropped = [message for unit in units[:len(units) - len(kept)] for message in unit]
+        recent = [message for unit in kept for message in unit]
+
+        summary_messages: List[BaseMessage] = []
+        if dropped:
+            if self.strategy == "summarize":
+                summary = self._summarize(messages, dropped)
+                summary_messages = [SystemMessage(content=f"Resumen de la conversación anterior:\n{summary}")]
+            else:
+                summary_messages = [SystemMessage(
+                    content=f"[Se omitieron {len(dropped)} mensajes anteriores para respetar el límite de contexto]"
+                )]
+
+        # Los mensajes de sistema van juntos al inicio (requisito de Anthropic)
+        result = system_part + summary_messages + task_part + recent
+        self.last_stats = {
+            "input_messages": len(messages),
+            "sent_messages": len(result),
+            "dropped_messages": len(dropped),
+            "input_tokens": self.count_messages(head) + self.count_messages(body),
+            "sent_tokens": self.count_messages(result),
+        }
+        return result
+
+    # ------------------------------------------------------------------
+    # Resumen incremental
+    # ------------------------------------------------------------------
+
+    def _summarize(self, messages: List[BaseMessage], dropped: List[BaseMessage]) -> str:
+        """
+        Resume los mensajes descartados reutilizando el resumen previo:
+        solo se envían al LLM los mensajes descartados desde la última vez.
+        """
+        conversation_id = str(messages[0].id or id(messages[0]))
+        with self._lock:
+            last_id, previous = self._summaries.get(conversation_id, (None, ""))
+            if conversation_id in self._summaries:
+                self._summaries.move_to_end(conversation_id)
+
+        pending = dropped
+        if last_id is not None:
+            ids = [message.id for message in dropped]
+            if last_id in ids:
+                pending = dropped[ids.index(last_id) + 1:]
+            else:
+                previous = ""
+
+        if not pending:
+            return previous
+
+        prompt = SUMMARY_PROMPT.format(
+            previous_summary=f"RESUMEN PREVIO:\n{previous}\n" if previous else "",
+            conversation=get_buffer_string(pending)
+        )
+        summary = self.summarizer.invoke(prompt).content
+
+        with self._lock:
+            self._summaries[conversation_id] = (dropped[-1].id, summary)
+            self._summaries.move_to_end(conversation_id)
+            while len(self._summaries) > self.max_conversations:
+                self._summaries.popitem(last=False)
+        return summary
@@ -0,0 +1,123 @@
+"""
+Fan-out acotado con Send
+
+Un conditional edge que devuelve un ``Send`` por elemento lanza todas
+las tareas a la vez: con 20 analistas son 20 subgrafos de entrevista en
+paralelo, cada uno con sus propias búsquedas. ``SendScheduler`` reparte
+los elementos en oleadas de como máximo ``max_concurrency`` tareas:
+
+- Los elementos se ordenan por prioridad (mayor primero) antes de
+  repartirlos, así que los más importantes se procesan antes.
+- Cada oleada es un superstep de LangGraph: sus resultados llegan al
+  reducer (p. ej. ``sections``) antes de lanzar la siguiente, de modo
+  que el estado avanza de forma progresiva y la memoria y la carga
+  sobre los proveedores quedan acotadas.
+- El progreso se guarda en una clave entera del estado (``cursor_key``)
+  que el grafo debe declarar.
+- Con ``batch_size`` cada Send lleva una lista de elementos, para nodos
+  que procesan varios en una sola llamada (ver utils.batching).
+
+Ejemplo:
+    >>> scheduler = SendScheduler(
+    ...     node="generate_joke",
+    ...     items_key="subjects",
+    ...     make_input=lambda state, subject: {"subject": subject},
+    ...     cursor_key="jokes_dispatched",
+    ...     max_concurrency=4
+    ... )
+    >>> builder.add_node("schedule_jokes", scheduler.schedule)
+    >>> builder.add_conditional_edges(
+    ...     "schedule_jokes", scheduler.route(then=["best_joke"]), ["generate_joke", "best_joke"]
+    ... )
+    >>> builder.add_edge("generate_joke", "schedule_jokes")
+"""
+
+from typing import Optional, Dict, Any, List, Callable, Sequence, Union
+
+from langgraph.types import Send
+
+
+class SendScheduler:
+    """Reparte un fan-out de Send en oleadas con concurrencia máxima."""
+
+    def __init__(
+        self,
+        node: str,
+        items_key: str,
+        make_input: Callable[[Dict[str, Any], Any], Dict[str, Any]],
+        cursor_key: str,
+        max_concurrency: int = 4,
+        priority: Optional[Callable[[Any], float]] = None,
+        batch_size: Optional[int] = None
+    ):
+        """
+        Args:
+            node: Nodo destino de cada Send
+            items_key: Clave del estado con la lista de elementos
+            make_input: (estado, elemento) → input del nodo destino
+            cursor_key: Clave entera del estado donde se guarda el progreso
+            max_concurrency: Tareas máximas por oleada
+            priority: elemento → prioridad (mayor primero); None conserva el orden
+            batch_size: Elementos por Send; make_input recibe entonces una lista
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency debe ser al menos 1")
+        self.node = node
+        self.items_key = items_key
+        self.make_input = make_input
+        self.cursor_key = cursor_key
+        self.max_concurrency = max_concurrency
+        self.priority = priority
+        self.batch_size = batch_size
+
+    def ordered(self, state: Dict[str, Any]) -> List[Any]:
+        """Elementos en orden de despacho."""
+        items = list(state.get(self.items_key) or [])
+        if self.priority is not None:
+            # sorted es estable: a igual prioridad se conserva el orden original
+            items = sorted(items, key=self.priority, reverse=True)
+        return items
+
+    def _units(self, state: Dict[str, Any]) -> List[Any]:
+        """Unidades de despacho: elementos, o lotes de batch_size elementos."""
+        items = self.ordered(state)
+        if not self.batch_size:
+            return items
+        return [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+    def reset(self) -> Dict[str, int]:
+        """Update que reinicia el progreso (devolverlo al generar los elementos)."""
+        return {self.cursor_key: 0}
+
+    def schedule(self, state: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Nodo que reserva la siguiente oleada.
+
+        Se ejecuta una vez por oleada: al terminar todas las tareas de
+        una oleada (barrera de LangGraph) y antes de lanzar la siguiente.
+        """
+        return {self.cursor_key: (state.get(self.cursor_key) or 0) + self.max_concurrency}
+
+    def wave(self, state: Dict[str, Any]) -> List[Send]:
+        """Sends de la oleada reservada por el último ``schedule``."""
+        end = state.get(self.cursor_key) or 0
+        units = self._units(state)[max(0, end - self.max_concurrency):end]
+        return [Send(self.node, self.make_input(state, unit)) for unit in units]
+
+    def route(self, then: Union[str, Sequence[str]]) -> Callable[[Dict[str, Any]], List[Union[Send, str]]]:
+        """
+        Función para ``add_conditional_edges`` tras el nodo ``schedule``.
+
+        Args:
+            then: Nodo(s) a ejecutar cuando ya no quedan elementos
+
+        Returns:
+            Función estado → Sends de la oleada, o ``then`` si terminó
+        """
+        next_nodes = [then] if isinstance(then, str) else list(then)
+
+        def route_wave(state: Dict[str, Any]) -> List[Union[Send, str]]:
+            sends = self.wave(state)
+            return sends if sends else next_nodes
+
+        return route_wave
@@ -0,0 +1,147 @@
+"""
+Keyword Classifier
+
+Clasificador de párrafos por palabras clave con pesos, para repartir un
+documento entre categorías (secciones, workers, especialistas) sin
+llamar al LLM.
+
+- La taxonomía es un dict categoría → palabras clave. Cada categoría
+  acepta una lista (peso 1.0 por palabra) o un dict palabra → peso, y se
+  puede ampliar con ``extend``.
+- Las palabras clave se compilan en un índice término → [(categoría,
+  peso)]: un término compartido por varias categorías se busca una vez.
+- Cada párrafo se puntúa con el mismo bucle ``kw in párrafo`` que el
+  clasificador original del ejercicio 2.3 (búsqueda de subcadena en C);
+  solo los párrafos con coincidencias suman pesos. Una regex de
+  alternativas o un índice sobre el documento completo resultaron más
+  lentos que este bucle en CPython.
+
+Ejemplo:
+    >>> classifier = KeywordClassifier({
+    ...     "technical": ["arquitectura", "api"],
+    ...     "financial": {"costo": 1.0, "roi": 2.0},
+    ... })
+    >>> classifier.classify("El ROI supera el costo")
+    'financial'
+    >>> classifier.extend("technical", {"kubernetes": 1.5})
+"""
+
+import re
+from typing import Dict, List, Mapping, Sequence, Tuple, Union
+
+
+Keywords = Union[Sequence[str], Mapping[str, float]]
+
+
+class KeywordClassifier:
+    """
+    Puntúa textos contra una taxonomía de palabras clave ponderadas.
+
+    Cada palabra clave cuenta una vez por párrafo (presencia, no
+    frecuencia), así un término repetido no domina la clasificación. A
+    igual puntuación gana la primera categoría de la taxonomía, que
+    también es la categoría por defecto si no coincide ninguna palabra.
+    """
+
+    def __init__(self, taxonomy: Mapping[str, Keywords], whole_words: bool = False):
+        """
+        Args:
+            taxonomy: categoría → lista de palabras clave o dict palabra → peso
+            whole_words: Buscar solo palabras completas; por defecto se
+                         buscan como subcadenas ("costo" cuenta en "costos")
+        """
+        if not taxonomy:
+            raise ValueError("La taxonomía necesita al menos una categoría")
+        self.whole_words = whole_words
+        self.taxonomy: Dict[str, Dict[str, float]] = {}
+        for category, keywords in taxonomy.items():
+            self.taxonomy[category] = {}
+            self._add(category, keywords)
+        self._compile()
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self.taxonomy)
+
+    def _add(self, category: str, keywords: Keywords):
+        weights = keywords if isinstance(keywords, Mapping) else {kw: 1.0 for kw in keywords}
+        for keyword, weight in weights.items():
+            self.taxonomy[category][keyword.lower()] = float(weight)
+
+    def extend(self, category: str, keywords: Keywords) -> "KeywordClassifier":
+        """Añade (o re-pondera) palabras clave; crea la categoría si no existe."""
+        self.taxonomy.setdefault(category, {})
+        self._add(category, keywords)
+        self._compile()
+        return self
+
+    def _compile(self):
+        # Índice término → [(posición de categoría, peso)]
+        self._positions: Dict[str, List[Tuple[int, float]]] = {}
+        for position, weights in enumerate(self.taxonomy.values()):
+            for keyword, weight in weights.items():
+                self._positions.setdefault(keyword, []).append((position, weight))
+        self._terms = list(self._positions)
+        # Con whole_words cada término se busca con una regex compilada una vez
+        self._patterns = [
+            re.compile(rf"(?<!\w){re.escape(term)}(?!\w)").search
+            for term in self._terms
+        ] if self.whole_words else []
+
+    def _present(self, lowered: str) -> List[str]:
+        """Términos presentes en ``lowered`` (texto ya en minúsculas)."""
+        if not self.whole_words:
+            return [term for term in self._terms if term in lowered]
+        return [term for term, search in zip(self._terms, self._patterns) if search(lowered)]
+
+    def _scores(self, present: List[str]) -> List[float]:
+        scores = [0.0] * len(self.taxonomy)
+        for term in present:
+            for position, weight in self._positions[term]:
+                scores[position] += weight
+        return scores
+
+    def matches(self, text: str) -> set:
+        """Palabras clave presentes en el texto."""
+        return set(self._present(text.lower()))
+
+    def score(self, text: str) -> Dict[str, float]:
+        """Puntuación de cada categoría para un texto."""
+        return dict(zip(self.taxonomy, self._scores(self._present(text.lower()))))
+
+    def classify(self, text: str) -> str:
+        """Categoría con mayor puntuación."""
+        scores = self._scores(self._present(text.lower()))
+        # index() devuelve el primero de los empatados: respeta el orden de la taxonomía
+        return self.categories[scores.index(max(scores))]
+
+    def _paragraphs(self, document: str) -> List[str]:
+        return [p for p in (paragraph.strip() for paragraph in document.split("\n\n")) if p]
+
+    def score_paragraphs(self, document: str) -> List[Tuple[str, Dict[str, float]]]:
+        """Párrafos (separados por líneas en blanco) con sus puntuaciones."""
+        return [(paragraph, self.score(paragraph)) for paragraph in self._paragraphs(document)]
+
+    def split(self, document: str) -> Dict[str, List[str]]:
+        """Reparte los párrafos del documento entre las categorías."""
+        buckets: List[List[str]] = [[] for _ in self.taxonomy]
+        # Bucle caliente: sin llamadas a métodos por párrafo salvo con whole_words
+        terms, positions, present = self._terms, self._positions, self._present
+        whole_words = self.whole_words
+        for paragraph in document.split("\n\n"):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            lowered = paragraph.lower()
+            found = present(lowered) if whole_words else [term for term in terms if term in lowered]
+            if not found:
+                # Sin coincidencias gana la primera categoría: no hace falta puntuar
+                buckets[0].append(paragraph)
+                continue
+            scores = [0.0] * len(buckets)
+            for term in found:
+                for position, weight in positions[term]:
+                    scores[position] += weight
+            # index() devuelve el primero de los empatados, como classify
+            buckets[scores.index(max(scores))].append(paragraph)
+        return dict(zip(self.taxonomy, buckets))
@@ -10,17 +10,27 @@ LangSmith es una plataforma de observabilidad que permite:
 - Medir latencia, tokens y costos
 - Debuggear comportamientos inesperados
 - Comparar diferentes versiones de prompts
+
+Con backend="local" los mismos helpers escriben el árbol de runs en un
+LocalTraceStore (SQLite) en vez de LangSmith, para entornos sin acceso
+a internet.
 """
 
 import os
+import time
+import uuid
 from typing import Optional, Dict, Any, List
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timezone
 import functools
 
 # LangSmith está incluido en langchain-core
 from langsmith import Client, traceable, get_current_run_tree
 from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import var_child_runnable_config
+
+from .local_trace_store import LocalTraceStore, LocalTracer, current_local_span
+from .trace_sampling import SamplingPolicy, SamplingState, current_sampling_state
 
 
 class LangSmithConfig:
@@ -34,7 +44,12 @@ class LangSmithConfig:
     def __init__(
         self,
         project_name: Optional[str] = None,
-        enabled: Optional[bool] = None
+        enabled: Optional[bool] = None,
+        backend: Optional[str] = None,
+        local_store_path: Optional[str] = None,
+        async_metadata: bool = False,
+        metadata_queue_size: int = 10000,
+        sampling: Optional[SamplingPolicy] = None
     ):
         """
         Inicializa la configuración de LangSmith.
@@ -43,10 +58,33 @@ class LangSmithConfig:
             project_name: Nombre del proyecto en LangSmith (ej: "micai-tutorial")
             enabled: Si es True, fuerza el tracing. Si es False, lo desactiva.
                     Si es None, usa la variable de entorno LANGCHAIN_TRACING_V2
+                    (el backend local siempre está habilitado)
+            backend: "langsmith" (default) o "local". Si es None, usa la
+                    variable de entorno LANGSMITH_BACKEND
+            local_store_path: Archivo SQLite del backend local. Si es None, usa
+                    LANGSMITH_LOCAL_STORE o traces/<proyecto>.db
+            async_metadata: Si es True, la metadata/tags de trace_agent,
+                    add_run_metadata, add_run_tags y log_agent_decision se
+                    escriben desde un thread en background (solo con el
+                    backend local; ver BackgroundMetadataWriter)
+            metadata_queue_size: Capacidad del buffer del writer en background
+            sampling: Política de muestreo (head/tail). None traza el 100%.
+                    Con el backend "langsmith" la política solo se aplica
+                    dentro de trace_agent, trace_section o sampling_scope: un
+                    ``app.invoke`` suelto se traza siempre, porque el tracing
+                    por variables de entorno no pasa por la política
         """
+        self.backend = (backend or os.getenv("LANGSMITH_BACKEND", "langsmith")).lower()
+        if self.backend not in ("langsmith", "local"):
+            raise ValueError(
+                f"Backend '{self.backend}' no soportado. Usa 'langsmith' o 'local'."
+            )
+
         # Determinar si el tracing está habilitado
         if enabled is not None:
             self.enabled = enabled
+        elif self.backend == "local":
+            self.enabled = True
         else:
             self.enabled = os.getenv("LANGCHAIN_TRACING_V2", "false").lower() == "true"
 
@@ -56,28 +94,67 @@ class LangSmithConfig:
 
         self.project_name = os.getenv("LANGCHAIN_PROJECT", "default")
 
-        # Inicializar cliente si está habilitado
+        # Inicializar cliente (o store local) si está habilitado
         self.client = None
-        if self.enabled:
+        self.store: Optional[LocalTraceStore] = None
+        if self.enabled and self.backend == "local":
+            store_path = (
+                local_store_path
+                or os.getenv("LANGSMITH_LOCAL_STORE")
+                or f"traces/{self.project_name}.db"
+            )
+            self.store = LocalTraceStore(store_path)
+        elif self.enabled:
             try:
                 self.client = Client()
             except Exception as e:
                 print(f"⚠️ Warning: No se pudo inicializar LangSmith client: {e}")
                 self.enabled = False
 
+        self.sampling = sampling
+
+        # Writer en background para metadata (fuera del hot path de los nodos)
+        self.metadata_writer: Optional["BackgroundMetadataWriter"] = None
+        if self.enabled and async_metadata:
+            self.metadata_writer = BackgroundMetadataWriter(
+                self, max_queue=metadata_queue_size
+            )
+
     def is_enabled(self) -> bool:
         """Verifica si LangSmith está habilitado."""
         return self.enabled
 
+    def is_local(self) -> bool:
+        """Verifica si el tracing usa el backend local."""
+        return self.enabled and self.store is not None
+
     def get_client(self) -> Optional[Client]:
         """Retorna el cliente de LangSmith si está disponible."""
         return self.client
 
+    def get_store(self) -> Optional[LocalTraceStore]:
+        """Retorna el store local si el backend es "local"."""
+        return self.store
+
+    def get_callbacks(self) -> list:
+        """
+        Callbacks a pasar al invocar grafos/chains.
+
+        Con el backend local retorna un LocalTracer; con LangSmith no hace
+        falta ninguno porque el tracing se activa con variables de entorno.
+        """
+        if self.is_local():
+            return [LocalTracer(self.store, sampling=self.sampling)]
+        return []
+
     def get_project_url(self) -> str:
         """Retorna la URL del proyecto en LangSmith."""
         if not self.enabled:
             return "LangSmith no está habilitado"
 
+        if self.is_local():
+            return f"sqlite:///{self.store.path} (Proyecto: {self.project_name})"
+
         # La URL sigue el formato: https://smith.langchain.com/o/[org]/projects/p/[project]
         return f"https://smith.langchain.com (Proyecto: {self.project_name})"
 
@@ -87,9 +164,15 @@ class LangSmithConfig:
         print("🔍 LangSmith Configuration Status")
         print("="*60)
         print(f"Enabled: {self.enabled}")
+        print(f"Backend: {self.backend}")
         print(f"Project: {self.project_name}")
 
-        if self.enabled:
+        if self.sampling is not None:
+            print(f"Sampling: rate={self.sampling.rate}, tag_rates={self.sampling.tag_rates}")
+
+        if self.is_local():
+            print(f"Store: {self.store.path}")
+        elif self.enabled:
             print(f"API Key: {'✓ Configured' if os.getenv('LANGCHAIN_API_KEY') else '✗ Missing'}")
             print(f"Endpoint: {os.getenv('LANGCHAIN_ENDPOINT', 'https://api.smith.langchain.com')}")
             print(f"URL: {self.get_project_url()}")
@@ -147,14 +230,536 @@ def get_runnable_config(
     # Añadir otros kwargs
     config.update(kwargs)
 
+    # Con backend local, registrar el árbol de runs en el store
+    local_callbacks = get_default_config().get_callbacks()
+    if local_callbacks and "callbacks" not in config:
+        config["callbacks"] = local_callbacks
+
     return config
 
 
+# =============================================================================
+# SPANS DEL BACKEND LOCAL
+# =============================================================================
+
+class _LocalSpan:
+    """Run abierto por trace_agent/trace_section cuando el backend es local."""
+
+    def __init__(
+        self,
+        name: str,
+        run_type: str,
+        parent_run_id: Optional[str],
+        trace_id: Optional[str]
+    ):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.run_type = run_type
+        self.parent_run_id = parent_run_id
+        # Un span sin padre es la raíz de su propio trace
+        self.trace_id = trace_id if (trace_id or parent_run_id) else self.id
+        self.tags: List[str] = []
+        self.metadata: Dict[str, Any] = {}
+        self.inputs: Optional[Any] = None
+        self.outputs: Optional[Any] = None
+        self.start_time = datetime.now(timezone.utc)
+        # LocalTracer del grafo del que cuelga el span (y su run raíz): el
+        # tracer decide si se escribe según el muestreo de ese run raíz
+        self.tracer: Optional[LocalTracer] = None
+        self.tracer_root: Optional[str] = None
+        # Run de LangChain en curso al abrir el span (ver _current_local_parent)
+        self.langchain_run_id: Optional[str] = None
+
+
+def _current_langchain_run_id() -> Optional[str]:
+    """ID del run de LangChain/LangGraph en curso (ej: el nodo que se ejecuta)."""
+    config = var_child_runnable_config.get()
+    if not config:
+        return None
+    callbacks = config.get("callbacks")
+    parent_run_id = getattr(callbacks, "parent_run_id", None)
+    return str(parent_run_id) if parent_run_id else None
+
+
+def _current_local_tracer() -> Optional[LocalTracer]:
+    """LocalTracer del grafo en curso, si se invocó con uno."""
+    config = var_child_runnable_config.get()
+    callbacks = config.get("callbacks") if config else None
+    for handler in getattr(callbacks, "handlers", None) or []:
+        if isinstance(handler, LocalTracer):
+            return handler
+    return None
+
+
+def _current_local_parent() -> tuple:
+    """
+    Run más interno en curso con el backend local, como (span, None) o
+    (None, id del run de LangGraph).
+
+    Un span recuerda el run de LangChain en el que se abrió: si el run en
+    curso es otro, se invocó un grafo dentro del span y su nodo es el más
+    interno; si es el mismo, el span se abrió dentro del nodo.
+    """
+    span = current_local_span.get()
+    run_id = _current_langchain_run_id()
+    if span is not None and (run_id is None or run_id == span.langchain_run_id):
+        return span, None
+    return None, run_id
+
+
+@contextmanager
+def _local_span(name: str, run_type: str, store: LocalTraceStore, inputs: Optional[Any] = None):
+    """Abre un span local, lo hace el span actual y lo persiste al salir."""
+    sampling_state = current_sampling_state.get()
+    if sampling_state is not None and not sampling_state.sampled:
+        # El run raíz no fue muestreado: el span existe pero no se persiste
+        yield _LocalSpan(name, run_type, None, None)
+        return
+
+    parent, parent_run = _current_local_parent()
+    tracer, tracer_root = None, None
+    if parent is not None:
+        parent_run_id, trace_id = parent.id, parent.trace_id
+        tracer, tracer_root = parent.tracer, parent.tracer_root
+    else:
+        # Enlazar con el nodo del grafo que se está ejecutando, si lo hay
+        parent_run_id, trace_id = parent_run, None
+        if parent_run is not None:
+            tracer = _current_local_tracer()
+            if tracer is not None:
+                tracer_root = tracer.root_of(parent_run)
+                trace_id = tracer.trace_id_of(parent_run)
+
+    span = _LocalSpan(name, run_type, parent_run_id, trace_id)
+    span.tracer, span.tracer_root = tracer, tracer_root
+    span.langchain_run_id = _current_langchain_run_id()
+    span.inputs = inputs
+    token = current_local_span.set(span)
+    error = None
+    try:
+        yield span
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        current_local_span.reset(token)
+        record = dict(
+            run_id=span.id,
+            name=span.name,
+            run_type=span.run_type,
+            parent_run_id=span.parent_run_id,
+            trace_id=span.trace_id,
+            start_time=span.start_time,
+            end_time=datetime.now(timezone.utc),
+            inputs=span.inputs,
+            outputs=span.outputs,
+            error=error,
+            tags=span.tags,
+            metadata=span.metadata
+        )
+        if span.tracer is not None:
+            span.tracer.record_span(span.tracer_root, **record)
+        else:
+            store.record_run(**record)
+
+
+def _has_parent_run(config: "LangSmithConfig") -> bool:
+    """True si ya hay un run en curso (el nuevo run no sería raíz)."""
+    if config.is_local():
+        return current_local_span.get() is not None or _current_langchain_run_id() is not None
+    return get_current_run_tree() is not None
+
+
+def _record_tail_sample(
+    config: "LangSmithConfig",
+    name: str,
+    tags: Optional[List[str]],
+    inputs: Any,
+    state: SamplingState,
+    error: Optional[str],
+    start_time: datetime,
+    end_time: datetime
+):
+    """Registra el run raíz rescatado por una regla tail-based."""
+    tags = list(tags or []) + ["tail_sampled"]
+    outputs = state.outputs if isinstance(state.outputs, dict) else {"output": state.outputs}
+    metadata = {"sampling": "tail"}
+
+    if config.is_local():
+        config.store.record_run(
+            run_id=uuid.uuid4(),
+            name=name,
+            start_time=start_time,
+            end_time=end_time,
+            inputs=inputs,
+            outputs=outputs,
+            error=error,
+            tags=tags,
+            metadata=metadata
+        )
+    elif config.client is not None:
+        try:
+            config.client.create_run(
+                name=name,
+                inputs=inputs if isinstance(inputs, dict) else {"input": inputs},
+                run_type="chain",
+                project_name=config.project_name,
+                outputs=outputs,
+                error=error,
+                start_time=start_time,
+                end_time=end_time,
+                tags=tags,
+                extra={"metadata": metadata}
+            )
+        except Exception as e:
+            print(f"Warning: No se pudo registrar run tail-sampled: {e}")
+
+
+@contextmanager
+def sampling_scope(
+    name: str = "root",
+    tags: Optional[List[str]] = None,
+    inputs: Optional[Any] = None
+):
+    """
+    Aplica la política de muestreo a un run raíz.
+
+    La decisión head-based se toma una vez al entrar; todos los spans y
+    runs creados dentro (trace_section, trace_agent, LLMs, grafos) la
+    heredan. Si el run no fue muestreado se ejecuta sin tracing y, al
+    salir, las reglas tail-based (latencia, error, banderas de salida)
+    pueden conservarlo: con LangSmith se registra solo el run raíz
+    (sus hijos ya no existen), con el backend local también.
+
+    Sin política de muestreo, o si ya hay un run raíz en curso, no hace nada.
+
+    Con el backend "langsmith" es la única forma de muestrear un
+    ``app.invoke`` suelto: el tracing por variables de entorno traza el
+    100%. Con el backend local el LocalTracer aplica la política también
+    sin sampling_scope.
+
+    Args:
+        name: Nombre del run raíz (para el registro tail-based)
+        tags: Tags del run raíz (para tasas por tag)
+        inputs: Entradas a registrar si el run se conserva por tail
+
+    Yields:
+        SamplingState; asigna ``state.outputs`` con la salida del run
+        para que las reglas tail puedan evaluarla
+
+    Ejemplo:
+        >>> with sampling_scope("SupportTicket", tags=["support"]) as state:
+        ...     result = app.invoke(initial_state, config=get_runnable_config())
+        ...     state.outputs = result  # should_escalate=True => se conserva
+    """
+    config = get_default_config()
+    policy = config.sampling
+    current = current_sampling_state.get()
+
+    if policy is None or not config.enabled or current is not None or _has_parent_run(config):
+        yield current or SamplingState(sampled=True)
+        return
+
+    state = SamplingState(sampled=policy.sample_head(tags))
+    token = current_sampling_state.set(state)
+    start_time = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    error = None
+
+    try:
+        if state.sampled or config.is_local():
+            yield state
+        else:
+            from langsmith import tracing_context
+
+            with tracing_context(enabled=False):
+                yield state
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        current_sampling_state.reset(token)
+
+        if state.sampled:
+            policy.record("head_kept")
+        elif policy.tail_keep((time.perf_counter() - start) * 1000, error, state.outputs):
+            policy.record("tail_kept")
+            _record_tail_sample(
+                config, name, tags, inputs, state, error,
+                start_time, datetime.now(timezone.utc)
+            )
+        else:
+            policy.record("dropped")
+
+
+def _current_run_target(config: "LangSmithConfig") -> Optional[Any]:
+    """
+    Run al que se aplica la metadata en este contexto: el más interno entre
+    el span local y el run de LangGraph en curso (backend local), o el
+    RunTree de LangSmith.
+    """
+    sampling_state = current_sampling_state.get()
+    if sampling_state is not None and not sampling_state.sampled:
+        return None
+
+    if config.is_local():
+        span, run_id = _current_local_parent()
+        if span is not None:
+            return span
+        # Un run de LangGraph solo llega al store si lo registra un
+        # LocalTracer; sin él, la metadata quedaría pendiente para siempre
+        tracer = _current_local_tracer()
+        if run_id is not None and tracer is not None and tracer.root_of(run_id):
+            return run_id
+        return None
+    return get_current_run_tree()
+
+
+def _apply_run_update(
+    config: "LangSmithConfig",
+    target: Any,
+    metadata: Optional[Dict[str, Any]] = None,
+    tags: Optional[List[str]] = None,
+    deferred: bool = False
+):
+    """
+    Aplica metadata/tags a un run.
+
+    Con deferred=True (desde el writer en background) el span local puede
+    haber terminado ya, así que se actualiza el registro persistido en vez
+    del objeto en memoria. Un RunTree de LangSmith solo se modifica desde
+    el thread que lo ejecuta (ver BackgroundMetadataWriter.submit).
+    """
+    if target is None:
+        return
+
+    if isinstance(target, (_LocalSpan, str)):
+        run_id = target.id if isinstance(target, _LocalSpan) else target
+        if isinstance(target, _LocalSpan) and not deferred:
+            if metadata:
+                target.metadata.update(metadata)
+            if tags:
+                target.tags.extend(tags)
+            return
+        if config.store is None:
+            return
+        if metadata:
+            config.store.add_metadata(run_id, metadata)
+        if tags:
+            config.store.add_tags(run_id, tags)
+        return
+
+    run_tree = target
+    if metadata:
+        if getattr(run_tree, "metadata", None) is None:
+            run_tree.metadata = {}
+        run_tree.metadata.update(metadata)
+    if tags:
+        if getattr(run_tree, "tags", None) is None:
+            run_tree.tags = []
+        run_tree.tags.extend(tags)
+
+
+def _generated_metadata(
+    metadata: Optional[Dict[str, Any]],
+    metadata_fn: Optional[callable],
+    args: tuple,
+    kwargs: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Metadata fija combinada con la que genera ``metadata_fn``."""
+    if metadata_fn:
+        generated = metadata_fn(*args, **kwargs)
+        if generated:
+            return {**(metadata or {}), **generated}
+    return metadata
+
+
+class BackgroundMetadataWriter:
+    """
+    Escribe metadata y tags de runs desde un thread en background.
+
+    El nodo solo encola la actualización en un ring buffer acotado; el
+    thread la aplica en lotes. Si el buffer se llena se descarta la
+    actualización más antigua y se incrementa ``dropped``, así que la
+    observabilidad nunca bloquea al nodo.
+
+    Solo se difieren las actualizaciones del backend local, que van al
+    store bajo su lock. El cliente de LangSmith serializa el RunTree en
+    curso desde sus propios threads, así que modificarlo desde el writer
+    sería una carrera: esas actualizaciones se aplican en el thread que
+    llama a ``submit``.
+
+    Ejemplo:
+        >>> config = LangSmithConfig(async_metadata=True)
+        >>> set_default_config(config)
+        >>> # ... ejecutar grafos ...
+        >>> config.metadata_writer.flush()
+        >>> print(config.metadata_writer.stats())
+    """
+
+    def __init__(
+        self,
+        config: "LangSmithConfig",
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 0.5
+    ):
+        """
+        Args:
+            config: Configuración cuyo backend recibe las actualizaciones
+            max_queue: Capacidad del ring buffer
+            batch_size: Máximo de actualizaciones aplicadas por lote
+            flush_interval: Segundos entre flushes si el buffer no se llena
+        """
+        import atexit
+        import threading
+        from collections import deque
+
+        self.config = config
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self._buffer = deque(maxlen=max_queue)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="langsmith-metadata-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(
+        self,
+        target: Any,
+        metadata: Optional[Dict[str, Any]] = None,
+        tags: Optional[List[str]] = None,
+        metadata_fn: Optional[callable] = None,
+        args: tuple = (),
+        kwargs: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Encola una actualización. ``metadata_fn(*args, **kwargs)`` se evalúa
+        en el thread de background, por lo que solo debe leer sus argumentos.
+
+        Si ``target`` es un RunTree de LangSmith la actualización se aplica
+        aquí mismo, en el thread del run.
+
+        Returns:
+            False si el writer está cerrado o no hay run al que aplicarla
+        """
+        if self._closed or target is None:
+            return False
+
+        if not isinstance(target, (_LocalSpan, str)):
+            self._write_batch([(target, metadata, tags, metadata_fn, args, kwargs or {})])
+            return True
+
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append((target, metadata, tags, metadata_fn, args, kwargs or {}))
+            self._idle.clear()
+            full_batch = len(self._buffer) >= self.batch_size
+
+        if full_batch:
+            self._wakeup.set()
+        return True
+
+    def _drain(self) -> List[tuple]:
+        with self._lock:
+            batch = []
+            while self._buffer and len(batch) < self.batch_size:
+                batch.append(self._buffer.popleft())
+            return batch
+
+    def _write_batch(self, batch: List[tuple]):
+        for target, metadata, tags, metadata_fn, args, kwargs in batch:
+            try:
+                metadata = _generated_metadata(metadata, metadata_fn, args, kwargs)
+                _apply_run_update(self.config, target, metadata, tags, deferred=True)
+                with self._lock:
+                    self.written += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"Warning: Error al escribir metadata: {e}")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            batch = self._drain()
+            while batch:
+                self._write_batch(batch)
+                batch = self._drain()
+
+            with self._lock:
+                if not self._buffer:
+                    self._idle.set()
+            if self._closed:
+                return
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Espera a que se escriban todas las actualizaciones pendientes."""
+        self._wakeup.set()
+        return self._idle.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Escribe lo pendiente y detiene el thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores del writer: pendientes, escritas, descartadas y errores."""
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            "pending": pending,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+def _submit_run_update(
+    metadata: Optional[Dict[str, Any]] = None,
+    tags: Optional[List[str]] = None,
+    metadata_fn: Optional[callable] = None,
+    args: tuple = (),
+    kwargs: Optional[Dict[str, Any]] = None
+):
+    """Aplica (o encola, si hay writer en background) una actualización del run actual."""
+    config = get_default_config()
+    target = _current_run_target(config)
+
+    if config.metadata_writer is not None:
+        config.metadata_writer.submit(target, metadata, tags, metadata_fn, args, kwargs)
+        return
+
+    try:
+        metadata = _generated_metadata(metadata, metadata_fn, args, kwargs or {})
+    except Exception as e:
+        print(f"Warning: Error al generar metadata: {e}")
+
+    _apply_run_update(config, target, metadata, tags)
+
+
 def add_run_metadata(metadata: Dict[str, Any]):
     """
     Añade metadata al run actual de LangSmith.
 
     Útil cuando quieres añadir información dinámica durante la ejecución.
+    Si la configuración usa async_metadata=True, la escritura se hace en
+    background.
 
     Args:
         metadata: Diccionario con metadata a añadir
@@ -165,11 +770,7 @@ def add_run_metadata(metadata: Dict[str, Any]):
         ...     add_run_metadata({"steps_completed": 3, "total_cost": 0.05})
         ...     return result
     """
-    run_tree = get_current_run_tree()
-    if run_tree:
-        if not hasattr(run_tree, "metadata"):
-            run_tree.metadata = {}
-        run_tree.metadata.update(metadata)
+    _submit_run_update(metadata=metadata)
 
 
 def add_run_tags(tags: List[str]):
@@ -184,11 +785,7 @@ def add_run_tags(tags: List[str]):
         ...     add_run_tags(["urgent", "high-priority"])
         ...     return handle(input)
     """
-    run_tree = get_current_run_tree()
-    if run_tree:
-        if not hasattr(run_tree, "tags"):
-            run_tree.tags = []
-        run_tree.tags.extend(tags)
+    _submit_run_update(tags=tags)
 
 
 @contextmanager
@@ -221,15 +818,29 @@ def trace_section(
         ...
         ...     return result
     """
-    from langsmith import trace
+    config = get_default_config()
 
-    with trace(name=name, run_type=run_type) as run_tree:
-        if tags:
-            add_run_tags(tags)
-        if metadata:
-            add_run_metadata(metadata)
+    # Si la sección es un run raíz, decide el muestreo para sus hijos
+    with sampling_scope(name, tags=tags, inputs=metadata):
+        if config.is_local():
+            with _local_span(name, run_type, config.store) as span:
+                if tags:
+                    add_run_tags(tags)
+                if metadata:
+                    add_run_metadata(metadata)
+
+                yield span
+            return
 
-        yield run_tree
+        from langsmith import trace
+
+        with trace(name=name, run_type=run_type) as run_tree:
+            if tags:
+                add_run_tags(tags)
+            if metadata:
+                add_run_metadata(metadata)
+
+            yield run_tree
 
 
 def trace_agent(
@@ -255,24 +866,38 @@ def trace_agent(
         ...     return process_support_query(query)
     """
     def decorator(func):
+        run_name = name or func.__name__
+
+        def annotated_call(*args, **kwargs):
+            # Añadir tags y metadata dinámica (en background si está activo)
+            if tags or metadata_fn:
+                _submit_run_update(
+                    tags=tags,
+                    metadata_fn=metadata_fn,
+                    args=args,
+                    kwargs=kwargs
+                )
+
+            # Ejecutar función original
+            return func(*args, **kwargs)
+
+        traced_call = traceable(run_type="chain", name=run_name)(annotated_call)
+
         @functools.wraps(func)
-        @traceable(run_type="chain", name=name or func.__name__)
         def wrapper(*args, **kwargs):
-            # Añadir tags si se especificaron
-            if tags:
-                add_run_tags(tags)
+            config = get_default_config()
+            inputs = {"args": args, "kwargs": kwargs}
 
-            # Añadir metadata dinámica si se especificó
-            if metadata_fn:
-                try:
-                    metadata = metadata_fn(*args, **kwargs)
-                    if metadata:
-                        add_run_metadata(metadata)
-                except Exception as e:
-                    print(f"Warning: Error al generar metadata: {e}")
+            with sampling_scope(run_name, tags=tags, inputs=inputs) as sampling_state:
+                if config.is_local():
+                    with _local_span(run_name, "chain", config.store) as span:
+                        result = annotated_call(*args, **kwargs)
+                        span.outputs = result
+                else:
+                    result = traced_call(*args, **kwargs)
 
-            # Ejecutar función original
-            return func(*args, **kwargs)
+                sampling_state.outputs = result
+                return result
 
         return wrapper
     return decorator
@@ -309,6 +934,11 @@ def create_feedback(
         ...         comment="User reported incorrect information"
         ...     )
     """
+    config = get_default_config()
+    if config.is_local():
+        config.store.create_feedback(run_id, key=key, score=score, comment=comment)
+        return
+
     try:
         client = Client()
         client.create_feedback(
@@ -363,7 +993,126 @@ def log_agent_decision(
     add_run_metadata(metadata)
 
 
-def compare_runs(run_ids: List[str], metric: str = "latency"):
+_RUN_FETCH_BATCH_SIZE = 100
+
+
+def _run_metric_value(run: Dict[str, Any], metric: str) -> float:
+    """Valor de la métrica para un run normalizado."""
+    if metric == "latency":
+        return run.get("latency") or 0
+    elif metric == "total_tokens":
+        return run.get("total_tokens") or 0
+    elif metric == "cost":
+        return run.get("cost") or 0
+    raise ValueError(
+        f"Métrica '{metric}' no soportada. Usa 'latency', 'total_tokens' o 'cost'."
+    )
+
+
+def _normalize_langsmith_run(run) -> Dict[str, Any]:
+    """Convierte un Run de LangSmith al formato de dict del store local."""
+    cost = getattr(run, "cost", None)
+    if cost is None:
+        cost = getattr(run, "total_cost", None)
+    return {
+        "id": str(run.id),
+        "name": run.name,
+        "latency": run.latency,
+        "total_tokens": run.total_tokens,
+        "cost": float(cost) if cost is not None else 0,
+        "tags": list(run.tags or []),
+    }
+
+
+def fetch_runs(
+    run_ids: List[str],
+    client: Optional[Client] = None,
+    max_workers: int = 8
+) -> List[Dict[str, Any]]:
+    """
+    Obtiene muchos runs con pocas llamadas de red.
+
+    Con LangSmith pide los runs en lotes con ``list_runs(run_ids=...)``; si
+    el endpoint falla, cae a ``read_run`` concurrente con un solo cliente
+    compartido. Con el backend local hace una sola consulta SQL.
+
+    Args:
+        run_ids: IDs de los runs
+        client: Cliente de LangSmith a reutilizar (se crea uno si es None)
+        max_workers: Threads para el fallback concurrente
+
+    Returns:
+        Lista de runs (dicts con id, name, latency, total_tokens, cost, tags)
+        en el mismo orden que run_ids. Los runs no encontrados se omiten.
+    """
+    config = get_default_config()
+    if config.is_local():
+        runs = config.store.read_runs(run_ids)
+        for run in runs:
+            run["cost"] = run["metadata"].get("cost", 0)
+        return runs
+
+    client = client or config.get_client() or Client()
+    ids = [str(run_id) for run_id in run_ids]
+    found: Dict[str, Dict[str, Any]] = {}
+
+    try:
+        for start in range(0, len(ids), _RUN_FETCH_BATCH_SIZE):
+            batch = ids[start:start + _RUN_FETCH_BATCH_SIZE]
+            for run in client.list_runs(run_ids=batch):
+                found[str(run.id)] = _normalize_langsmith_run(run)
+    except Exception as e:
+        print(f"Warning: list_runs falló ({e}), usando read_run concurrente")
+        from concurrent.futures import ThreadPoolExecutor
+
+        missing = [run_id for run_id in ids if run_id not in found]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for run in executor.map(client.read_run, missing):
+                found[str(run.id)] = _normalize_langsmith_run(run)
+
+    return [found[run_id] for run_id in ids if run_id in found]
+
+
+def _metric_stats(values: List[float]) -> Dict[str, Any]:
+    """Estadísticas descriptivas de una lista de valores."""
+    from .logging_config import percentile
+
+    return {
+        "average": sum(values) / len(values),
+        "min": min(values),
+        "max": max(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "count": len(values),
+    }
+
+
+def _export_runs_csv(path: str, runs: List[Dict[str, Any]], metric: str):
+    """Exporta id, nombre, tags y valor de la métrica a CSV."""
+    import csv
+    from pathlib import Path
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["run_id", "name", "tags", metric])
+        for run in runs:
+            writer.writerow([
+                run["id"],
+                run.get("name", ""),
+                ";".join(run.get("tags") or []),
+                _run_metric_value(run, metric),
+            ])
+
+
+def compare_runs(
+    run_ids: List[str],
+    metric: str = "latency",
+    group_by_tags: Optional[List[str]] = None,
+    export_csv: Optional[str] = None,
+    client: Optional[Client] = None
+):
     """
     Compara múltiples runs y retorna estadísticas.
 
@@ -372,40 +1121,50 @@ def compare_runs(run_ids: List[str], metric: str = "latency"):
     Args:
         run_ids: Lista de IDs de runs a comparar
         metric: Métrica a comparar ("latency", "total_tokens", "cost")
+        group_by_tags: Tags para agrupar los runs (ej: ["before_fix", "after_fix"]).
+                       Cada grupo recibe sus propias estadísticas
+        export_csv: Ruta opcional para exportar los valores por run a CSV
+        client: Cliente de LangSmith a reutilizar
 
     Returns:
-        Dict con estadísticas comparativas
+        Dict con estadísticas comparativas (average, min, max, p50, p90,
+        p99, count) y, si se pidió, "groups" con las mismas estadísticas
+        por tag
 
     Ejemplo:
         >>> run_ids = ["run-1", "run-2", "run-3"]
-        >>> stats = compare_runs(run_ids, metric="latency")
-        >>> print(f"Average latency: {stats['average']}ms")
+        >>> stats = compare_runs(run_ids, metric="latency",
+        ...                      group_by_tags=["before_fix", "after_fix"])
+        >>> print(f"p90 latency: {stats['p90']}s")
+        >>> print(stats["groups"]["after_fix"]["p50"])
     """
     try:
-        client = Client()
-        runs = [client.read_run(run_id) for run_id in run_ids]
-
-        values = []
-        for run in runs:
-            if metric == "latency":
-                values.append(run.latency or 0)
-            elif metric == "total_tokens":
-                values.append((run.total_tokens or 0))
-            elif metric == "cost":
-                # El costo se calcula automáticamente por LangSmith
-                values.append(getattr(run, "cost", 0))
+        runs = fetch_runs(run_ids, client=client)
+        values = [_run_metric_value(run, metric) for run in runs]
 
         if not values:
             return {"error": "No values found"}
 
-        return {
+        result = {
             "metric": metric,
             "values": values,
-            "average": sum(values) / len(values),
-            "min": min(values),
-            "max": max(values),
-            "count": len(values)
+            **_metric_stats(values),
         }
+
+        if group_by_tags:
+            groups = {}
+            for tag in group_by_tags:
+                tag_values = [
+                    _run_metric_value(run, metric)
+                    for run in runs if tag in (run.get("tags") or [])
+                ]
+                groups[tag] = _metric_stats(tag_values) if tag_values else {"count": 0}
+            result["groups"] = groups
+
+        if export_csv:
+            _export_runs_csv(export_csv, runs, metric)
+
+        return result
     except Exception as e:
         return {"error": str(e)}
 
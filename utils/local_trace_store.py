@@ -0,0 +1,632 @@
+"""
+Local Trace Store
+
+Backend local (SQLite) para tracing cuando LangSmith no está disponible,
+por ejemplo en entornos sin acceso a internet.
+
+Guarda el mismo árbol de runs que veríamos en LangSmith (runs, tags,
+metadata, latencia y tokens) en un archivo SQLite, y ofrece una API de
+consulta pequeña para análisis de rendimiento:
+
+- LocalTraceStore: almacenamiento y consultas
+- LocalTracer: callback de LangChain que persiste los runs de grafos,
+  chains y LLMs en el store
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Union
+
+from langchain_core.tracers.base import BaseTracer
+from langchain_core.tracers.schemas import Run
+
+from .trace_sampling import SamplingPolicy, current_sampling_state
+
+
+# Span de trace_agent/trace_section abierto en este contexto (lo asigna
+# langsmith_config). Un grafo invocado dentro de él cuelga del span.
+current_local_span: ContextVar[Optional[Any]] = ContextVar("current_local_span", default=None)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    trace_id TEXT,
+    parent_run_id TEXT,
+    name TEXT,
+    run_type TEXT,
+    start_time REAL,
+    end_time REAL,
+    latency REAL,
+    status TEXT,
+    error TEXT,
+    inputs TEXT,
+    outputs TEXT,
+    metadata TEXT,
+    tags TEXT,
+    prompt_tokens INTEGER DEFAULT 0,
+    completion_tokens INTEGER DEFAULT 0,
+    total_tokens INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_parent ON runs(parent_run_id);
+CREATE INDEX IF NOT EXISTS idx_runs_trace ON runs(trace_id);
+CREATE INDEX IF NOT EXISTS idx_runs_name ON runs(name);
+CREATE TABLE IF NOT EXISTS run_tags (
+    run_id TEXT,
+    tag TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_run_tags_tag ON run_tags(tag);
+CREATE TABLE IF NOT EXISTS feedback (
+    id TEXT PRIMARY KEY,
+    run_id TEXT,
+    key TEXT,
+    score REAL,
+    comment TEXT,
+    created_at REAL
+);
+"""
+
+_RUN_COLUMNS = (
+    "id", "trace_id", "parent_run_id", "name", "run_type", "start_time",
+    "end_time", "latency", "status", "error", "inputs", "outputs",
+    "metadata", "tags", "prompt_tokens", "completion_tokens", "total_tokens",
+)
+
+
+def _to_timestamp(value: Union[datetime, float, None]) -> Optional[float]:
+    """Convierte datetime a epoch en segundos."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class LocalTraceStore:
+    """
+    Almacén de traces en SQLite.
+
+    La conexión se abre de forma perezosa y es compartida entre threads
+    (protegida con un lock), porque LangGraph ejecuta nodos en paralelo.
+
+    Ejemplo:
+        >>> store = LocalTraceStore("traces/micai.db")
+        >>> runs = store.list_runs(tag="after_fix", root_only=True)
+        >>> print([run["latency"] for run in runs])
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = "traces/langsmith_local.db",
+        max_payload_chars: int = 20000,
+        max_pending: int = 1000
+    ):
+        """
+        Args:
+            path: Ruta del archivo SQLite (":memory:" para pruebas)
+            max_payload_chars: Máximo de caracteres guardados de inputs/outputs
+            max_pending: Máximo de runs con metadata/tags pendientes; al
+                superarlo se olvidan los más antiguos
+        """
+        self.path = str(path)
+        self.max_payload_chars = max_payload_chars
+        self.max_pending = max_pending
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Metadata/tags añadidos a runs que aún no se han persistido
+        self._pending_metadata: Dict[str, Dict[str, Any]] = {}
+        self._pending_tags: Dict[str, List[str]] = {}
+
+    # ------------------------------------------------------------------
+    # Conexión
+    # ------------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self):
+        """Cierra la conexión con la base de datos."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _dump(self, value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        text = json.dumps(value, default=str, ensure_ascii=False)
+        if len(text) > self.max_payload_chars:
+            text = json.dumps({"truncated": text[:self.max_payload_chars]})
+        return text
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def record_run(
+        self,
+        run_id: Union[str, uuid.UUID],
+        name: str,
+        run_type: str = "chain",
+        parent_run_id: Optional[Union[str, uuid.UUID]] = None,
+        trace_id: Optional[Union[str, uuid.UUID]] = None,
+        start_time: Union[datetime, float, None] = None,
+        end_time: Union[datetime, float, None] = None,
+        inputs: Optional[Any] = None,
+        outputs: Optional[Any] = None,
+        error: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0
+    ):
+        """
+        Guarda (o reemplaza) un run.
+
+        Args:
+            run_id: ID del run
+            name: Nombre del run (nodo, agente, sección)
+            run_type: Tipo de run ("chain", "llm", "tool", ...)
+            parent_run_id: ID del run padre (None para runs raíz)
+            trace_id: ID del run raíz del trace
+            start_time: Inicio (datetime o epoch en segundos)
+            end_time: Fin (datetime o epoch en segundos)
+            inputs: Entradas del run (se serializan como JSON)
+            outputs: Salidas del run (se serializan como JSON)
+            error: Mensaje de error si el run falló
+            tags: Tags del run
+            metadata: Metadata del run
+            prompt_tokens: Tokens de entrada
+            completion_tokens: Tokens de salida
+        """
+        run_id = str(run_id)
+        start = _to_timestamp(start_time)
+        end = _to_timestamp(end_time)
+        latency = end - start if start is not None and end is not None else None
+
+        with self._lock:
+            metadata = {**(metadata or {}), **self._pending_metadata.pop(run_id, {})}
+            tags = list(dict.fromkeys((tags or []) + self._pending_tags.pop(run_id, [])))
+
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO runs ({', '.join(_RUN_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in _RUN_COLUMNS)})",
+                    (
+                        run_id,
+                        str(trace_id) if trace_id else None,
+                        str(parent_run_id) if parent_run_id else None,
+                        name,
+                        run_type,
+                        start,
+                        end,
+                        latency,
+                        "error" if error else "success",
+                        error,
+                        self._dump(inputs),
+                        self._dump(outputs),
+                        self._dump(metadata),
+                        self._dump(tags),
+                        prompt_tokens,
+                        completion_tokens,
+                        prompt_tokens + completion_tokens,
+                    )
+                )
+                conn.execute("DELETE FROM run_tags WHERE run_id = ?", (run_id,))
+                conn.executemany(
+                    "INSERT INTO run_tags (run_id, tag) VALUES (?, ?)",
+                    [(run_id, tag) for tag in tags]
+                )
+
+    def _run_exists(self, run_id: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM runs WHERE id = ?", (run_id,)
+        ).fetchone()
+        return row is not None
+
+    def _trim_pending(self, pending: Dict[str, Any]):
+        # Los dicts conservan el orden de inserción: se olvidan los más antiguos
+        while len(pending) > self.max_pending:
+            pending.pop(next(iter(pending)))
+
+    def add_metadata(self, run_id: Union[str, uuid.UUID], metadata: Dict[str, Any]):
+        """
+        Añade metadata a un run. Si el run aún no se ha persistido, la
+        metadata se guarda y se aplica cuando se registre.
+        """
+        run_id = str(run_id)
+        with self._lock:
+            if not self._run_exists(run_id):
+                self._pending_metadata.setdefault(run_id, {}).update(metadata)
+                self._trim_pending(self._pending_metadata)
+                return
+
+            conn = self._connection()
+            row = conn.execute("SELECT metadata FROM runs WHERE id = ?", (run_id,)).fetchone()
+            current = json.loads(row["metadata"]) if row["metadata"] else {}
+            current.update(metadata)
+            with conn:
+                conn.execute(
+                    "UPDATE runs SET metadata = ? WHERE id = ?",
+                    (self._dump(current), run_id)
+                )
+
+    def add_tags(self, run_id: Union[str, uuid.UUID], tags: List[str]):
+        """Añade tags a un run (con la misma semántica que add_metadata)."""
+        run_id = str(run_id)
+        with self._lock:
+            if not self._run_exists(run_id):
+                self._pending_tags.setdefault(run_id, []).extend(tags)
+                self._trim_pending(self._pending_tags)
+                return
+
+            conn = self._connection()
+            row = conn.execute("SELECT tags FROM runs WHERE id = ?", (run_id,)).fetchone()
+            current = json.loads(row["tags"]) if row["tags"] else []
+            new_tags = [tag for tag in dict.fromkeys(tags) if tag not in current]
+            with conn:
+                conn.execute(
+                    "UPDATE runs SET tags = ? WHERE id = ?",
+                    (self._dump(current + new_tags), run_id)
+                )
+                conn.executemany(
+                    "INSERT INTO run_tags (run_id, tag) VALUES (?, ?)",
+                    [(run_id, tag) for tag in new_tags]
+                )
+
+    def discard_pending(self, run_ids: List[Union[str, uuid.UUID]]):
+        """
+        Olvida la metadata/tags pendientes de runs que no se van a
+        registrar (ej: un trace descartado por el muestreo).
+        """
+        with self._lock:
+            for run_id in run_ids:
+                self._pending_metadata.pop(str(run_id), None)
+                self._pending_tags.pop(str(run_id), None)
+
+    def create_feedback(
+        self,
+        run_id: Union[str, uuid.UUID],
+        key: str,
+        score: float,
+        comment: Optional[str] = None
+    ) -> str:
+        """Guarda feedback para un run y retorna el ID del feedback."""
+        feedback_id = str(uuid.uuid4())
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT INTO feedback (id, run_id, key, score, comment, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (feedback_id, str(run_id), key, score, comment,
+                     datetime.now(timezone.utc).timestamp())
+                )
+        return feedback_id
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _row_to_run(row: sqlite3.Row) -> Dict[str, Any]:
+        run = dict(row)
+        for field in ("inputs", "outputs", "metadata", "tags"):
+            if run[field] is not None:
+                run[field] = json.loads(run[field])
+        run["metadata"] = run["metadata"] or {}
+        run["tags"] = run["tags"] or []
+        return run
+
+    def read_run(self, run_id: Union[str, uuid.UUID]) -> Optional[Dict[str, Any]]:
+        """Retorna un run como diccionario (o None si no existe)."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT * FROM runs WHERE id = ?", (str(run_id),)
+            ).fetchone()
+        return self._row_to_run(row) if row else None
+
+    def read_runs(self, run_ids: List[Union[str, uuid.UUID]]) -> List[Dict[str, Any]]:
+        """Retorna varios runs en una sola consulta, en el orden pedido."""
+        ids = [str(run_id) for run_id in run_ids]
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            conn = self._connection()
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT * FROM runs WHERE id IN ({', '.join('?' for _ in chunk)})",
+                    chunk
+                ).fetchall()
+                for row in rows:
+                    found[row["id"]] = self._row_to_run(row)
+        return [found[run_id] for run_id in ids if run_id in found]
+
+    def list_runs(
+        self,
+        name: Optional[str] = None,
+        run_type: Optional[str] = None,
+        tag: Optional[str] = None,
+        trace_id: Optional[Union[str, uuid.UUID]] = None,
+        root_only: bool = False,
+        error: Optional[bool] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Lista runs filtrando por nombre, tipo, tag o trace.
+
+        Args:
+            name: Nombre exacto del run
+            run_type: Tipo de run ("chain", "llm", ...)
+            tag: Solo runs con este tag
+            trace_id: Solo runs de este trace
+            root_only: Solo runs raíz (sin padre)
+            error: True para solo errores, False para solo exitosos
+            limit: Máximo de runs a retornar (los más recientes primero)
+
+        Returns:
+            Lista de runs como diccionarios
+        """
+        clauses = []
+        params: List[Any] = []
+
+        if name is not None:
+            clauses.append("name = ?")
+            params.append(name)
+        if run_type is not None:
+            clauses.append("run_type = ?")
+            params.append(run_type)
+        if tag is not None:
+            clauses.append("id IN (SELECT run_id FROM run_tags WHERE tag = ?)")
+            params.append(tag)
+        if trace_id is not None:
+            clauses.append("trace_id = ?")
+            params.append(str(trace_id))
+        if root_only:
+            clauses.append("parent_run_id IS NULL")
+        if error is not None:
+            clauses.append("status = ?")
+            params.append("error" if error else "success")
+
+        query = "SELECT * FROM runs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY start_time DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [self._row_to_run(row) for row in rows]
+
+    def get_run_tree(self, run_id: Union[str, uuid.UUID]) -> Optional[Dict[str, Any]]:
+        """
+        Reconstruye el árbol de un run siguiendo parent_run_id.
+
+        Returns:
+            El run con sus hijos anidados en "child_runs" (ordenados por inicio)
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                """
+                WITH RECURSIVE tree(id) AS (
+                    SELECT id FROM runs WHERE id = ?
+                    UNION ALL
+                    SELECT runs.id FROM runs JOIN tree ON runs.parent_run_id = tree.id
+                )
+                SELECT * FROM runs WHERE id IN (SELECT id FROM tree)
+                ORDER BY start_time
+                """,
+                (str(run_id),)
+            ).fetchall()
+
+        runs = {row["id"]: {**self._row_to_run(row), "child_runs": []} for row in rows}
+        for run in runs.values():
+            parent = runs.get(run["parent_run_id"])
+            if parent is not None:
+                parent["child_runs"].append(run)
+        return runs.get(str(run_id))
+
+    def list_feedback(self, run_id: Optional[Union[str, uuid.UUID]] = None) -> List[Dict[str, Any]]:
+        """Lista el feedback registrado (opcionalmente de un solo run)."""
+        query = "SELECT * FROM feedback"
+        params: List[Any] = []
+        if run_id is not None:
+            query += " WHERE run_id = ?"
+            params.append(str(run_id))
+        with self._lock:
+            rows = self._connection().execute(query + " ORDER BY created_at", params).fetchall()
+        return [dict(row) for row in rows]
+
+
+def _usage_from_outputs(outputs: Optional[Dict[str, Any]]) -> tuple:
+    """Extrae (prompt_tokens, completion_tokens) de los outputs de un run LLM."""
+    if not outputs:
+        return 0, 0
+
+    prompt_tokens = 0
+    completion_tokens = 0
+    for generations in outputs.get("generations") or []:
+        for generation in generations:
+            message = generation.get("message") or {}
+            usage = (message.get("kwargs") or message).get("usage_metadata") or {}
+            prompt_tokens += usage.get("input_tokens", 0)
+            completion_tokens += usage.get("output_tokens", 0)
+
+    if not prompt_tokens and not completion_tokens:
+        usage = (outputs.get("llm_output") or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+
+    return prompt_tokens, completion_tokens
+
+
+class LocalTracer(BaseTracer):
+    """
+    Callback de LangChain que persiste el árbol completo de runs en un
+    LocalTraceStore al terminar cada run raíz.
+
+    Los tokens de los runs LLM se suman hacia arriba, igual que LangSmith
+    muestra los tokens totales de un nodo o de un trace completo.
+
+    Con una SamplingPolicy la decisión head-based se toma al iniciar el run
+    raíz. Los spans de trace_agent/trace_section que cuelgan de sus nodos
+    (``record_span``) se escriben directamente si el trace se conserva, se
+    guardan en memoria si aún puede rescatarlo una regla tail-based, y se
+    descartan si no. Así un trace descartado nunca toca el store.
+
+    Un grafo invocado dentro de trace_agent/trace_section se registra como
+    hijo de ese span y comparte su trace_id.
+
+    Ejemplo:
+        >>> store = LocalTraceStore("traces/micai.db")
+        >>> app.invoke(state, config={"callbacks": [LocalTracer(store)]})
+    """
+
+    def __init__(
+        self,
+        store: LocalTraceStore,
+        sampling: Optional[SamplingPolicy] = None,
+        **kwargs: Any
+    ):
+        super().__init__(**kwargs)
+        self.store = store
+        self.sampling = sampling
+        # Run raíz → decisión head-based (solo si la toma este tracer)
+        self._decisions: Dict[str, bool] = {}
+        # Run raíz → spans pendientes de la decisión tail-based
+        self._pending_spans: Dict[str, List[Dict[str, Any]]] = {}
+        # Run raíz → (span padre, trace_id) si se invocó dentro de un span
+        self._span_parents: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _start_trace(self, run: Run) -> None:
+        super()._start_trace(run)
+        if run.parent_run_id is not None:
+            return
+        span = current_local_span.get()
+        with self._lock:
+            if span is not None:
+                # El muestreo ya lo decidió el span (su sampling_scope)
+                self._span_parents[str(run.id)] = (span.id, span.trace_id)
+            elif self.sampling is not None and current_sampling_state.get() is None:
+                self._decisions[str(run.id)] = self.sampling.sample_head(run.tags)
+
+    def root_of(self, run_id: Union[str, uuid.UUID]) -> Optional[str]:
+        """ID del run raíz del trace al que pertenece un run en curso."""
+        run = self.run_map.get(str(run_id))
+        return str(run.trace_id) if run is not None and run.trace_id else None
+
+    def trace_id_of(self, run_id: Union[str, uuid.UUID]) -> Optional[str]:
+        """trace_id con el que se registra un run en curso."""
+        root_id = self.root_of(run_id)
+        if root_id is None:
+            return None
+        with self._lock:
+            parent = self._span_parents.get(root_id)
+        return parent[1] if parent else root_id
+
+    def record_span(self, root_id: Optional[str], **record: Any) -> None:
+        """
+        Persiste un span (argumentos de ``LocalTraceStore.record_run``) que
+        cuelga de un run de este tracer, según la decisión de su run raíz.
+        """
+        with self._lock:
+            sampled = self._decisions.get(root_id) if root_id else None
+            if sampled is False:
+                if self.sampling.has_tail_rules:
+                    self._pending_spans.setdefault(root_id, []).append(record)
+                # Sin reglas tail el trace ya está descartado
+                return
+        self.store.record_run(**record)
+
+    def _persist_run(self, run: Run) -> None:
+        root_id = str(run.id)
+        with self._lock:
+            sampled = self._decisions.pop(root_id, None)
+            pending = self._pending_spans.pop(root_id, [])
+            span_parent = self._span_parents.pop(root_id, None)
+
+        if sampled is None:
+            # Sin política, o dentro de un run raíz que ya decidió
+            state = current_sampling_state.get()
+            if state is None or state.sampled:
+                if span_parent is not None:
+                    self._record_tree(run, parent_run_id=span_parent[0], trace_id=span_parent[1])
+                else:
+                    self._record_tree(run)
+            return
+
+        if sampled:
+            self.sampling.record("head_kept")
+            self._record_tree(run)
+            return
+
+        latency_ms = None
+        if run.start_time and run.end_time:
+            latency_ms = (run.end_time - run.start_time).total_seconds() * 1000
+        if self.sampling.has_tail_rules and self.sampling.tail_keep(latency_ms, run.error, run.outputs):
+            self.sampling.record("tail_kept")
+            run.tags = (run.tags or []) + ["tail_sampled"]
+            self._record_tree(run)
+            for record in pending:
+                self.store.record_run(**record)
+        else:
+            # Nada se escribió: solo se olvida la metadata que esperaba a estos runs
+            self.sampling.record("dropped")
+            self.store.discard_pending(self._tree_ids(run))
+
+    def _tree_ids(self, run: Run) -> List[str]:
+        ids = [str(run.id)]
+        for child in run.child_runs:
+            ids.extend(self._tree_ids(child))
+        return ids
+
+    def _record_tree(self, run: Run, parent_run_id: Optional[str] = None, trace_id: Optional[str] = None) -> tuple:
+        """
+        Registra un run y sus descendientes. ``parent_run_id``/``trace_id``
+        cuelgan la raíz de un span local y propagan su trace a los hijos.
+        """
+        if run.run_type == "llm":
+            prompt_tokens, completion_tokens = _usage_from_outputs(run.outputs)
+        else:
+            prompt_tokens, completion_tokens = 0, 0
+
+        for child in run.child_runs:
+            child_prompt, child_completion = self._record_tree(child, trace_id=trace_id)
+            prompt_tokens += child_prompt
+            completion_tokens += child_completion
+
+        self.store.record_run(
+            run_id=run.id,
+            name=run.name,
+            run_type=run.run_type,
+            parent_run_id=parent_run_id or run.parent_run_id,
+            trace_id=trace_id or run.trace_id,
+            start_time=run.start_time,
+            end_time=run.end_time,
+            inputs=run.inputs,
+            outputs=run.outputs,
+            error=run.error,
+            tags=run.tags,
+            metadata=(run.extra or {}).get("metadata"),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens
+        )
+        return prompt_tokens, completion_tokens
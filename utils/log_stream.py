@@ -0,0 +1,138 @@
+"""
+Log Stream
+
+Lectura por lotes de logs de trazas (dicts con ``id``, ``question``,
+``grade``, ...) para grafos que procesan millones de logs por ejecución
+sin materializarlos en el estado.
+
+- Una fuente de logs es una lista de dicts o la ruta de un JSONL (un log
+  por línea). Ambas se pueden releer: dos subgrafos pueden recorrer la
+  misma fuente sin copiarla.
+- ``read_log_batch`` lee un lote de tamaño fijo a partir de un offset
+  (índice en la lista o byte en el fichero) y devuelve el offset
+  siguiente. Guardar ese offset en el estado permite procesar la fuente
+  en un loop del grafo, un lote por paso, y reanudar desde el último
+  checkpoint (cada paso cuenta para el ``recursion_limit`` del grafo).
+- ``iter_log_batches`` recorre la fuente completa dentro de un solo
+  nodo: el número de pasos del grafo no crece con la fuente.
+- ``LogBatch`` guarda cada lote en columnas: ids en una lista y grades
+  en un ``array`` de enteros, sin conservar los dicts originales.
+
+Ejemplo:
+    >>> offset = 0
+    >>> while offset != END_OF_LOGS:
+    ...     batch, offset = read_log_batch("traces/logs.jsonl", offset, batch_size=10_000)
+    ...     failures = batch.failure_ids()
+"""
+
+import json
+from array import array
+from itertools import compress
+from typing import Optional, Dict, Any, List, Callable, Iterable, Iterator, Tuple, Union
+
+
+LogSource = Union[List[Dict[str, Any]], str]
+
+# Offset que indica que la fuente ya se leyó completa
+END_OF_LOGS = -1
+
+LOG_BATCH_SIZE = 10_000
+
+
+class LogBatch:
+    """
+    Lote de logs en formato columnar.
+
+    Columnas:
+        ids: id de cada log
+        questions: pregunta de cada log
+        grades: grade de cada log (0 si no tiene)
+        graded: 1 si el log tiene la clave ``grade`` (fallo evaluado)
+    """
+
+    __slots__ = ("ids", "questions", "grades", "graded")
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.questions: List[str] = []
+        self.grades = array("i")
+        self.graded = bytearray()
+
+    @classmethod
+    def from_logs(cls, logs: Iterable[Dict[str, Any]]) -> "LogBatch":
+        batch = cls()
+        for log in logs:
+            batch.append(log)
+        return batch
+
+    def append(self, log: Dict[str, Any]):
+        self.ids.append(str(log["id"]))
+        self.questions.append(log.get("question", ""))
+        self.grades.append(int(log.get("grade") or 0))
+        self.graded.append(1 if "grade" in log else 0)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def failure_ids(self) -> List[str]:
+        """Ids de los logs con grade (los que el evaluador marcó)."""
+        return list(compress(self.ids, self.graded))
+
+
+def _read_jsonl(path: str, offset: int, batch_size: int) -> Tuple[List[Dict[str, Any]], int]:
+    logs = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while len(logs) < batch_size:
+            line = f.readline()
+            if not line:
+                return logs, END_OF_LOGS
+            if line.strip():
+                logs.append(json.loads(line))
+        # Fin exacto del fichero: no hace falta otro paso para descubrirlo
+        next_offset = f.tell()
+        return logs, END_OF_LOGS if not f.read(1) else next_offset
+
+
+def read_log_batch(
+    source: LogSource,
+    offset: int = 0,
+    batch_size: int = LOG_BATCH_SIZE,
+    clean: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None
+) -> Tuple[LogBatch, int]:
+    """
+    Lee el lote que empieza en ``offset``.
+
+    Args:
+        source: Lista de logs o ruta de un JSONL
+        offset: Índice (lista) o byte (JSONL) donde empieza el lote
+        batch_size: Logs máximos por lote
+        clean: log → log limpio, o None para descartarlo
+
+    Returns:
+        (lote columnar, offset del siguiente lote o END_OF_LOGS)
+    """
+    if offset == END_OF_LOGS:
+        return LogBatch(), END_OF_LOGS
+
+    if isinstance(source, str):
+        logs, next_offset = _read_jsonl(source, offset, batch_size)
+    else:
+        logs = source[offset:offset + batch_size]
+        next_offset = offset + len(logs) if offset + len(logs) < len(source) else END_OF_LOGS
+
+    if clean is not None:
+        logs = [cleaned for cleaned in map(clean, logs) if cleaned is not None]
+    return LogBatch.from_logs(logs), next_offset
+
+
+def iter_log_batches(
+    source: LogSource,
+    offset: int = 0,
+    batch_size: int = LOG_BATCH_SIZE,
+    clean: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None
+) -> Iterator[LogBatch]:
+    """Lotes de ``source`` desde ``offset`` hasta el final (ver read_log_batch)."""
+    while offset != END_OF_LOGS:
+        batch, offset = read_log_batch(source, offset, batch_size, clean)
+        yield batch
@@ -2,14 +2,28 @@
 Configuración de logging para el tutorial.
 
 Proporciona loggers configurados para diferentes niveles de verbosidad
-y formatos útiles para debugging de sistemas multi-agente.
+y formatos útiles para debugging de sistemas multi-agente, además de
+instrumentación por nodo (latencia, llamadas LLM y tokens) que funciona
+sin LangSmith.
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import math
+import queue
 import sys
+import threading
+import time
+from collections import defaultdict, deque
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable
 
 
 # Colores para terminal (ANSI escape codes)
@@ -39,25 +53,149 @@ class ColoredFormatter(logging.Formatter):
         "CRITICAL": Colors.RED + Colors.BOLD,
     }
 
+    # Strings coloreados precalculados por nivel
+    _COLORED_LEVELS = {
+        level: f"{color}{level}{Colors.RESET}" for level, color in COLORS.items()
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._colored_names: Dict[str, str] = {}
+
     def format(self, record):
+        # Trabajar sobre una copia: el mismo record puede llegar a otros
+        # handlers (ej: archivo) que no deben recibir códigos de color
+        record = logging.makeLogRecord(record.__dict__)
+
         # Agregar color según el nivel
-        levelname = record.levelname
-        if levelname in self.COLORS:
-            record.levelname = (
-                f"{self.COLORS[levelname]}{levelname}{Colors.RESET}"
-            )
+        record.levelname = self._COLORED_LEVELS.get(record.levelname, record.levelname)
 
         # Agregar color al nombre del logger
-        record.name = f"{Colors.CYAN}{record.name}{Colors.RESET}"
+        colored_name = self._colored_names.get(record.name)
+        if colored_name is None:
+            colored_name = f"{Colors.CYAN}{record.name}{Colors.RESET}"
+            self._colored_names[record.name] = colored_name
+        record.name = colored_name
 
         return super().format(record)
 
 
+class JSONFormatter(logging.Formatter):
+    """
+    Formatter que emite una línea JSON por record, fácil de agregar con
+    herramientas de análisis de logs.
+
+    Los campos estructurados se pasan con ``extra``:
+
+        >>> logger.info("Node finished", extra={"node": "intake", "duration_ms": 12.5})
+    """
+
+    STRUCTURED_FIELDS = ("node", "agent", "tool", "run_id", "duration_ms", "tokens", "step")
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler con cola acotada y política de desborde configurable.
+
+    No formatea el record en el thread que loggea: el formateo (incluidos
+    los colores) lo hacen los handlers del QueueListener en su propio
+    thread. Como listener y productor viven en el mismo proceso, el record
+    puede viajar sin serializar.
+    """
+
+    OVERFLOW_POLICIES = ("drop", "drop_oldest", "block")
+
+    def __init__(self, log_queue: queue.Queue, overflow: str = "drop"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Política de desborde '{overflow}' no soportada. "
+                f"Usa una de: {', '.join(self.OVERFLOW_POLICIES)}"
+            )
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        self.dropped += 1
+        if self.overflow == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                pass
+
+
+class _BoundedQueueListener(logging.handlers.QueueListener):
+    """QueueListener que espera lugar en la cola para el sentinel de parada."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+# Loggers asíncronos activos: su QueueHandler y su listener, detenidos al salir
+_queue_listeners: Dict[str, Tuple[logging.Handler, logging.handlers.QueueListener]] = {}
+
+
+def shutdown_async_logging():
+    """
+    Vacía las colas y detiene los listeners de los loggers asíncronos.
+
+    Cada logger vuelve a escribir de forma síncrona con los handlers del
+    listener: si su QueueHandler siguiera conectado, los logs posteriores
+    irían a una cola que nadie lee (y con overflow="block" se colgarían al
+    llenarse).
+    """
+    while _queue_listeners:
+        name, (queue_handler, listener) = _queue_listeners.popitem()
+        logger = logging.getLogger(name)
+        logger.removeHandler(queue_handler)
+        listener.stop()
+        for handler in listener.handlers:
+            logger.addHandler(handler)
+
+
+atexit.register(shutdown_async_logging)
+
+
 def setup_logger(
     name: str,
     level: int = logging.INFO,
     log_file: Optional[Path] = None,
-    colored: bool = True
+    colored: bool = True,
+    async_logging: bool = False,
+    queue_size: int = 10000,
+    overflow: str = "drop",
+    max_bytes: int = 0,
+    backup_count: int = 3,
+    json_format: bool = False
 ) -> logging.Logger:
     """
     Configura un logger con formato consistente.
@@ -67,6 +205,16 @@ def setup_logger(
         level: Nivel de logging (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Ruta opcional para guardar logs en archivo
         colored: Si True, usa colores en la consola
+        async_logging: Si True, los records pasan por una cola acotada y
+                       un QueueListener escribe en consola/archivo desde
+                       otro thread, sin bloquear al nodo
+        queue_size: Capacidad de la cola en modo asíncrono
+        overflow: Qué hacer con la cola llena: "drop" (descartar el nuevo),
+                  "drop_oldest" (descartar el más antiguo) o "block"
+        max_bytes: Si es > 0, el archivo rota al alcanzar este tamaño
+        backup_count: Número de archivos rotados a conservar
+        json_format: Si True, consola y archivo emiten una línea JSON por
+                     record (ver JSONFormatter)
 
     Returns:
         Logger configurado
@@ -75,6 +223,9 @@ def setup_logger(
         >>> logger = setup_logger(__name__)
         >>> logger.info("Mensaje de información")
         >>> logger.debug("Mensaje de debug (no se muestra con level=INFO)")
+        >>> fast_logger = setup_logger("agent.hot", async_logging=True,
+        ...                            log_file=Path("logs/agent.log"),
+        ...                            max_bytes=10_000_000)
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
@@ -88,27 +239,56 @@ def setup_logger(
         "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
     )
     date_format = "%H:%M:%S"
+    handlers: List[logging.Handler] = []
 
     # Handler para consola
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
 
-    if colored:
+    if json_format:
+        console_formatter = JSONFormatter()
+    elif colored:
         console_formatter = ColoredFormatter(format_string, datefmt=date_format)
     else:
         console_formatter = logging.Formatter(format_string, datefmt=date_format)
 
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
 
     # Handler opcional para archivo
     if log_file:
+        log_file = Path(log_file)
         log_file.parent.mkdir(parents=True, exist_ok=True)
-        file_handler = logging.FileHandler(log_file)
+        if max_bytes > 0:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count
+            )
+        else:
+            file_handler = logging.FileHandler(log_file)
         file_handler.setLevel(level)
-        file_formatter = logging.Formatter(format_string, datefmt=date_format)
+        if json_format:
+            file_formatter = JSONFormatter()
+        else:
+            file_formatter = logging.Formatter(format_string, datefmt=date_format)
         file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    if not async_logging:
+        for handler in handlers:
+            logger.addHandler(handler)
+        return logger
+
+    # Modo asíncrono: el nodo solo encola; el listener escribe
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue, overflow=overflow)
+    queue_handler.setLevel(level)
+    logger.addHandler(queue_handler)
+
+    listener = _BoundedQueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    _queue_listeners[name] = (queue_handler, listener)
 
     return logger
 
@@ -196,8 +376,21 @@ def get_workflow_logger(workflow_name: str, level: int = logging.INFO) -> loggin
 
 
 # Funciones helper para logging estructurado
+#
+# Todas comprueban el nivel antes de construir nada y pasan los argumentos
+# al logger sin formatear, así que no cuestan CPU cuando el nivel está
+# deshabilitado. Los campos van también en ``extra`` para JSONFormatter.
 
-def log_llm_call(logger: logging.Logger, model: str, prompt_length: int):
+def log_llm_call(
+    logger: logging.Logger,
+    model: str,
+    prompt_length: int,
+    duration_ms: Optional[float] = None,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    node: Optional[str] = None,
+    run_id: Optional[str] = None
+):
     """
     Loggea una llamada a un LLM.
 
@@ -205,8 +398,30 @@ def log_llm_call(logger: logging.Logger, model: str, prompt_length: int):
         logger: Logger a usar
         model: Nombre del modelo
         prompt_length: Longitud del prompt en caracteres
+        duration_ms: Duración opcional de la llamada en milisegundos
+        prompt_tokens: Tokens de entrada reportados por el proveedor
+        completion_tokens: Tokens de salida reportados por el proveedor
+        node: Nodo del grafo que hizo la llamada
+        run_id: ID del run de la llamada
     """
-    logger.debug(f"LLM call: model={model}, prompt_length={prompt_length}")
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+
+    extra = {"node": node, "run_id": run_id, "duration_ms": duration_ms}
+    message = "LLM call: model=%s, prompt_length=%d"
+    args = [model, prompt_length]
+    if duration_ms is not None:
+        message += ", duration=%.2fms"
+        args.append(duration_ms)
+    if prompt_tokens is not None or completion_tokens is not None:
+        extra["tokens"] = {
+            "prompt": prompt_tokens or 0,
+            "completion": completion_tokens or 0,
+        }
+        message += ", tokens=%d/%d"
+        args.extend([prompt_tokens or 0, completion_tokens or 0])
+
+    logger.debug(message, *args, extra=extra)
 
 
 def log_tool_execution(
@@ -226,12 +441,14 @@ def log_tool_execution(
         result: Resultado retornado (truncado si es muy largo)
         duration_ms: Duración en milisegundos
     """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     result_preview = result[:100] + "..." if len(result) > 100 else result
     logger.info(
-        f"Tool executed: {tool_name} | "
-        f"args={args} | "
-        f"result='{result_preview}' | "
-        f"duration={duration_ms:.2f}ms"
+        "Tool executed: %s | args=%s | result='%s' | duration=%.2fms",
+        tool_name, args, result_preview, duration_ms,
+        extra={"tool": tool_name, "duration_ms": duration_ms}
     )
 
 
@@ -244,10 +461,17 @@ def log_state_update(logger: logging.Logger, field: str, value_preview: str):
         field: Campo del estado actualizado
         value_preview: Preview del nuevo valor
     """
-    logger.debug(f"State updated: {field} = '{value_preview}'")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("State updated: %s = '%s'", field, value_preview)
 
 
-def log_graph_step(logger: logging.Logger, node_name: str, step_number: int):
+def log_graph_step(
+    logger: logging.Logger,
+    node_name: str,
+    step_number: int,
+    duration_ms: Optional[float] = None,
+    run_id: Optional[str] = None
+):
     """
     Loggea un paso en la ejecución del grafo.
 
@@ -255,8 +479,443 @@ def log_graph_step(logger: logging.Logger, node_name: str, step_number: int):
         logger: Logger a usar
         node_name: Nombre del nodo ejecutado
         step_number: Número del paso
+        duration_ms: Si se indica, loggea el fin del paso con su duración
+        run_id: ID del run del nodo
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    extra = {"node": node_name, "step": step_number, "run_id": run_id}
+    if duration_ms is None:
+        logger.info("Step %d: Executing node '%s'", step_number, node_name, extra=extra)
+    else:
+        extra["duration_ms"] = duration_ms
+        logger.info(
+            "Step %d: Node '%s' finished in %.2fms",
+            step_number, node_name, duration_ms,
+            extra=extra
+        )
+
+
+# Instrumentación de grafos (latencia y tokens por nodo)
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """
+    Calcula un percentil por el método nearest-rank.
+
+    Args:
+        values: Valores a analizar (no necesitan estar ordenados)
+        pct: Percentil entre 0 y 100
+
+    Returns:
+        Valor del percentil (0.0 si no hay valores)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class NodeStats:
+    """
+    Muestras acumuladas para un nodo del grafo.
+
+    Conteo, media y máximo cubren todas las ejecuciones; los percentiles
+    se calculan sobre las últimas ``max_samples`` para que la memoria de
+    un grafo de larga duración quede acotada.
+    """
+
+    def __init__(self, max_samples: int = 10_000):
+        self.durations_ms: deque = deque(maxlen=max_samples)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.total_delta_size = 0
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cache_creation_tokens = 0
+        self.tool_cache_hits = 0
+        self.tool_cache_misses = 0
+        self.errors = 0
+
+    def record(self, duration_ms: float, delta_size: int = 0):
+        """Registra una ejecución del nodo."""
+        self.durations_ms.append(duration_ms)
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.total_delta_size += delta_size
+
+    def summary(self) -> Dict[str, Any]:
+        """Resume las muestras en un diccionario con percentiles."""
+        count = self.count
+        return {
+            "count": count,
+            "errors": self.errors,
+            "mean_ms": self.total_ms / count if count else 0.0,
+            "p50_ms": percentile(self.durations_ms, 50),
+            "p95_ms": percentile(self.durations_ms, 95),
+            "p99_ms": percentile(self.durations_ms, 99),
+            "max_ms": self.max_ms,
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_creation_tokens": self.cache_creation_tokens,
+            # Fracción de tokens de entrada servidos desde la cache del proveedor
+            "cache_ratio": (
+                self.cached_tokens / self.prompt_tokens
+                if self.prompt_tokens else 0.0
+            ),
+            "avg_delta_size": self.total_delta_size / count if count else 0.0,
+            # Resultados de herramientas servidos desde ToolCache
+            "tool_cache_hits": self.tool_cache_hits,
+            "tool_cache_misses": self.tool_cache_misses,
+        }
+
+
+class GraphMetrics:
+    """
+    Métricas en memoria por nodo: latencia, llamadas LLM, tokens y
+    tamaño del delta de estado que retorna cada nodo.
+
+    Es thread-safe porque LangGraph ejecuta ramas paralelas en un pool
+    de threads.
+
+    Ejemplos:
+        >>> metrics = GraphMetrics()
+        >>> app, metrics = instrument_graph(build_graph(), metrics)
+        >>> app.invoke(initial_state)
+        >>> metrics.print_report()
+    """
+
+    def __init__(self, max_samples: int = 10_000):
+        """
+        Args:
+            max_samples: Duraciones por nodo guardadas para los percentiles
+        """
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, NodeStats] = defaultdict(lambda: NodeStats(max_samples))
+
+    def record_node(
+        self,
+        node: str,
+        duration_ms: float,
+        delta_size: int = 0,
+        error: bool = False
+    ):
+        """Registra una ejecución de nodo."""
+        with self._lock:
+            stats = self._nodes[node]
+            stats.record(duration_ms, delta_size)
+            if error:
+                stats.errors += 1
+
+    def record_llm_call(
+        self,
+        node: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_tokens: int = 0,
+        cache_creation_tokens: int = 0
+    ):
+        """Registra una llamada a LLM hecha dentro de un nodo."""
+        with self._lock:
+            stats = self._nodes[node]
+            stats.llm_calls += 1
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cached_tokens += cached_tokens
+            stats.cache_creation_tokens += cache_creation_tokens
+
+    def record_tool_cache(self, node: str, hit: bool):
+        """Registra una consulta a la cache de herramientas (ver utils.tool_cache)."""
+        with self._lock:
+            stats = self._nodes[node]
+            if hit:
+                stats.tool_cache_hits += 1
+            else:
+                stats.tool_cache_misses += 1
+
+    def node_names(self) -> List[str]:
+        """Nombres de los nodos con muestras registradas."""
+        with self._lock:
+            return list(self._nodes)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna las estadísticas de todos los nodos.
+
+        Returns:
+            Dict nodo -> {count, errors, mean_ms, p50_ms, p95_ms, p99_ms,
+            max_ms, llm_calls, prompt_tokens, completion_tokens,
+            cached_tokens, cache_creation_tokens, cache_ratio,
+            avg_delta_size, tool_cache_hits, tool_cache_misses}
+        """
+        with self._lock:
+            return {node: stats.summary() for node, stats in self._nodes.items()}
+
+    def reset(self):
+        """Descarta todas las muestras."""
+        with self._lock:
+            self._nodes.clear()
+
+    def print_report(self):
+        """Imprime una tabla con las métricas, ordenada por p95 descendente."""
+        summary = self.summary()
+        rows = sorted(summary.items(), key=lambda item: item[1]["p95_ms"], reverse=True)
+
+        print("\n" + "="*114)
+        print("⏱️  Métricas por nodo")
+        print("="*114)
+        print(
+            f"{'Nodo':<20} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+            f"{'LLM':>5} {'tok in':>8} {'cache%':>7} {'tok out':>8} {'delta':>8} "
+            f"{'tools hit':>9}"
+        )
+        print("-"*114)
+        for node, stats in rows:
+            tool_lookups = stats['tool_cache_hits'] + stats['tool_cache_misses']
+            print(
+                f"{node:<20} {stats['count']:>5} {stats['p50_ms']:>9.1f} "
+                f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} "
+                f"{stats['llm_calls']:>5} {stats['prompt_tokens']:>8} "
+                f"{stats['cache_ratio'] * 100:>6.1f}% "
+                f"{stats['completion_tokens']:>8} {stats['avg_delta_size']:>8.0f} "
+                f"{stats['tool_cache_hits']:>4}/{tool_lookups:<4}"
+            )
+        print("="*114 + "\n")
+
+
+def _extract_token_usage(response) -> Tuple[int, int]:
+    """Obtiene (prompt_tokens, completion_tokens) de un LLMResult."""
+    prompt_tokens = 0
+    completion_tokens = 0
+
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+
+    # Algunos proveedores solo reportan el uso en llm_output
+    if not prompt_tokens and not completion_tokens and response.llm_output:
+        usage = response.llm_output.get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+
+    return prompt_tokens, completion_tokens
+
+
+def _extract_cached_tokens(response) -> Tuple[int, int]:
+    """Obtiene (cache_read, cache_creation) de un LLMResult."""
+    cache_read = 0
+    cache_creation = 0
+
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None) or {}
+            details = usage.get("input_token_details") or {}
+            cache_read += details.get("cache_read", 0) or 0
+            cache_creation += details.get("cache_creation", 0) or 0
+
+    return cache_read, cache_creation
+
+
+def _delta_size(outputs: Any) -> int:
+    """Tamaño aproximado (en caracteres) del delta de estado de un nodo."""
+    if not outputs:
+        return 0
+    if isinstance(outputs, dict):
+        return sum(len(str(value)) for value in outputs.values())
+    return len(str(outputs))
+
+
+class GraphInstrumentationHandler(BaseCallbackHandler):
+    """
+    Callback que mide cada nodo de un grafo compilado de LangGraph.
+
+    Identifica los nodos por la metadata ``langgraph_node`` que LangGraph
+    propaga a todos los runs hijos, así que las llamadas LLM hechas dentro
+    de un nodo se atribuyen a ese nodo sin modificar su código.
+    """
+
+    run_inline = True
+
+    def __init__(
+        self,
+        metrics: GraphMetrics,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.metrics = metrics
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._node_starts: Dict[UUID, Tuple[str, float, int]] = {}
+        self._llm_starts: Dict[UUID, Tuple[str, float, str, int]] = {}
+        self._step = 0
+
+    def on_chain_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ):
+        node = (metadata or {}).get("langgraph_node")
+        # Solo el run raíz del nodo (no sus runnables internos)
+        if not node or kwargs.get("name") != node:
+            return
+
+        with self._lock:
+            self._step += 1
+            step = self._step
+            self._node_starts[run_id] = (node, time.perf_counter(), step)
+
+        if self.logger:
+            log_graph_step(self.logger, node, step, run_id=str(run_id))
+
+    def _finish_node(self, run_id: UUID, outputs: Any, error: bool):
+        with self._lock:
+            started = self._node_starts.pop(run_id, None)
+        if started is None:
+            return
+
+        node, start, step = started
+        duration_ms = (time.perf_counter() - start) * 1000
+        self.metrics.record_node(node, duration_ms, _delta_size(outputs), error=error)
+
+        if self.logger:
+            log_graph_step(
+                self.logger, node, step, duration_ms=duration_ms, run_id=str(run_id)
+            )
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        self._finish_node(run_id, outputs, error=False)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish_node(run_id, None, error=True)
+
+    def _start_llm(self, run_id: UUID, metadata: Optional[Dict[str, Any]], prompt_length: int):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        if not node:
+            return
+
+        model = metadata.get("ls_model_name", "unknown")
+        with self._lock:
+            self._llm_starts[run_id] = (node, time.perf_counter(), model, prompt_length)
+
+    def on_chat_model_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ):
+        prompt_length = sum(
+            len(str(message.content)) for batch in messages for message in batch
+        )
+        self._start_llm(run_id, metadata, prompt_length)
+
+    def on_llm_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ):
+        self._start_llm(run_id, metadata, sum(len(prompt) for prompt in prompts))
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            started = self._llm_starts.pop(run_id, None)
+        if started is None:
+            return
+
+        node, start, model, prompt_length = started
+        prompt_tokens, completion_tokens = _extract_token_usage(response)
+        cached_tokens, cache_creation_tokens = _extract_cached_tokens(response)
+        self.metrics.record_llm_call(
+            node, prompt_tokens, completion_tokens, cached_tokens, cache_creation_tokens
+        )
+
+        if self.logger:
+            log_llm_call(
+                self.logger,
+                model,
+                prompt_length,
+                duration_ms=(time.perf_counter() - start) * 1000,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                node=node,
+                run_id=str(run_id)
+            )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            started = self._llm_starts.pop(run_id, None)
+        if started is not None:
+            self.metrics.record_llm_call(started[0])
+
+    def on_custom_event(
+        self,
+        name: str,
+        data: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ):
+        # Eventos emitidos por utils.tool_cache.cached_tool
+        node = (metadata or {}).get("langgraph_node")
+        if name == "tool_cache" and node:
+            self.metrics.record_tool_cache(node, hit=bool(data.get("hit")))
+
+
+def instrument_graph(
+    graph: Runnable,
+    metrics: Optional[GraphMetrics] = None,
+    logger: Optional[logging.Logger] = None
+) -> Tuple[Runnable, GraphMetrics]:
+    """
+    Envuelve un grafo compilado para medir automáticamente todos sus nodos.
+
+    No requiere LangSmith: las métricas quedan en memoria y se consultan
+    con ``metrics.summary()`` o ``metrics.print_report()``.
+
+    Args:
+        graph: Grafo compilado (resultado de ``workflow.compile()``)
+        metrics: Acumulador de métricas (se crea uno nuevo si es None)
+        logger: Logger opcional; si se indica se usan log_graph_step y
+                log_llm_call en cada paso
+
+    Returns:
+        Tupla (grafo instrumentado, métricas). El grafo instrumentado
+        soporta invoke/stream/ainvoke igual que el original.
+
+    Ejemplos:
+        >>> app, metrics = instrument_graph(build_graph())
+        >>> for query in queries:
+        ...     app.invoke({"user_query": query})
+        >>> metrics.summary()["synthesizer"]["p95_ms"]
     """
-    logger.info(f"Step {step_number}: Executing node '{node_name}'")
+    metrics = metrics if metrics is not None else GraphMetrics()
+    handler = GraphInstrumentationHandler(metrics, logger=logger)
+    return graph.with_config(callbacks=[handler]), metrics
 
 
 # Ejemplo de uso en un módulo
@@ -0,0 +1,122 @@
+"""
+Prompt Caching
+
+Ensamblado de prompts pensado para el prompt caching de los proveedores.
+El caching solo funciona sobre un *prefijo* idéntico entre llamadas, así
+que las instrucciones estáticas deben ir primero y el contenido dinámico
+(consulta, análisis, contexto) al final.
+
+- OpenAI cachea automáticamente prefijos largos: basta con el orden.
+- Anthropic requiere marcar el bloque cacheable con ``cache_control``;
+  CacheablePrompt lo hace cuando el modelo es ChatAnthropic.
+
+Limitación: ambos proveedores solo cachean prefijos de al menos ~1024
+tokens (MIN_CACHEABLE_TOKENS; más en algunos modelos). Un bloque estático
+más corto se envía igual, pero cada llamada paga el prompt completo:
+``CacheablePrompt.cacheable`` indica si el prefijo alcanza el mínimo.
+
+Los tokens servidos desde cache se leen de ``usage_metadata`` y se
+reportan por nodo en GraphMetrics (ver instrument_graph).
+
+Ejemplo:
+    >>> SYNTHESIS = CacheablePrompt(
+    ...     static="Eres un agente de atención al cliente... (instrucciones)",
+    ...     dynamic="CONSULTA:\\n{query}\\n\\nANÁLISIS:\\n{analysis}"
+    ... )
+    >>> response = llm.invoke(SYNTHESIS.messages(llm, query=q, analysis=a))
+"""
+
+from typing import Optional, Dict, Any, List
+
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+
+from .context_window import approximate_token_count
+
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Prefijo mínimo que OpenAI y Anthropic cachean
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def supports_cache_control(llm) -> bool:
+    """True si el modelo acepta bloques con cache_control (Anthropic)."""
+    # with_structured_output/bind devuelven un RunnableBinding sobre el modelo
+    bound = getattr(llm, "bound", llm)
+    return getattr(bound, "_llm_type", "").startswith("anthropic")
+
+
+class CacheablePrompt:
+    """
+    Prompt dividido en una parte estática (cacheable) y una dinámica.
+
+    La parte estática no se formatea: cualquier dato variable debe ir en
+    ``dynamic`` para no romper el prefijo cacheado.
+    """
+
+    def __init__(self, static: str, dynamic: str = "", human: Optional[str] = None):
+        """
+        Args:
+            static: Instrucciones fijas; van siempre al inicio del prompt
+            dynamic: Plantilla (str.format) con los datos de cada llamada
+            human: Plantilla opcional para el mensaje del usuario
+        """
+        self.static = static.strip()
+        self.dynamic = dynamic.strip()
+        self.human = human
+
+    @property
+    def static_tokens(self) -> int:
+        """Tokens aproximados del bloque estático."""
+        return approximate_token_count(self.static)
+
+    @property
+    def cacheable(self) -> bool:
+        """True si el bloque estático alcanza el prefijo mínimo cacheable."""
+        return self.static_tokens >= MIN_CACHEABLE_TOKENS
+
+    def messages(self, llm=None, **values: Any) -> List[BaseMessage]:
+        """
+        Construye los mensajes para ``llm.invoke``.
+
+        Args:
+            llm: Modelo destino; decide si se marca cache_control
+            **values: Valores para las plantillas dinámica y humana
+
+        Returns:
+            [SystemMessage(estático + dinámico), HumanMessage?]
+        """
+        dynamic = self.dynamic.format(**values) if self.dynamic else ""
+
+        # Con un prefijo por debajo del mínimo el proveedor ignora cache_control
+        if llm is not None and self.cacheable and supports_cache_control(llm):
+            blocks: List[Dict[str, Any]] = [
+                {"type": "text", "text": self.static, "cache_control": CACHE_CONTROL}
+            ]
+            if dynamic:
+                blocks.append({"type": "text", "text": dynamic})
+            system = SystemMessage(content=blocks)
+        else:
+            system = SystemMessage(content=f"{self.static}\n\n{dynamic}" if dynamic else self.static)
+
+        messages: List[BaseMessage] = [system]
+        if self.human is not None:
+            messages.append(HumanMessage(content=self.human.format(**values)))
+        return messages
+
+
+def cached_token_usage(message) -> Dict[str, int]:
+    """
+    Tokens de entrada leídos/escritos en la cache del proveedor.
+
+    Returns:
+        {"input_tokens", "cache_read", "cache_creation"} (0 si el
+        proveedor no reporta el detalle)
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "cache_read": details.get("cache_read", 0) or 0,
+        "cache_creation": details.get("cache_creation", 0) or 0,
+    }
@@ -0,0 +1,417 @@
+"""
+Routing local
+
+Clasificador barato para nodos de routing que solo necesitan emitir una
+etiqueta (categoría, intención, especialista). Responde localmente las
+consultas que puede clasificar con confianza y solo llama al LLM cuando
+hay dudas:
+
+1. Reglas de palabras clave de alta precisión
+2. Modelo lineal (regresión logística) sobre n-gramas hasheados,
+   entrenado con las etiquetas que el LLM ya produjo
+3. Fallback al LLM; su etiqueta se registra para reentrenar el modelo
+   en segundo plano (el nodo que clasifica nunca espera al entrenamiento)
+
+Todo está implementado en Python puro (sin numpy ni scikit-learn).
+
+Ejemplo:
+    >>> router = LocalRouter(
+    ...     labels=["technical", "sales", "support"],
+    ...     keyword_rules={"sales": ["precio", "cuánto cuesta"]},
+    ...     log_path=routing_log_path("support_router")
+    ... )
+    >>> decision = router.classify(query, fallback=llm_classify)
+    >>> decision.label, decision.source
+    ('sales', 'rules')
+"""
+
+import copy
+import json
+import math
+import os
+import random
+import re
+import threading
+import zlib
+from typing import Optional, Dict, Any, List, Callable, Iterable, Tuple
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def hashed_ngrams(text: str, n_features: int, ngram_range: Tuple[int, int] = (1, 2)) -> Dict[int, float]:
+    """
+    Vector disperso (índice → valor) de n-gramas de palabras hasheados.
+
+    Usa crc32 en vez de hash() para que los índices sean estables entre
+    procesos y el modelo guardado siga siendo válido. El vector se
+    normaliza con norma L2.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    features: Dict[int, float] = {}
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(tokens) - n + 1):
+            gram = " ".join(tokens[i:i + n])
+            index = zlib.crc32(gram.encode("utf-8")) % n_features
+            features[index] = features.get(index, 0.0) + 1.0
+
+    norm = math.sqrt(sum(v * v for v in features.values()))
+    if norm:
+        features = {i: v / norm for i, v in features.items()}
+    return features
+
+
+def routing_log_path(name: str) -> Optional[str]:
+    """
+    Ruta del JSONL de etiquetas para un router, o None.
+
+    Las etiquetas solo se persisten si está definida ROUTING_LOG_DIR; sin
+    ella el router aprende únicamente dentro del proceso.
+    """
+    directory = os.getenv("ROUTING_LOG_DIR")
+    return os.path.join(directory, f"{name}.jsonl") if directory else None
+
+
+class KeywordRules:
+    """
+    Reglas de palabras clave de alta precisión.
+
+    Las palabras clave se buscan como palabras completas (sin distinguir
+    mayúsculas). Solo deciden cuando coinciden las de exactamente una
+    etiqueta; si coinciden varias, la consulta es ambigua.
+    """
+
+    def __init__(self, rules: Dict[str, Iterable[str]]):
+        self.rules = {label: list(keywords) for label, keywords in rules.items()}
+        self._patterns = {
+            label: re.compile(
+                r"(?<!\w)(?:" + "|".join(re.escape(kw) for kw in keywords) + r")(?!\w)",
+                re.IGNORECASE
+            )
+            for label, keywords in self.rules.items()
+            if keywords
+        }
+
+    def matches(self, text: str) -> List[str]:
+        """Etiquetas cuyas palabras clave aparecen en el texto."""
+        return [label for label, pattern in self._patterns.items() if pattern.search(text)]
+
+    def match(self, text: str) -> Optional[str]:
+        matched = self.matches(text)
+        return matched[0] if len(matched) == 1 else None
+
+
+class HashedNgramClassifier:
+    """
+    Regresión logística multinomial sobre n-gramas hasheados.
+
+    Los pesos son diccionarios dispersos por etiqueta, así que solo ocupan
+    memoria los n-gramas vistos durante el entrenamiento.
+    """
+
+    def __init__(
+        self,
+        labels: Iterable[str],
+        n_features: int = 2 ** 18,
+        ngram_range: Tuple[int, int] = (1, 2),
+        learning_rate: float = 1.0,
+        l2: float = 1e-4,
+        epochs: int = 10,
+        seed: int = 0
+    ):
+        self.labels = list(labels)
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.epochs = epochs
+        self.seed = seed
+        self.weights: Dict[str, Dict[int, float]] = {label: {} for label in self.labels}
+        self.bias: Dict[str, float] = {label: 0.0 for label in self.labels}
+        self.trained = False
+
+    def _features(self, text: str) -> Dict[int, float]:
+        return hashed_ngrams(text, self.n_features, self.ngram_range)
+
+    def _proba(self, features: Dict[int, float]) -> Dict[str, float]:
+        scores = {}
+        for label in self.labels:
+            weights = self.weights[label]
+            scores[label] = self.bias[label] + sum(
+                weights.get(i, 0.0) * v for i, v in features.items()
+            )
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+    def fit(self, texts: List[str], labels: List[str]) -> "HashedNgramClassifier":
+        """Entrena con SGD; reinicia los pesos existentes."""
+        self.weights = {label: {} for label in self.labels}
+        self.bias = {label: 0.0 for label in self.labels}
+
+        examples = [
+            (self._features(text), label)
+            for text, label in zip(texts, labels)
+            if label in self.bias
+        ]
+        rng = random.Random(self.seed)
+
+        for epoch in range(self.epochs):
+            rng.shuffle(examples)
+            rate = self.learning_rate / (1 + 0.1 * epoch)
+            for features, target in examples:
+                proba = self._proba(features)
+                for label in self.labels:
+                    gradient = proba[label] - (1.0 if label == target else 0.0)
+                    weights = self.weights[label]
+                    for i, v in features.items():
+                        w = weights.get(i, 0.0)
+                        weights[i] = w - rate * (gradient * v + self.l2 * w)
+                    self.bias[label] -= rate * gradient
+
+        self.trained = bool(examples)
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        return self._proba(self._features(text))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Etiqueta más probable y su probabilidad."""
+        proba = self.predict_proba(text)
+        label = max(proba, key=proba.get)
+        return label, proba[label]
+
+
+class RoutingDecision:
+    """Resultado de una clasificación."""
+
+    def __init__(self, label: str, source: str, confidence: float):
+        self.label = label
+        self.source = source          # "rules", "model" o "llm"
+        self.confidence = confidence
+
+    def __repr__(self) -> str:
+        return f"RoutingDecision(label={self.label!r}, source={self.source!r}, confidence={self.confidence:.2f})"
+
+
+class LocalRouter:
+    """
+    Clasificador de routing con fallback al LLM.
+
+    Cada etiqueta producida por el LLM se guarda (en memoria y, si se
+    indica log_path, en un JSONL) y el modelo se reentrena cada
+    ``retrain_every`` etiquetas nuevas, así que con tráfico repetitivo
+    la mayoría de las consultas terminan resolviéndose localmente.
+
+    El reentrenamiento corre en un thread: entrena una copia del modelo
+    fuera del lock y la sustituye al terminar, así ``classify`` sigue
+    usando el modelo anterior mientras tanto. Los ejemplos en memoria se
+    limitan a ``max_examples`` con reservoir sampling (muestra uniforme de
+    todas las etiquetas vistas), así que el coste de entrenar no crece
+    con el tráfico.
+    """
+
+    def __init__(
+        self,
+        labels: Iterable[str],
+        keyword_rules: Optional[Dict[str, Iterable[str]]] = None,
+        threshold: float = 0.85,
+        min_examples: int = 30,
+        retrain_every: int = 25,
+        log_path: Optional[str] = None,
+        model: Optional[HashedNgramClassifier] = None,
+        max_examples: int = 2000,
+        background_training: bool = True
+    ):
+        """
+        Args:
+            labels: Etiquetas válidas
+            keyword_rules: Palabras clave por etiqueta (alta precisión)
+            threshold: Probabilidad mínima del modelo para responder localmente
+            min_examples: Ejemplos necesarios antes de usar el modelo
+            retrain_every: Reentrenar tras este número de etiquetas nuevas
+            log_path: JSONL donde se registran las etiquetas del LLM
+            model: Clasificador a usar (por defecto HashedNgramClassifier)
+            max_examples: Ejemplos máximos en memoria para entrenar
+            background_training: Reentrenar en un thread (False = en la
+                                 llamada a record_label)
+        """
+        self.labels = list(labels)
+        self.rules = KeywordRules(keyword_rules) if keyword_rules else None
+        self.threshold = threshold
+        self.min_examples = min_examples
+        self.retrain_every = retrain_every
+        self.log_path = log_path
+        self.model = model or HashedNgramClassifier(self.labels)
+        self.max_examples = max_examples
+        self.background_training = background_training
+
+        self._lock = threading.RLock()
+        # Serializa las escrituras al JSONL sin bloquear la clasificación
+        self._log_lock = threading.Lock()
+        self._examples: List[Tuple[str, str]] = []
+        self._seen = 0
+        self._rng = random.Random(0)
+        self._pending = 0
+        self._training: Optional[threading.Thread] = None
+        self._counts = {"rules": 0, "model": 0, "llm": 0}
+
+        if log_path and os.path.exists(log_path):
+            self.fit_from_log(log_path)
+
+    def predict_local(self, text: str) -> Optional[RoutingDecision]:
+        """Decisión local si hay confianza suficiente; None si no."""
+        rule_label = self.rules.match(text) if self.rules else None
+
+        with self._lock:
+            model = self.model
+            model_ready = model.trained and len(self._examples) >= self.min_examples
+        # El modelo no se modifica después de publicarse: se puede usar sin el lock
+        prediction = model.predict(text) if model_ready else None
+
+        if rule_label is not None:
+            # Si el modelo contradice la regla con confianza, mejor preguntar al LLM
+            if prediction and prediction[0] != rule_label and prediction[1] >= self.threshold:
+                return None
+            return RoutingDecision(rule_label, "rules", 1.0)
+
+        if prediction and prediction[1] >= self.threshold:
+            return RoutingDecision(prediction[0], "model", prediction[1])
+        return None
+
+    def guess(self, text: str) -> Optional[RoutingDecision]:
+        """
+        Etiqueta más probable aunque no haya confianza para decidir
+        localmente (source "guess"); None si no hay ninguna evidencia.
+
+        Sirve para trabajo especulativo: la primera regla que coincide
+        (aunque coincidan varias) o la predicción del modelo entrenado.
+        """
+        matched = self.rules.matches(text) if self.rules else []
+        if matched:
+            return RoutingDecision(matched[0], "guess", 1.0 / len(matched))
+
+        with self._lock:
+            model = self.model
+            model_ready = model.trained and len(self._examples) >= self.min_examples
+        if model_ready:
+            label, confidence = model.predict(text)
+            return RoutingDecision(label, "guess", confidence)
+        return None
+
+    def classify(self, text: str, fallback: Callable[[str], str]) -> RoutingDecision:
+        """
+        Clasifica localmente o, si hay dudas, con ``fallback`` (el LLM).
+
+        Args:
+            text: Consulta a clasificar
+            fallback: Función que devuelve la etiqueta usando el LLM
+
+        Returns:
+            RoutingDecision con la etiqueta y su origen
+        """
+        decision = self.predict_local(text)
+        if decision is None:
+            label = fallback(text)
+            decision = RoutingDecision(label, "llm", 1.0)
+            if label in self.labels:
+                self.record_label(text, label)
+
+        with self._lock:
+            self._counts[decision.source] += 1
+        return decision
+
+    def _add_example(self, text: str, label: str):
+        """Reservoir sampling: cada etiqueta vista tiene la misma probabilidad de quedarse."""
+        self._seen += 1
+        if len(self._examples) < self.max_examples:
+            self._examples.append((text, label))
+            return
+        index = self._rng.randrange(self._seen)
+        if index < self.max_examples:
+            self._examples[index] = (text, label)
+
+    def record_label(self, text: str, label: str):
+        """Registra una etiqueta confiable y reentrena si toca."""
+        if self.log_path:
+            self._append_log(text, label)
+
+        with self._lock:
+            self._add_example(text, label)
+            self._pending += 1
+            due = self._pending >= self.retrain_every and len(self._examples) >= self.min_examples
+            if not due or (self._training is not None and self._training.is_alive()):
+                return
+            self._pending = 0
+            examples = list(self._examples)
+            if self.background_training:
+                self._training = threading.Thread(target=self._train, args=(examples,), daemon=True)
+                self._training.start()
+                return
+        self._train(examples)
+
+    def _append_log(self, text: str, label: str):
+        line = json.dumps({"text": text, "label": label}, ensure_ascii=False) + "\n"
+        with self._log_lock:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _train(self, examples: List[Tuple[str, str]]):
+        """Entrena una copia del modelo sin el lock y la publica al terminar."""
+        # fit() crea pesos nuevos: la copia no comparte estado mutable con el modelo en uso
+        model = copy.copy(self.model)
+        model.fit([text for text, _ in examples], [label for _, label in examples])
+        with self._lock:
+            self.model = model
+
+    def wait_for_training(self, timeout: Optional[float] = None):
+        """Espera a que termine el reentrenamiento en curso (si lo hay)."""
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+
+    def fit(self, examples: Optional[Iterable[Tuple[str, str]]] = None) -> "LocalRouter":
+        """Entrena el modelo con los ejemplos registrados (o los indicados)."""
+        with self._lock:
+            if examples is not None:
+                self._examples, self._seen = [], 0
+                for text, label in examples:
+                    if label in self.labels:
+                        self._add_example(text, label)
+            training = list(self._examples)
+            self._pending = 0
+        self._train(training)
+        return self
+
+    def fit_from_log(self, path: Optional[str] = None) -> "LocalRouter":
+        """Entrena con un JSONL de etiquetas ({"text": ..., "label": ...})."""
+        path = path or self.log_path
+        examples = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                examples.append((record["text"], record["label"]))
+        return self.fit(examples)
+
+    def stats(self) -> Dict[str, Any]:
+        """Decisiones por origen y fracción resuelta sin LLM."""
+        with self._lock:
+            total = sum(self._counts.values())
+            local = self._counts["rules"] + self._counts["model"]
+            return {
+                **self._counts,
+                "total": total,
+                "local_ratio": local / total if total else 0.0,
+                "examples": len(self._examples)
+            }
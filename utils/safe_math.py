@@ -0,0 +1,294 @@
+"""
+Safe Math
+
+Evaluador aritmético seguro para las herramientas ``calculator``. Las
+expresiones vienen del modelo, así que no se pasan a ``eval``: se
+parsean con ``ast``, se valida que solo contengan aritmética y se
+compilan a funciones Python (closures) que se reutilizan.
+
+- Solo se aceptan números, variables con nombre, + - * / // % **,
+  paréntesis y un conjunto fijo de funciones (abs, round, min, max,
+  sqrt, log, exp, ...).
+- Las expresiones compiladas se guardan en una cache LRU: evaluar miles
+  de veces la misma fórmula solo la parsea una vez.
+- ``evaluate_many`` aplica una fórmula compilada sobre una lista de
+  valores (evaluación vectorizada).
+- Límites: longitud de la expresión, tamaño del exponente, tamaño de
+  los enteros intermedios y tiempo máximo de una evaluación vectorizada.
+
+Ejemplo:
+    >>> safe_eval("(10 + 5) * 2")
+    30
+    >>> default_evaluator.evaluate_many("price * (1 + tax)", [
+    ...     {"price": 100, "tax": 0.21}, {"price": 80, "tax": 0.1}
+    ... ])
+    [121.0, 88.0]
+"""
+
+import ast
+import math
+import operator
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable, Iterable, Mapping, Union
+
+
+Number = Union[int, float]
+
+
+class ExpressionError(ValueError):
+    """Expresión no permitida o que excede los límites del evaluador."""
+
+
+_BINARY_OPERATORS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPERATORS: Dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+FUNCTIONS: Dict[str, Callable[..., Number]] = {
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "sqrt": math.sqrt,
+    "log": math.log,
+    "log10": math.log10,
+    "exp": math.exp,
+    "floor": math.floor,
+    "ceil": math.ceil,
+}
+
+CONSTANTS: Dict[str, float] = {
+    "pi": math.pi,
+    "e": math.e,
+}
+
+
+class CompiledExpression:
+    """Expresión validada y compilada; se evalúa con ``expr(variables)``."""
+
+    def __init__(self, source: str, func: Callable[[Mapping[str, Number]], Number], variables: frozenset):
+        self.source = source
+        self.variables = variables
+        self._func = func
+
+    def __call__(self, variables: Optional[Mapping[str, Number]] = None) -> Number:
+        return self._func(variables or {})
+
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.source!r})"
+
+
+class ArithmeticEvaluator:
+    """
+    Compila y evalúa expresiones aritméticas de forma segura.
+
+    Es thread-safe: la cache LRU está protegida por un lock y las
+    expresiones compiladas no tienen estado.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = 1024,
+        max_length: int = 1000,
+        max_exponent: int = 1000,
+        max_int_bits: int = 4096,
+        timeout_seconds: Optional[float] = 1.0
+    ):
+        """
+        Args:
+            cache_size: Expresiones compiladas a conservar (LRU)
+            max_length: Longitud máxima de una expresión
+            max_exponent: Valor absoluto máximo de un exponente
+            max_int_bits: Tamaño máximo (en bits) de un entero intermedio
+            timeout_seconds: Tiempo máximo de una llamada a evaluate_many
+                             (una sola expresión ya está acotada por los
+                             límites de longitud, exponente y bits)
+        """
+        self.cache_size = cache_size
+        self.max_length = max_length
+        self.max_exponent = max_exponent
+        self.max_int_bits = max_int_bits
+        self.timeout_seconds = timeout_seconds
+
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, CompiledExpression]" = OrderedDict()
+        self._counts = {"hits": 0, "misses": 0}
+
+    # ------------------------------------------------------------------
+    # Compilación
+    # ------------------------------------------------------------------
+
+    def compile(self, expression: str) -> CompiledExpression:
+        """Valida y compila una expresión (cacheada por su texto)."""
+        source = expression.strip()
+        with self._lock:
+            compiled = self._cache.get(source)
+            if compiled is not None:
+                self._cache.move_to_end(source)
+                self._counts["hits"] += 1
+                return compiled
+            self._counts["misses"] += 1
+
+        if len(source) > self.max_length:
+            raise ExpressionError(f"Expresión demasiado larga ({len(source)} > {self.max_length} caracteres)")
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError as e:
+            raise ExpressionError(f"Sintaxis inválida: {e.msg}") from None
+
+        variables: set = set()
+        func = self._compile_node(tree.body, variables)
+        compiled = CompiledExpression(source, func, frozenset(variables))
+
+        with self._lock:
+            self._cache[source] = compiled
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compiled
+
+    def _check_number(self, value: Any) -> Number:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ExpressionError(f"Valor no numérico: {value!r}")
+        if isinstance(value, int) and value.bit_length() > self.max_int_bits:
+            raise ExpressionError(f"Resultado demasiado grande (> {self.max_int_bits} bits)")
+        return value
+
+    def _power(self, base: Number, exponent: Number) -> Number:
+        if abs(exponent) > self.max_exponent:
+            raise ExpressionError(f"Exponente demasiado grande (|{exponent}| > {self.max_exponent})")
+        if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+            # Estimar el tamaño antes de calcular para no bloquear el proceso
+            if base.bit_length() * exponent > self.max_int_bits:
+                raise ExpressionError(f"Resultado demasiado grande (> {self.max_int_bits} bits)")
+        try:
+            return base ** exponent
+        except OverflowError:
+            raise ExpressionError("Resultado fuera de rango") from None
+
+    def _compile_node(self, node: ast.AST, variables: set) -> Callable[[Mapping[str, Number]], Number]:
+        check = self._check_number
+
+        if isinstance(node, ast.Constant):
+            value = check(node.value)
+            return lambda env: value
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name in CONSTANTS:
+                value = CONSTANTS[name]
+                return lambda env: value
+            variables.add(name)
+
+            def load(env):
+                try:
+                    return check(env[name])
+                except KeyError:
+                    raise ExpressionError(f"Variable no definida: {name}") from None
+            return load
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+            op = _UNARY_OPERATORS[type(node.op)]
+            operand = self._compile_node(node.operand, variables)
+            return lambda env: op(operand(env))
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            left = self._compile_node(node.left, variables)
+            right = self._compile_node(node.right, variables)
+            if isinstance(node.op, ast.Pow):
+                power = self._power
+                return lambda env: check(power(left(env), right(env)))
+            op = _BINARY_OPERATORS[type(node.op)]
+            if isinstance(node.op, ast.Mult):
+                return lambda env: check(op(left(env), right(env)))
+            return lambda env: op(left(env), right(env))
+
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in FUNCTIONS
+            and not node.keywords
+        ):
+            function = FUNCTIONS[node.func.id]
+            args = [self._compile_node(arg, variables) for arg in node.args]
+            return lambda env: check(function(*(arg(env) for arg in args)))
+
+        raise ExpressionError(f"Elemento no permitido en la expresión: {ast.dump(node)[:60]}")
+
+    # ------------------------------------------------------------------
+    # Evaluación
+    # ------------------------------------------------------------------
+
+    def _deadline(self) -> Optional[float]:
+        return time.perf_counter() + self.timeout_seconds if self.timeout_seconds else None
+
+    def evaluate(self, expression: str, variables: Optional[Mapping[str, Number]] = None) -> Number:
+        """
+        Evalúa una expresión.
+
+        Raises:
+            ExpressionError: Si la expresión no es aritmética válida o
+                excede algún límite
+        """
+        compiled = self.compile(expression)
+        try:
+            return compiled(variables)
+        except ExpressionError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise ExpressionError(str(e)) from None
+
+    def evaluate_many(
+        self,
+        expression: str,
+        rows: Iterable[Mapping[str, Number]]
+    ) -> List[Number]:
+        """
+        Evalúa una misma expresión sobre muchas filas de variables.
+
+        La expresión se compila una sola vez; el tiempo total está
+        limitado por ``timeout_seconds``.
+        """
+        compiled = self.compile(expression)
+        deadline = self._deadline()
+        results = []
+        for row in rows:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise ExpressionError(f"Tiempo de evaluación excedido ({self.timeout_seconds}s)")
+            try:
+                results.append(compiled(row))
+            except ExpressionError:
+                raise
+            except (ArithmeticError, ValueError, TypeError) as e:
+                raise ExpressionError(str(e)) from None
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Aciertos de la cache de expresiones compiladas."""
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "entries": len(self._cache),
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0
+            }
+
+
+# Evaluador compartido por las herramientas calculator
+default_evaluator = ArithmeticEvaluator()
+
+
+def safe_eval(expression: str, **variables: Number) -> Number:
+    """Evalúa una expresión con el evaluador compartido."""
+    return default_evaluator.evaluate(expression, variables)
@@ -0,0 +1,372 @@
+"""
+Search Providers
+
+Abstracción de búsqueda para los nodos de retrieval (search_web,
+search_wikipedia). Evita crear un cliente por llamada y volver a buscar
+consultas idénticas:
+
+- Un cliente compartido por proveedor (Tavily, Wikipedia), creado la
+  primera vez que se usa.
+- ``CachedSearchProvider``: cache consulta → resultados con TTL,
+  persistida en disco si está definida SEARCH_CACHE_DIR. Consultas
+  idénticas en vuelo (p. ej. dos entrevistas en paralelo) se resuelven
+  con una sola búsqueda.
+- ``LocalCorpusProvider``: índice BM25 en memoria sobre un corpus local
+  (JSONL o directorio de .md/.txt, partido en pasajes) que sustituye a
+  Tavily/Wikipedia en ejecuciones offline.
+
+Todos los proveedores devuelven ``Document`` de LangChain con
+``metadata["source"]`` (URL o ruta) y, si aplica, ``title`` y ``page``.
+
+Ejemplo:
+    >>> web_search = search_provider("web", max_results=3)
+    >>> docs = web_search.search("LangGraph multi-agent patterns")
+
+    # Offline: SEARCH_BACKEND=local LOCAL_SEARCH_CORPUS=docs/corpus.jsonl
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+from langchain_core.documents import Document
+
+from .tool_cache import ToolCache, MISSING
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Palabras por pasaje al indexar ficheros: del orden de un resultado de Tavily
+PASSAGE_WORDS = 200
+
+
+def search_cache_dir() -> Optional[str]:
+    """
+    Directorio de la cache de búsquedas en disco, o None.
+
+    Los resultados solo se persisten si está definida SEARCH_CACHE_DIR;
+    sin ella la cache vive únicamente en memoria.
+    """
+    return os.getenv("SEARCH_CACHE_DIR") or None
+
+
+class SearchProvider:
+    """Interfaz común: ``search(query, max_results) -> List[Document]``."""
+
+    name = "search"
+
+    def __init__(self, max_results: int = 3):
+        self.max_results = max_results
+
+    def search(self, query: str, max_results: Optional[int] = None) -> List[Document]:
+        return self._search(query, max_results or self.max_results)
+
+    def _search(self, query: str, max_results: int) -> List[Document]:
+        raise NotImplementedError
+
+
+class TavilyProvider(SearchProvider):
+    """Búsqueda web con Tavily (requiere langchain-tavily y TAVILY_API_KEY)."""
+
+    name = "tavily"
+
+    def __init__(self, max_results: int = 3):
+        super().__init__(max_results)
+        self._clients: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    def _client(self, max_results: int):
+        with self._lock:
+            client = self._clients.get(max_results)
+            if client is None:
+                from langchain_tavily import TavilySearch
+                client = self._clients[max_results] = TavilySearch(max_results=max_results)
+            return client
+
+    def _search(self, query: str, max_results: int) -> List[Document]:
+        data = self._client(max_results).invoke({"query": query})
+        results = data.get("results", data) if isinstance(data, dict) else data
+        return [
+            Document(
+                page_content=result["content"],
+                metadata={"source": result["url"], "title": result.get("title", "")}
+            )
+            for result in results
+        ]
+
+
+class WikipediaProvider(SearchProvider):
+    """Búsqueda en Wikipedia (requiere langchain-community y wikipedia)."""
+
+    name = "wikipedia"
+
+    def __init__(self, max_results: int = 2, lang: str = "en"):
+        super().__init__(max_results)
+        self.lang = lang
+        self._wrapper = None
+        self._lock = threading.Lock()
+
+    def _search(self, query: str, max_results: int) -> List[Document]:
+        with self._lock:
+            if self._wrapper is None:
+                from langchain_community.utilities import WikipediaAPIWrapper
+                self._wrapper = WikipediaAPIWrapper(lang=self.lang, top_k_results=self.max_results)
+            wrapper = self._wrapper
+
+        # Igual que WikipediaLoader, pero reutilizando el mismo wrapper
+        return [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "source": doc.metadata.get("source", "")}
+            )
+            for doc in wrapper.load(query)[:max_results]
+        ]
+
+
+class LocalCorpusProvider(SearchProvider):
+    """
+    Recuperación BM25 sobre un corpus local, sin red.
+
+    El corpus se indexa una sola vez al crear el proveedor (índice
+    invertido en memoria, Python puro).
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        documents: Iterable[Document],
+        max_results: int = 3,
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        super().__init__(max_results)
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+        for doc_id, doc in enumerate(self.documents):
+            title = doc.metadata.get("title", "")
+            counts = Counter(self.tokenize(f"{title} {doc.page_content}"))
+            self._lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self._postings.setdefault(term, []).append((doc_id, frequency))
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        return _TOKEN_RE.findall(text.lower())
+
+    @classmethod
+    def from_jsonl(cls, path: str, **kwargs) -> "LocalCorpusProvider":
+        """Carga un JSONL con {"source", "content", "title"?, "page"?} por línea."""
+        documents = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                metadata = {k: v for k, v in record.items() if k != "content"}
+                documents.append(Document(page_content=record["content"], metadata=metadata))
+        return cls(documents, **kwargs)
+
+    @staticmethod
+    def split_passages(text: str, max_words: int = PASSAGE_WORDS) -> List[str]:
+        """
+        Parte un texto en pasajes de hasta ``max_words`` palabras.
+
+        Se agrupan párrafos completos (separados por líneas en blanco); un
+        párrafo más largo que el límite se corta por palabras.
+        """
+        passages: List[str] = []
+        current: List[str] = []
+        words = 0
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph_words = paragraph.split()
+            if not paragraph_words:
+                continue
+            if current and words + len(paragraph_words) > max_words:
+                passages.append("\n\n".join(current))
+                current, words = [], 0
+            if len(paragraph_words) > max_words:
+                while len(paragraph_words) > max_words:
+                    passages.append(" ".join(paragraph_words[:max_words]))
+                    paragraph_words = paragraph_words[max_words:]
+                paragraph = " ".join(paragraph_words)
+            current.append(paragraph.strip())
+            words += len(paragraph_words)
+        if current:
+            passages.append("\n\n".join(current))
+        return passages
+
+    @classmethod
+    def from_directory(
+        cls,
+        path: str,
+        patterns: Tuple[str, ...] = ("*.md", "*.txt"),
+        passage_words: int = PASSAGE_WORDS,
+        **kwargs
+    ) -> "LocalCorpusProvider":
+        """
+        Indexa los ficheros de texto de un directorio.
+
+        Cada fichero se parte en pasajes (ver ``split_passages``): igual que
+        un buscador real, una consulta devuelve fragmentos relevantes y no
+        ficheros completos.
+        """
+        documents = []
+        for pattern in patterns:
+            for file in sorted(Path(path).rglob(pattern)):
+                text = file.read_text(encoding="utf-8", errors="ignore")
+                for index, passage in enumerate(cls.split_passages(text, passage_words)):
+                    documents.append(Document(
+                        page_content=passage,
+                        metadata={"source": str(file), "title": file.stem, "passage": index}
+                    ))
+        return cls(documents, **kwargs)
+
+    def _search(self, query: str, max_results: int) -> List[Document]:
+        total = len(self.documents)
+        scores: Dict[int, float] = {}
+        for term in set(self.tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / self._avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:max_results]
+        return [self.documents[doc_id] for doc_id, _ in ranked]
+
+
+class CachedSearchProvider(SearchProvider):
+    """
+    Envuelve un proveedor con una cache consulta → resultados con TTL.
+
+    Las consultas se normalizan (minúsculas, espacios colapsados) antes
+    de calcular la clave, y las búsquedas idénticas concurrentes se
+    agrupan en una sola llamada al proveedor.
+    """
+
+    def __init__(
+        self,
+        provider: SearchProvider,
+        ttl_seconds: Optional[float] = 24 * 3600,
+        cache: Optional[ToolCache] = None
+    ):
+        """
+        Args:
+            provider: Proveedor real
+            ttl_seconds: Validez de un resultado (None = no expira)
+            cache: Cache a usar (por defecto una nueva, persistida en
+                   SEARCH_CACHE_DIR si está definida)
+        """
+        super().__init__(provider.max_results)
+        self.provider = provider
+        # Es el nombre del subdirectorio en SEARCH_CACHE_DIR: solo caracteres válidos en rutas
+        self.name = f"search_{provider.name}"
+        self.ttl_seconds = ttl_seconds
+        self.cache = cache if cache is not None else ToolCache(cache_dir=search_cache_dir())
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.coalesced = 0
+
+    def _search(self, query: str, max_results: int) -> List[Document]:
+        normalized = " ".join(query.lower().split())
+        key = self.cache.make_key({"query": normalized, "max_results": max_results})
+
+        cached = self.cache.get(self.name, key)
+        if cached is not MISSING:
+            return [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in cached]
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            documents = self.provider.search(query, max_results)
+            self.cache.set(
+                self.name,
+                key,
+                [{"page_content": d.page_content, "metadata": d.metadata} for d in documents],
+                ttl_seconds=self.ttl_seconds
+            )
+            future.set_result(documents)
+            return documents
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Aciertos de cache y búsquedas agrupadas."""
+        stats = self.cache.stats().get(self.name, {"hits": 0, "misses": 0, "entries": 0, "hit_rate": 0.0})
+        return {**stats, "coalesced": self.coalesced}
+
+
+_providers: Dict[Tuple[str, int], SearchProvider] = {}
+_corpora: Dict[str, LocalCorpusProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def _local_corpus() -> LocalCorpusProvider:
+    """Corpus de LOCAL_SEARCH_CORPUS, indexado una sola vez por proceso."""
+    path = os.getenv("LOCAL_SEARCH_CORPUS")
+    if not path:
+        raise ValueError("SEARCH_BACKEND=local requiere LOCAL_SEARCH_CORPUS (JSONL o directorio)")
+    if path not in _corpora:
+        if os.path.isdir(path):
+            _corpora[path] = LocalCorpusProvider.from_directory(path)
+        else:
+            _corpora[path] = LocalCorpusProvider.from_jsonl(path)
+    return _corpora[path]
+
+
+def search_provider(kind: str, max_results: int = 3, ttl_seconds: Optional[float] = 24 * 3600) -> SearchProvider:
+    """
+    Proveedor compartido (y cacheado) para un tipo de búsqueda.
+
+    Args:
+        kind: "web" (Tavily) o "wikipedia"
+        max_results: Resultados por defecto
+        ttl_seconds: Validez de los resultados cacheados
+
+    Con SEARCH_BACKEND=local ambos tipos usan el corpus de
+    LOCAL_SEARCH_CORPUS.
+    """
+    if kind not in ("web", "wikipedia"):
+        raise ValueError(f"kind debe ser 'web' o 'wikipedia' (recibido {kind!r})")
+
+    backend = os.getenv("SEARCH_BACKEND", "remote").lower()
+    with _providers_lock:
+        provider = _providers.get((kind, max_results))
+        if provider is None:
+            if backend == "local":
+                inner: SearchProvider = _local_corpus()
+            elif kind == "web":
+                inner = TavilyProvider(max_results=max_results)
+            else:
+                inner = WikipediaProvider(max_results=max_results)
+            provider = _providers[(kind, max_results)] = CachedSearchProvider(inner, ttl_seconds=ttl_seconds)
+        return provider
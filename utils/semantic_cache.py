@@ -0,0 +1,320 @@
+"""
+Semantic Response Cache
+
+Cache de respuestas para consultas casi duplicadas ("Mi smartphone no
+carga" / "mi smartphone ya no carga"). Se coloca delante de un grafo
+compilado: si una consulta de la misma categoría ya se respondió y su
+similitud supera el umbral, se devuelve la respuesta anterior sin
+ejecutar el grafo.
+
+- Las consultas se normalizan (minúsculas, sin acentos ni puntuación)
+  antes de calcular el embedding.
+- El embedding por defecto es un vector hasheado de palabras y trigramas
+  de caracteres (sin llamadas a APIs); se puede pasar cualquier
+  ``Embeddings`` de LangChain.
+- Dos consultas solo son equivalentes si mencionan las mismas
+  entidades: números, códigos de modelo ("X15", "S23") y nombres propios
+  o términos clave ("Gaming", ``key_terms``). Sin esta regla "Laptop Pro
+  X15" y "Laptop Pro X15 Gaming" superan el umbral de similitud y una
+  recibiría la respuesta de la otra. Las negaciones ("no", "nunca",
+  "sin"...) cuentan como entidades por lo mismo: "Quiero devolver mi
+  pedido" y "No quiero devolver mi pedido" son casi idénticas.
+- ``version_fn`` permite invalidar automáticamente la cache cuando
+  cambia la fuente de verdad (p. ej. la knowledge base).
+"""
+
+import math
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable, FrozenSet, Iterable, Union
+
+
+Vector = Union[Dict[int, float], List[float]]
+
+_NON_WORD_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACES_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Palabras que invierten el sentido de una consulta (normalizadas)
+NEGATION_TERMS = frozenset({
+    "no", "nunca", "jamas", "sin", "ni", "tampoco", "nada", "ningun", "ninguno", "ninguna",
+})
+
+
+def normalize_query(text: str) -> str:
+    """Minúsculas, sin acentos, sin puntuación y con espacios colapsados."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD_RE.sub(" ", text)
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def entity_tokens(text: str, key_terms: Iterable[str] = ()) -> FrozenSet[str]:
+    """
+    Tokens que identifican de qué habla una consulta (normalizados).
+
+    - Tokens con dígitos: "x15", "s23", "500gb"
+    - Palabras en mayúscula que no inician la oración: "Gaming", "Galaxy"
+    - Palabras de ``key_terms`` (p. ej. los nombres de producto del
+      catálogo), aunque el usuario las escriba en minúsculas
+    - Negaciones (``NEGATION_TERMS``): "no", "nunca", "sin"...
+    """
+    key_terms = {normalize_query(term) for term in key_terms}
+    entities = set()
+    for match in _WORD_RE.finditer(text):
+        word = match.group()
+        token = normalize_query(word)
+        if not token:
+            continue
+        before = text[:match.start()].rstrip()
+        starts_sentence = not before or before[-1] in ".!?¿¡"
+        if (
+            any(ch.isdigit() for ch in word)
+            or (word[0].isupper() and not starts_sentence)
+            or token in key_terms
+            or token in NEGATION_TERMS
+        ):
+            entities.add(token)
+    return frozenset(entities)
+
+
+def hashed_embedding(text: str, n_features: int = 2 ** 18) -> Dict[int, float]:
+    """
+    Embedding disperso de palabras y trigramas de caracteres.
+
+    Los trigramas hacen que variaciones menores ("carga" / "cargar")
+    sigan siendo similares. El vector se normaliza con norma L2.
+    """
+    features: Dict[int, float] = {}
+
+    def add(token: str, weight: float):
+        index = zlib.crc32(token.encode("utf-8")) % n_features
+        features[index] = features.get(index, 0.0) + weight
+
+    for word in text.split():
+        add("w:" + word, 1.0)
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            add("c:" + padded[i:i + 3], 0.5)
+
+    norm = math.sqrt(sum(v * v for v in features.values()))
+    if norm:
+        features = {i: v / norm for i, v in features.items()}
+    return features
+
+
+def cosine_similarity(a: Vector, b: Vector) -> float:
+    """Similitud coseno entre vectores densos o dispersos."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        if len(a) > len(b):
+            a, b = b, a
+        dot = sum(v * b.get(i, 0.0) for i, v in a.items())
+        norm_a = math.sqrt(sum(v * v for v in a.values()))
+        norm_b = math.sqrt(sum(v * v for v in b.values()))
+    else:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm_a = math.sqrt(sum(x * x for x in a))
+        norm_b = math.sqrt(sum(y * y for y in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class SemanticCache:
+    """
+    Cache semántica de respuestas, particionada por categoría.
+
+    Ejemplo:
+        >>> cache = SemanticCache(threshold=0.85, version_fn=lambda: kb_version)
+        >>> hit = cache.lookup("mi smartphone ya no carga", category="support")
+        >>> if hit is None:
+        ...     response = run_graph(...)
+        ...     cache.store("Mi smartphone no carga", "support", response)
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        embeddings=None,
+        max_entries: int = 1000,
+        ttl_seconds: Optional[float] = None,
+        version_fn: Optional[Callable[[], Any]] = None,
+        key_terms: Iterable[str] = ()
+    ):
+        """
+        Args:
+            threshold: Similitud mínima para considerar dos consultas equivalentes
+            embeddings: Embeddings de LangChain (None = hashed_embedding local)
+            max_entries: Entradas máximas; se descartan las menos usadas (LRU)
+            ttl_seconds: Antigüedad máxima de una entrada
+            version_fn: Devuelve la versión actual de los datos de origen;
+                        si cambia, la cache se vacía antes de la búsqueda
+            key_terms: Palabras que distinguen una consulta de otra aunque
+                       estén en minúsculas (modelos, productos); ver entity_tokens
+        """
+        self.threshold = threshold
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_fn = version_fn
+        self.key_terms = frozenset(normalize_query(term) for term in key_terms)
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._by_category: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._next_id = 0
+        self._version = version_fn() if version_fn else None
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        self._counts = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    def _embed(self, normalized: str) -> Vector:
+        if self.embeddings is not None:
+            return self.embeddings.embed_query(normalized)
+        return hashed_embedding(normalized)
+
+    def _check_version(self):
+        """Invalida todo si la versión de los datos de origen cambió."""
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._version = version
+            self.invalidate()
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry["created_at"] > self.ttl_seconds
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            self._by_category.get(entry["category"], {}).pop(entry_id, None)
+
+    def lookup(self, query: str, category: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca una respuesta previa para una consulta equivalente.
+
+        Returns:
+            None si no hay coincidencia; si la hay, un dict con la
+            respuesta ("response") y su procedencia ("similarity",
+            "cached_query", "created_at", "hits", "version", "metadata").
+        """
+        normalized = normalize_query(query)
+        entities = entity_tokens(query, self.key_terms)
+        vector = self._embed(normalized)
+
+        with self._lock:
+            self._check_version()
+            now = time.time()
+            best_id, best_similarity = None, 0.0
+
+            for entry_id, entry in list(self._by_category.get(category, {}).items()):
+                if self._expired(entry, now):
+                    self._remove(entry_id)
+                    continue
+                # Otro producto o modelo: no es la misma consulta aunque se parezca
+                if entry["entities"] != entities and entry["normalized"] != normalized:
+                    continue
+                similarity = (
+                    1.0 if entry["normalized"] == normalized
+                    else cosine_similarity(vector, entry["vector"])
+                )
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None or best_similarity < self.threshold:
+                self._counts["misses"] += 1
+                return None
+
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            entry["hits"] += 1
+            self._counts["hits"] += 1
+
+            return {
+                "response": entry["response"],
+                "category": category,
+                "similarity": best_similarity,
+                "cached_query": entry["query"],
+                "created_at": entry["created_at"],
+                "hits": entry["hits"],
+                "version": entry["version"],
+                "metadata": dict(entry["metadata"])
+            }
+
+    def store(
+        self,
+        query: str,
+        category: str,
+        response: Any,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """Guarda la respuesta de una consulta."""
+        normalized = normalize_query(query)
+        vector = self._embed(normalized)
+
+        with self._lock:
+            self._check_version()
+
+            # Reemplazar una entrada previa con la misma consulta normalizada
+            for entry_id, entry in list(self._by_category.get(category, {}).items()):
+                if entry["normalized"] == normalized:
+                    self._remove(entry_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            entry = {
+                "query": query,
+                "normalized": normalized,
+                "entities": entity_tokens(query, self.key_terms),
+                "category": category,
+                "vector": vector,
+                "response": response,
+                "metadata": dict(metadata or {}),
+                "created_at": time.time(),
+                "hits": 0,
+                "version": self._version
+            }
+            self._entries[entry_id] = entry
+            self._by_category.setdefault(category, {})[entry_id] = entry
+            self._counts["stores"] += 1
+
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+
+    def invalidate(self, category: Optional[str] = None):
+        """
+        Invalida las entradas de una categoría (o todas) y avisa a los
+        listeners registrados con on_invalidate.
+        """
+        with self._lock:
+            if category is None:
+                self._entries.clear()
+                self._by_category.clear()
+            else:
+                for entry_id in list(self._by_category.get(category, {})):
+                    self._remove(entry_id)
+            self._counts["invalidations"] += 1
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            listener(category)
+
+    def on_invalidate(self, listener: Callable[[Optional[str]], None]):
+        """Registra una función a llamar cada vez que se invalida la cache."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso y tasa de aciertos."""
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "entries": len(self._entries),
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0
+            }
@@ -0,0 +1,192 @@
+"""
+Streaming de grafos LangGraph
+
+Convierte la ejecución de un grafo compilado en una secuencia de eventos
+simples, útil para mostrar la respuesta final token a token mientras el
+resto del grafo todavía se está ejecutando.
+
+Eventos emitidos (diccionarios con clave "type"):
+- node_start: {"type": "node_start", "node": str, "step": int}
+- token:      {"type": "token", "node": str, "content": str}
+- node_end:   {"type": "node_end", "node": str, "step": int,
+               "duration_ms": float, "error": Optional[str]}
+- final:      {"type": "final", "state": dict}
+
+Los nodos pueden seguir usando ``llm.invoke``: con stream_mode="messages"
+LangGraph recibe los tokens del modelo a través de sus callbacks.
+
+Ejemplo:
+    >>> for event in stream_graph(app, initial_state, token_nodes=["synthesizer"]):
+    ...     if event["type"] == "token":
+    ...         print(event["content"], end="", flush=True)
+"""
+
+import time
+from typing import Optional, Dict, Any, List, Iterable, Iterator, AsyncIterator
+
+from langchain_core.messages import BaseMessageChunk
+
+
+STREAM_MODES = ["messages", "tasks", "values"]
+
+
+class _MarkerFilter:
+    """
+    Elimina marcadores internos (p. ej. "[REQUIERE_ESCALAMIENTO]") de un
+    flujo de tokens.
+
+    Retiene el sufijo del texto que todavía podría ser el inicio de un
+    marcador, así que un marcador partido en varios tokens no se filtra
+    al usuario.
+    """
+
+    def __init__(self, markers: Iterable[str]):
+        self.markers = [m for m in markers if m]
+        self._buffer = ""
+
+    def feed(self, text: str) -> str:
+        if not self.markers:
+            return text
+
+        self._buffer += text
+        for marker in self.markers:
+            self._buffer = self._buffer.replace(marker, "")
+
+        # Longitud del sufijo más largo que es prefijo de algún marcador
+        hold = 0
+        for marker in self.markers:
+            for size in range(min(len(marker) - 1, len(self._buffer)), hold, -1):
+                if self._buffer.endswith(marker[:size]):
+                    hold = size
+                    break
+
+        emit = self._buffer[:len(self._buffer) - hold]
+        self._buffer = self._buffer[len(self._buffer) - hold:]
+        return emit
+
+    def flush(self) -> str:
+        text, self._buffer = self._buffer, ""
+        return text
+
+
+def _message_text(message: Any) -> str:
+    """Texto de un mensaje; soporta contenido en bloques (Anthropic)."""
+    content = getattr(message, "content", "")
+    if isinstance(content, str):
+        return content
+
+    parts = []
+    for block in content or []:
+        if isinstance(block, str):
+            parts.append(block)
+        elif isinstance(block, dict) and block.get("type") == "text":
+            parts.append(block.get("text", ""))
+    return "".join(parts)
+
+
+class _GraphEventTranslator:
+    """Traduce los chunks de ``app.stream`` a eventos del módulo."""
+
+    def __init__(
+        self,
+        token_nodes: Optional[Iterable[str]],
+        hidden_markers: Iterable[str]
+    ):
+        self.token_nodes = set(token_nodes) if token_nodes is not None else None
+        self.hidden_markers = list(hidden_markers)
+        self.step = 0
+        self.state: Dict[str, Any] = {}
+        self._starts: Dict[str, tuple] = {}
+        self._filters: Dict[str, _MarkerFilter] = {}
+
+    def _streams_tokens(self, node: Optional[str]) -> bool:
+        return node is not None and (self.token_nodes is None or node in self.token_nodes)
+
+    def handle(self, mode: str, data: Any) -> List[Dict[str, Any]]:
+        if mode == "values":
+            self.state = data
+            return []
+
+        if mode == "messages":
+            message, metadata = data
+            node = metadata.get("langgraph_node")
+            # Solo chunks del modelo: los mensajes completos que un nodo
+            # devuelve en su update no son tokens
+            if not isinstance(message, BaseMessageChunk) or not self._streams_tokens(node):
+                return []
+            text = _message_text(message)
+            if not text:
+                return []
+            marker_filter = self._filters.setdefault(node, _MarkerFilter(self.hidden_markers))
+            text = marker_filter.feed(text)
+            return [{"type": "token", "node": node, "content": text}] if text else []
+
+        if mode == "tasks":
+            node = data["name"]
+            if "result" not in data:
+                self.step += 1
+                self._starts[data["id"]] = (self.step, time.perf_counter())
+                return [{"type": "node_start", "node": node, "step": self.step}]
+
+            events = []
+            marker_filter = self._filters.pop(node, None)
+            if marker_filter is not None:
+                rest = marker_filter.flush()
+                if rest:
+                    events.append({"type": "token", "node": node, "content": rest})
+
+            step, start = self._starts.pop(data["id"], (self.step, time.perf_counter()))
+            events.append({
+                "type": "node_end",
+                "node": node,
+                "step": step,
+                "duration_ms": (time.perf_counter() - start) * 1000,
+                "error": data.get("error")
+            })
+            return events
+
+        return []
+
+    def final_event(self) -> Dict[str, Any]:
+        return {"type": "final", "state": self.state}
+
+
+def stream_graph(
+    app,
+    inputs: Dict[str, Any],
+    token_nodes: Optional[Iterable[str]] = None,
+    config: Optional[Dict[str, Any]] = None,
+    hidden_markers: Iterable[str] = ()
+) -> Iterator[Dict[str, Any]]:
+    """
+    Ejecuta un grafo compilado emitiendo eventos de progreso y tokens.
+
+    Args:
+        app: Grafo compilado (CompiledStateGraph)
+        inputs: Estado inicial
+        token_nodes: Nodos cuyos tokens se emiten (None = todos)
+        config: RunnableConfig opcional (recursion_limit, callbacks...)
+        hidden_markers: Marcadores que se eliminan de los tokens emitidos
+
+    Yields:
+        Eventos node_start / token / node_end y un evento final con el estado
+    """
+    translator = _GraphEventTranslator(token_nodes, hidden_markers)
+    for mode, data in app.stream(inputs, config, stream_mode=STREAM_MODES):
+        yield from translator.handle(mode, data)
+    yield translator.final_event()
+
+
+async def astream_graph(
+    app,
+    inputs: Dict[str, Any],
+    token_nodes: Optional[Iterable[str]] = None,
+    config: Optional[Dict[str, Any]] = None,
+    hidden_markers: Iterable[str] = ()
+) -> AsyncIterator[Dict[str, Any]]:
+    """Versión asíncrona de stream_graph (mismos argumentos y eventos)."""
+    translator = _GraphEventTranslator(token_nodes, hidden_markers)
+    async for mode, data in app.astream(inputs, config, stream_mode=STREAM_MODES):
+        for event in translator.handle(mode, data):
+            yield event
+    yield translator.final_event()
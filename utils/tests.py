@@ -0,0 +1,765 @@
+"""
+Tests para las utilidades compartidas (utils/)
+
+Estos tests verifican, sin red ni API keys:
+- La búsqueda local (BM25), su cache con TTL y la agrupación de consultas
+- La deduplicación de fuentes y el contexto con presupuesto de tokens
+- El marcado de prefijos cacheables
+- El muestreo y el árbol de runs del backend local de tracing
+- La lectura de logs por lotes y el grafo de subgrafos que la usa
+- El reparto de un fan-out de Send en oleadas
+- El structured output por lotes (con un modelo falso)
+- El plan DAG del orchestrator de notebooks/modulo_2/studio
+- Las métricas por nodo con memoria acotada y el cierre del logging asíncrono
+"""
+
+import importlib.util
+import json
+import re
+import threading
+import time
+from operator import add
+from pathlib import Path
+from typing import Annotated, List
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph, START, END
+from pydantic import BaseModel, ValidationError
+from typing_extensions import TypedDict
+
+from utils.batching import StructuredBatcher
+from utils.context_store import merge_sources, reference_list, render_context, to_source
+from utils.context_window import approximate_token_count
+from utils.fanout import SendScheduler
+from utils.langsmith_config import (
+    BackgroundMetadataWriter,
+    LangSmithConfig,
+    add_run_metadata,
+    get_default_config,
+    get_runnable_config,
+    set_default_config,
+    trace_agent,
+    trace_section,
+)
+from utils.local_trace_store import LocalTracer
+from utils.logging_config import GraphMetrics, setup_logger, shutdown_async_logging
+from utils.log_stream import END_OF_LOGS, iter_log_batches, read_log_batch
+from utils.prompt_cache import CacheablePrompt
+from utils.search import CachedSearchProvider, LocalCorpusProvider, SearchProvider
+from utils.tool_cache import ToolCache
+from utils.trace_sampling import SamplingPolicy
+
+
+STUDIO_DIR = Path(__file__).resolve().parent.parent / "notebooks" / "modulo_2" / "studio"
+
+
+def load_studio_module(name: str):
+    """Importa un grafo de notebooks/modulo_2/studio (no es un paquete)."""
+    spec = importlib.util.spec_from_file_location(f"studio_{name}", STUDIO_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# =============================================================================
+# TESTS DE BÚSQUEDA
+# =============================================================================
+
+class CountingProvider(SearchProvider):
+    """Proveedor que cuenta sus búsquedas y tarda ``delay`` segundos."""
+
+    name = "counting"
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(max_results=3)
+        self.delay = delay
+        self.calls = 0
+
+    def _search(self, query, max_results):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [Document(page_content=f"resultado para {query}", metadata={"source": "test"})]
+
+
+def test_local_corpus_ranks_by_bm25():
+    """
+    Test: El documento que menciona los términos raros de la consulta
+    queda primero, y los pasajes no superan el tamaño configurado
+    """
+    provider = LocalCorpusProvider([
+        Document(page_content="LangGraph permite ejecutar nodos en paralelo con Send", metadata={"source": "a"}),
+        Document(page_content="LangGraph es un framework de grafos", metadata={"source": "b"}),
+        Document(page_content="Recetas de cocina mexicana", metadata={"source": "c"}),
+    ])
+
+    results = provider.search("nodos en paralelo LangGraph", max_results=2)
+
+    assert [doc.metadata["source"] for doc in results] == ["a", "b"]
+    assert all(len(p.split()) <= 5 for p in LocalCorpusProvider.split_passages("uno dos tres\n\n" + "x " * 12, 5))
+
+
+def test_cached_search_expires_after_ttl(tmp_path):
+    """
+    Test: Una consulta repetida (con otro formato) sale de la cache hasta
+    que expira el TTL; la cache en disco usa un nombre de directorio válido
+    """
+    inner = CountingProvider()
+    provider = CachedSearchProvider(inner, ttl_seconds=0.2, cache=ToolCache(cache_dir=str(tmp_path)))
+
+    provider.search("LangGraph  patterns")
+    provider.search("langgraph patterns")
+    assert inner.calls == 1
+    assert (tmp_path / "search_counting").is_dir()
+
+    time.sleep(0.3)
+    provider.search("langgraph patterns")
+    assert inner.calls == 2
+
+
+def test_cached_search_coalesces_concurrent_queries():
+    """
+    Test: Consultas idénticas en vuelo se resuelven con una sola búsqueda
+    """
+    inner = CountingProvider(delay=0.2)
+    provider = CachedSearchProvider(inner)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(provider.search("LangGraph"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert inner.calls == 1
+    assert len(results) == 4
+    assert provider.stats()["coalesced"] == 3
+
+
+# =============================================================================
+# TESTS DEL CONTEXT STORE
+# =============================================================================
+
+def test_merge_sources_deduplicates_by_source_and_content():
+    """
+    Test: Una fuente repetida (misma URL con otro formato, o mismo
+    contenido con otra URL) no se añade dos veces
+    """
+    first = to_source(Document(page_content="LangGraph usa grafos", metadata={"source": "https://a.com/doc"}))
+    same_url = to_source(Document(page_content="Otro texto", metadata={"source": "https://A.com/doc/"}))
+    same_content = to_source(Document(page_content="langgraph  USA grafos", metadata={"source": "https://b.com"}))
+    new = to_source(Document(page_content="Send permite fan-out", metadata={"source": "https://c.com"}))
+
+    merged = merge_sources([first], [same_url, same_content, new])
+
+    assert [entry["source"] for entry in merged] == ["https://a.com/doc", "https://c.com"]
+    assert reference_list(merged) == "[1] https://a.com/doc\n[2] https://c.com"
+
+
+def test_render_context_respects_budget_and_truncates_long_passages():
+    """
+    Test: El contexto renderizado no supera el presupuesto, prioriza el
+    pasaje relevante y recorta un pasaje más grande que el presupuesto
+    """
+    long_passage = to_source(Document(page_content="paralelo " * 2000, metadata={"source": "largo.md"}))
+    unrelated = to_source(Document(page_content="recetas de cocina " * 50, metadata={"source": "cocina.md"}))
+
+    context = render_context([unrelated, long_passage], query="paralelo", max_tokens=300)
+
+    assert approximate_token_count(context) <= 300
+    assert 'source="largo.md"' in context
+    assert "paralelo …" in context
+
+
+# =============================================================================
+# TESTS DE PROMPT CACHING
+# =============================================================================
+
+def test_cache_control_only_marks_prefixes_above_the_minimum():
+    """
+    Test: cache_control solo se añade cuando el bloque estático alcanza el
+    prefijo mínimo cacheable; uno corto se envía como texto plano
+    """
+    class AnthropicLike:
+        _llm_type = "anthropic-chat"
+
+    short = CacheablePrompt(static="Instrucciones breves", dynamic="{query}")
+    long = CacheablePrompt(static="Instrucción fija. " * 400, dynamic="{query}")
+
+    assert not short.cacheable
+    assert isinstance(short.messages(AnthropicLike(), query="hola")[0].content, str)
+    assert long.cacheable
+    assert long.messages(AnthropicLike(), query="hola")[0].content[0]["cache_control"] == {"type": "ephemeral"}
+
+
+# =============================================================================
+# TESTS DE TRACING LOCAL
+# =============================================================================
+
+class TraceState(TypedDict):
+    value: str
+
+
+def traced_node(state: TraceState) -> dict:
+    add_run_metadata({"node": "traced_node"})
+    with trace_section("NodeSection"):
+        pass
+    return {"value": state["value"] + "!"}
+
+
+def build_traced_graph():
+    builder = StateGraph(TraceState)
+    builder.add_node("traced_node", traced_node)
+    builder.add_edge(START, "traced_node")
+    builder.add_edge("traced_node", END)
+    return builder.compile()
+
+
+@pytest.fixture
+def local_tracing(tmp_path):
+    """Backend local como configuración por defecto durante el test."""
+    previous = get_default_config()
+    config = LangSmithConfig(backend="local", local_store_path=str(tmp_path / "traces.db"))
+    set_default_config(config)
+    yield config
+    set_default_config(previous)
+    config.store.close()
+
+
+def test_sampled_out_trace_never_touches_the_store(local_tracing):
+    """
+    Test: Un trace descartado por el muestreo no escribe nada (ni los spans
+    de sus nodos); uno rescatado por una regla tail se guarda completo
+    """
+    store = local_tracing.store
+    app = build_traced_graph()
+
+    no_tail = SamplingPolicy(rate=0.0, keep_on_error=False, keep_output_flags=())
+    app.invoke({"value": "a"}, config={"callbacks": [LocalTracer(store, sampling=no_tail)]})
+    assert store.list_runs() == []
+    assert no_tail.stats()["dropped"] == 1
+    assert not store._pending_metadata
+
+    rescued = SamplingPolicy(rate=0.0, keep_if=lambda outputs: True)
+    app.invoke({"value": "b"}, config={"callbacks": [LocalTracer(store, sampling=rescued)]})
+    assert rescued.stats()["tail_kept"] == 1
+    root = store.list_runs(tag="tail_sampled")[0]
+    # Un span abierto en un nodo (sin trace_agent) hereda el trace del grafo
+    assert store.list_runs(name="NodeSection")[0]["trace_id"] == root["id"]
+
+
+def test_graph_inside_trace_agent_nests_under_the_agent_span(local_tracing):
+    """
+    Test: Un grafo invocado dentro de trace_agent cuelga del span del
+    agente, todo el árbol comparte trace_id, y la metadata y las secciones
+    abiertas en un nodo van al nodo (el run más interno)
+    """
+    store = local_tracing.store
+    app = build_traced_graph()
+
+    @trace_agent(name="OuterAgent")
+    def run_agent(value: str) -> dict:
+        return app.invoke({"value": value}, config=get_runnable_config())
+
+    run_agent("a")
+
+    agent = store.list_runs(name="OuterAgent")[0]
+    graph = store.list_runs(name="LangGraph")[0]
+    node = store.list_runs(name="traced_node")[0]
+    section = store.list_runs(name="NodeSection")[0]
+
+    assert agent["parent_run_id"] is None
+    assert graph["parent_run_id"] == agent["id"]
+    assert node["parent_run_id"] == graph["id"]
+    assert section["parent_run_id"] == node["id"]
+    assert {run["trace_id"] for run in store.list_runs()} == {agent["id"]}
+    assert node["metadata"].get("node") == "traced_node"
+    assert "node" not in (agent["metadata"] or {})
+
+
+def test_background_writer_updates_langsmith_runs_on_the_caller_thread(local_tracing):
+    """
+    Test: El writer en background no modifica un RunTree de LangSmith
+    desde su thread (el cliente lo serializa en paralelo): la
+    actualización se aplica en el thread que la envía
+    """
+    class FakeRunTree:
+        metadata = None
+        tags = None
+
+    run = FakeRunTree()
+    threads = []
+
+    def metadata_fn(value):
+        threads.append(threading.current_thread())
+        return {"value": value}
+
+    writer = BackgroundMetadataWriter(local_tracing, flush_interval=60)
+    try:
+        writer.submit(run, tags=["t"], metadata_fn=metadata_fn, args=(1,))
+        assert run.metadata == {"value": 1}
+        assert run.tags == ["t"]
+        assert threads == [threading.current_thread()]
+        assert writer.stats()["written"] == 1
+    finally:
+        writer.close()
+
+
+def test_metadata_of_untraced_graph_runs_is_not_kept_pending(local_tracing):
+    """
+    Test: Sin LocalTracer los runs del grafo nunca se registran, así que su
+    metadata se descarta en vez de quedar pendiente; y lo pendiente está
+    acotado
+    """
+    store = local_tracing.store
+    app = build_traced_graph()
+
+    for value in "abcde":
+        app.invoke({"value": value})
+    assert not store._pending_metadata
+    assert not store._pending_tags
+
+    store.max_pending = 3
+    for i in range(10):
+        store.add_metadata(f"future-{i}", {"i": i})
+        store.add_tags(f"future-{i}", ["later"])
+    assert list(store._pending_metadata) == ["future-7", "future-8", "future-9"]
+    assert len(store._pending_tags) == 3
+
+
+
+# =============================================================================
+# TESTS DE LOG STREAM
+# =============================================================================
+
+def make_logs(n: int) -> list:
+    # Cada tercer log tiene grade (un fallo evaluado)
+    return [
+        {"id": str(i), "question": f"q{i}", **({"grade": 1} if i % 3 == 0 else {})}
+        for i in range(n)
+    ]
+
+
+def test_read_log_batch_jsonl_offsets_resume_and_stop_at_exact_eof(tmp_path):
+    """
+    Test: Los offsets de un JSONL son bytes desde los que se puede
+    reanudar, y un lote que termina justo en el final del fichero ya
+    devuelve END_OF_LOGS (sin un paso extra vacío)
+    """
+    path = tmp_path / "logs.jsonl"
+    lines = [json.dumps(log) for log in make_logs(6)]
+    # Las líneas en blanco se ignoran
+    path.write_text("\n".join(lines[:3]) + "\n\n" + "\n".join(lines[3:]) + "\n")
+
+    batch, offset = read_log_batch(str(path), 0, batch_size=2)
+    assert batch.ids == ["0", "1"]
+    assert offset == len(lines[0]) + len(lines[1]) + 2
+
+    batch, offset = read_log_batch(str(path), offset, batch_size=2)
+    assert batch.ids == ["2", "3"]
+    batch, offset = read_log_batch(str(path), offset, batch_size=2)
+    assert batch.ids == ["4", "5"]
+    assert offset == END_OF_LOGS
+    assert len(read_log_batch(str(path), offset)[0]) == 0
+
+    # Sin salto de línea final también se detecta el final exacto
+    path.write_text("\n".join(lines[:4]))
+    assert [batch.ids for batch in iter_log_batches(str(path), batch_size=2)] == [["0", "1"], ["2", "3"]]
+
+
+def test_read_log_batch_list_source_and_clean_filter():
+    """Test: clean limpia o descarta logs sin alterar los offsets de la fuente"""
+    logs = make_logs(7)
+
+    def drop_odd(log):
+        return None if int(log["id"]) % 2 else {**log, "question": log["question"].upper()}
+
+    batch, offset = read_log_batch(logs, 0, batch_size=4, clean=drop_odd)
+    assert batch.ids == ["0", "2"]
+    assert batch.questions == ["Q0", "Q2"]
+    # El offset cuenta los logs leídos, no los que sobreviven a clean
+    assert offset == 4
+
+    batch, offset = read_log_batch(logs, offset, batch_size=4, clean=drop_odd)
+    assert batch.ids == ["4", "6"]
+    assert offset == END_OF_LOGS
+    assert batch.failure_ids() == ["6"]
+    assert list(batch.grades) == [0, 1]
+
+
+def test_sub_graphs_processes_more_batches_than_the_recursion_limit(monkeypatch):
+    """
+    Test: El grafo de subgrafos recorre fuentes con muchos más lotes que
+    el recursion_limit (25 pasos, el valor por defecto en LangGraph 0.x)
+    """
+    sub_graphs = load_studio_module("sub_graphs")
+    monkeypatch.setattr(sub_graphs, "LOG_BATCH_SIZE", 2)
+    logs = make_logs(200)
+
+    result = sub_graphs.graph.invoke({"raw_logs": logs}, {"recursion_limit": 25})
+
+    failures = [f"failure-analysis-on-log-{i}" for i in range(0, 200, 3)]
+    summaries = [f"summary-on-log-{i}" for i in range(200)]
+    assert sorted(result["processed_logs"]) == sorted(failures + summaries)
+    assert result["fa_summary"] and result["report"]
+
+
+# =============================================================================
+# TESTS DE FAN-OUT
+# =============================================================================
+
+def run_waves(scheduler: SendScheduler, state: dict) -> list:
+    """Simula el loop schedule → wave del grafo; devuelve los inputs de cada oleada."""
+    state = {**state, **scheduler.reset()}
+    waves = []
+    while True:
+        state.update(scheduler.schedule(state))
+        sends = scheduler.wave(state)
+        if not sends:
+            break
+        assert all(send.node == scheduler.node for send in sends)
+        waves.append([send.arg for send in sends])
+    assert scheduler.route(then="done")(state) == ["done"]
+    return waves
+
+
+def test_send_scheduler_slices_waves_in_priority_order():
+    """
+    Test: Las oleadas tienen como máximo max_concurrency Sends, la mayor
+    prioridad va primero y a igual prioridad se conserva el orden
+    """
+    items = [{"id": i, "priority": p} for i, p in enumerate([1, 5, 3, 5, 1, 2, 0])]
+    scheduler = SendScheduler(
+        node="work",
+        items_key="items",
+        make_input=lambda state, item: {"id": item["id"]},
+        cursor_key="cursor",
+        max_concurrency=3,
+        priority=lambda item: item["priority"],
+    )
+
+    waves = run_waves(scheduler, {"items": items})
+
+    assert [[arg["id"] for arg in wave] for wave in waves] == [[1, 3, 2], [5, 0, 4], [6]]
+
+
+def test_send_scheduler_counts_batches_as_units():
+    """
+    Test: Con batch_size cada Send lleva una lista de elementos y
+    max_concurrency limita los Sends (lotes), no los elementos
+    """
+    scheduler = SendScheduler(
+        node="work",
+        items_key="items",
+        make_input=lambda state, batch: {"batch": batch},
+        cursor_key="cursor",
+        max_concurrency=2,
+        batch_size=3,
+    )
+
+    waves = run_waves(scheduler, {"items": list(range(8))})
+
+    assert [[arg["batch"] for arg in wave] for wave in waves] == [[[0, 1, 2], [3, 4, 5]], [[6, 7]]]
+
+
+class WaveState(TypedDict):
+    items: List[int]
+    cursor: int
+    done: Annotated[List[int], add]
+    waves: Annotated[List[int], add]
+
+
+def test_send_scheduler_waves_run_as_separate_supersteps():
+    """
+    Test: En un grafo cada oleada es un superstep: el nodo de schedule ve
+    los resultados de la oleada anterior antes de lanzar la siguiente
+    """
+    scheduler = SendScheduler(
+        node="work",
+        items_key="items",
+        make_input=lambda state, item: {"item": item},
+        cursor_key="cursor",
+        max_concurrency=2,
+    )
+
+    def schedule(state):
+        # Resultados acumulados al reservar cada oleada
+        return {**scheduler.schedule(state), "waves": [len(state.get("done") or [])]}
+
+    builder = StateGraph(WaveState)
+    builder.add_node("start", lambda state: scheduler.reset())
+    builder.add_node("schedule", schedule)
+    builder.add_node("work", lambda arg: {"done": [arg["item"]]})
+    builder.add_edge(START, "start")
+    builder.add_edge("start", "schedule")
+    builder.add_conditional_edges("schedule", scheduler.route(then=END), ["work", END])
+    builder.add_edge("work", "schedule")
+
+    result = builder.compile().invoke({"items": list(range(5))})
+
+    assert sorted(result["done"]) == list(range(5))
+    assert result["waves"] == [0, 2, 4, 5]
+
+
+# =============================================================================
+# TESTS DE STRUCTURED OUTPUT POR LOTES
+# =============================================================================
+
+class Square(BaseModel):
+    value: int
+
+
+class FakeStructuredModel:
+    """
+    Modelo falso para StructuredBatcher: responde "task N" con N².
+
+    - Trunca (finish_reason "length") los lotes de más de ``max_tasks``
+    - Omite los elementos de ``missing`` y devuelve un valor inválido para
+      los de ``invalid`` (solo en lote; individualmente responde bien)
+    - Devuelve los elementos del lote en orden inverso
+    """
+
+    def __init__(self, max_tasks: int = 100, missing=(), invalid=()):
+        self.max_tasks = max_tasks
+        self.missing = set(missing)
+        self.invalid = set(invalid)
+        self.batches: List[List[int]] = []
+        self.singles: List[int] = []
+
+    def with_structured_output(self, schema, include_raw: bool = False):
+        model = self
+
+        class Structured:
+            def invoke(self, message):
+                if include_raw:
+                    return model._batch(schema, message)
+                n = int(re.search(r"task (\d+)", message).group(1))
+                model.singles.append(n)
+                return schema(value=n * n)
+
+        return Structured()
+
+    def _batch(self, schema, message):
+        tasks = [(int(i), int(n)) for i, n in re.findall(r"\[(\d+)\] task (\d+)", message)]
+        self.batches.append([n for _, n in tasks])
+        if len(tasks) > self.max_tasks:
+            raw = AIMessage(content="", response_metadata={"finish_reason": "length"})
+            return {"raw": raw, "parsed": None, "parsing_error": None}
+
+        items = [
+            {"index": i, "value": "?" if n in self.invalid else n * n}
+            for i, n in reversed(tasks) if n not in self.missing
+        ]
+        raw = AIMessage(content="", tool_calls=[{"name": "batch", "args": {"items": items}, "id": "call_0"}])
+        try:
+            return {"raw": raw, "parsed": schema.model_validate({"items": items}), "parsing_error": None}
+        except ValidationError as e:
+            return {"raw": raw, "parsed": None, "parsing_error": e}
+
+
+def test_structured_batcher_splits_truncated_batches_and_keeps_order():
+    """
+    Test: Un lote truncado se divide en mitades hasta que la respuesta
+    cabe, y los resultados quedan en el orden de los prompts aunque el
+    modelo los devuelva desordenados
+    """
+    model = FakeStructuredModel(max_tasks=3)
+    batcher = StructuredBatcher(model, Square, max_batch_size=8)
+
+    results = batcher.map([f"task {n}" for n in range(10)])
+
+    assert [r.value for r in results] == [n * n for n in range(10)]
+    # 8 → 4 + 4 (truncados) → 2 + 2 + 2 + 2; los 2 restantes van en su propio lote
+    assert model.batches[:3] == [list(range(8)), [0, 1, 2, 3], [0, 1]]
+    assert batcher.stats()["splits"] == 3
+    assert batcher.stats()["batch_calls"] == 8
+    assert model.singles == []
+
+
+def test_structured_batcher_retries_missing_and_invalid_items_one_by_one():
+    """
+    Test: Los elementos ausentes o que no validan se piden de nuevo uno a
+    uno sin repetir el lote; si un elemento nunca valida, map falla
+    """
+    model = FakeStructuredModel(missing={2}, invalid={5})
+    batcher = StructuredBatcher(model, Square, max_batch_size=10)
+
+    results = batcher.map([f"task {n}" for n in range(7)])
+
+    assert [r.value for r in results] == [n * n for n in range(7)]
+    assert len(model.batches) == 1
+    assert sorted(model.singles) == [2, 5]
+    assert batcher.stats()["retries"] == 2
+
+    class NeverValid(FakeStructuredModel):
+        def with_structured_output(self, schema, include_raw: bool = False):
+            structured = super().with_structured_output(schema, include_raw)
+            if include_raw:
+                return structured
+
+            class Empty:
+                def invoke(self, message):
+                    structured.invoke(message)
+                    return None
+
+            return Empty()
+
+    failing = StructuredBatcher(NeverValid(missing={1}), Square, max_batch_size=10, max_retries=2)
+    with pytest.raises(ValueError):
+        failing.map(["task 0", "task 1"])
+    assert failing.llm.singles == [1, 1, 1]
+
+
+# =============================================================================
+# TESTS DEL ORCHESTRATOR EN MODO DAG
+# =============================================================================
+
+@pytest.fixture
+def orchestrator(monkeypatch):
+    """Módulo orchestrator_workers de Studio (el LLM no se llama)."""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    return load_studio_module("orchestrator_workers")
+
+
+def test_normalize_plan_sorts_dependencies_and_drops_invalid_tasks(orchestrator):
+    """
+    Test: El plan se ordena topológicamente (una tarea puede depender de
+    otra listada después), los ids llevan la versión del plan, y se
+    descartan duplicados, dependencias desconocidas y ciclos
+    """
+    Task = orchestrator.PlannedTask
+    tasks = [
+        Task(id="t1", worker="analyze_worker", instruction="analizar", depends_on=["t2", "t9"]),
+        Task(id="t2", worker="search_worker", instruction="buscar"),
+        Task(id="t2", worker="calculate_worker", instruction="copia"),
+        Task(id="t3", worker="calculate_worker", instruction="calcular", depends_on=["t1", "t2"]),
+        Task(id="c1", worker="search_worker", instruction="ciclo", depends_on=["c2"]),
+        Task(id="c2", worker="search_worker", instruction="ciclo", depends_on=["c1"]),
+        Task(id="c3", worker="search_worker", instruction="tras el ciclo", depends_on=["c1"]),
+    ]
+
+    plan = orchestrator.normalize_plan(tasks, version=1)
+
+    assert [task["id"] for task in plan] == ["p1.t2", "p1.t1", "p1.t3"]
+    assert plan[0]["worker"] == "search_worker"
+    assert plan[1]["depends_on"] == ["p1.t2"]
+    assert plan[2]["depends_on"] == ["p1.t1", "p1.t2"]
+
+
+def test_dispatch_skips_dependents_of_invalidated_tasks_after_max_replans(orchestrator):
+    """
+    Test: Sin re-planificaciones disponibles, una tarea cuya dependencia
+    devolvió REPLAN: no se lanza; las demás sí
+    """
+    tasks = [
+        {"id": "p2.a", "worker": "search_worker", "instruction": "a", "depends_on": []},
+        {"id": "p2.b", "worker": "search_worker", "instruction": "b", "depends_on": []},
+        {"id": "p2.c", "worker": "analyze_worker", "instruction": "c", "depends_on": ["p2.a"]},
+        {"id": "p2.d", "worker": "analyze_worker", "instruction": "d", "depends_on": ["p2.b"]},
+        {"id": "p2.e", "worker": "calculate_worker", "instruction": "e", "depends_on": ["p2.c"]},
+    ]
+    state = {
+        "query": "q",
+        "tasks": tasks,
+        "replans": orchestrator.MAX_REPLANS,
+        "task_results": {"p2.a": "REPLAN: premisa falsa", "p2.b": "[SEARCH] ok"},
+    }
+
+    sends = orchestrator.dispatch_tasks(state)
+    assert [send.arg["task"]["id"] for send in sends] == ["p2.d"]
+    assert sends[0].arg["context"] == ["[SEARCH] ok"]
+
+    state["task_results"]["p2.d"] = "[ANALYZE] ok"
+    assert orchestrator.dispatch_tasks(state) == "synthesize"
+
+    # Con re-planificaciones disponibles, el plan invalidado vuelve al planner
+    assert orchestrator.dispatch_tasks({**state, "replans": 0}) == "planner"
+
+
+def test_replan_prompt_only_includes_invalidations_of_the_current_plan(orchestrator, monkeypatch):
+    """Test: Al re-planificar solo se envían los motivos del plan actual"""
+    prompts = []
+
+    class PlannerLLM:
+        def with_structured_output(self, schema):
+            class Structured:
+                def invoke(self, prompt):
+                    prompts.append(prompt)
+                    return schema(tasks=[])
+            return Structured()
+
+    monkeypatch.setattr(orchestrator, "llm", PlannerLLM())
+    state = {
+        "query": "q",
+        "replans": 1,
+        "tasks": [{"id": "p1.a", "worker": "search_worker", "instruction": "a", "depends_on": []}],
+        "task_results": {
+            "p0.a": "REPLAN: motivo antiguo",
+            "p0.b": "[SEARCH] resultado",
+            "p1.a": "REPLAN: motivo actual",
+        },
+    }
+
+    update = orchestrator.dag_planner(state)
+
+    assert "PLAN INVALIDADO: REPLAN: motivo actual" in prompts[0]
+    assert "motivo antiguo" not in prompts[0]
+    assert "[SEARCH] resultado" in prompts[0]
+    assert update["replans"] == 2
+
+
+# =============================================================================
+# TESTS DE MÉTRICAS
+# =============================================================================
+
+def test_graph_metrics_keep_bounded_samples_and_exact_totals():
+    """
+    Test: Las duraciones guardadas para los percentiles están acotadas,
+    mientras que conteo, media, máximo y delta medio cubren todo
+    """
+    metrics = GraphMetrics(max_samples=100)
+    for i in range(1000):
+        metrics.record_node("node", duration_ms=float(i), delta_size=2)
+
+    summary = metrics.summary()["node"]
+
+    assert len(metrics._nodes["node"].durations_ms) == 100
+    assert summary["count"] == 1000
+    assert summary["mean_ms"] == pytest.approx(499.5)
+    assert summary["max_ms"] == 999.0
+    assert summary["avg_delta_size"] == 2
+    # Percentiles de las últimas 100 ejecuciones (900..999)
+    assert summary["p50_ms"] == 949.0
+
+
+def test_async_logger_writes_directly_after_shutdown(tmp_path):
+    """
+    Test: Tras shutdown_async_logging el logger ya no encola (con
+    overflow="block" y la cola llena se colgaría) y escribe en el archivo
+    """
+    log_file = tmp_path / "async.log"
+    logger = setup_logger(
+        "utils.tests.async_shutdown", log_file=log_file,
+        async_logging=True, queue_size=1, overflow="block"
+    )
+    try:
+        logger.info("antes")
+        shutdown_async_logging()
+
+        writer = threading.Thread(target=lambda: [logger.info("después %d", i) for i in range(5)], daemon=True)
+        writer.start()
+        writer.join(timeout=5)
+        assert not writer.is_alive()
+
+        lines = log_file.read_text().splitlines()
+        assert "antes" in lines[0]
+        assert "después 4" in lines[-1]
+        assert len(lines) == 6
+    finally:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,240 @@
+"""
+Tool Result Cache
+
+Memoiza los resultados de herramientas que un agente vuelve a llamar con
+los mismos argumentos (entre vueltas del loop y entre ejecuciones).
+Cada herramienta declara su política:
+
+- ``pure=True``: el resultado depende solo de los argumentos; no expira.
+- ``ttl_seconds=N``: el resultado es válido durante N segundos (p. ej.
+  búsquedas sobre datos que cambian).
+
+La cache es compartida por todo el proceso y, si está definida
+TOOL_CACHE_DIR, también se persiste en disco (un JSON por resultado).
+Los aciertos y fallos se emiten como evento ``tool_cache`` y aparecen
+por nodo en GraphMetrics (ver instrument_graph).
+
+Ejemplo:
+    >>> @tool
+    ... @cached_tool(pure=True)
+    ... def search_knowledge(query: str) -> str:
+    ...     \"\"\"Busca en la base de conocimiento.\"\"\"
+    ...     ...
+"""
+
+import contextlib
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Tuple
+
+from langchain_core.callbacks.manager import dispatch_custom_event
+
+
+TOOL_CACHE_EVENT = "tool_cache"
+
+# Centinela que devuelve ToolCache.get cuando no hay valor cacheado
+MISSING = object()
+
+
+def tool_cache_dir() -> Optional[str]:
+    """
+    Directorio de la cache en disco, o None.
+
+    Los resultados solo se persisten si está definida TOOL_CACHE_DIR; sin
+    ella la cache vive únicamente en memoria.
+    """
+    return os.getenv("TOOL_CACHE_DIR") or None
+
+
+class ToolCache:
+    """
+    Cache LRU de resultados de herramientas, con TTL por entrada y
+    persistencia opcional en disco. Es thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 10000, cache_dir: Optional[str] = None):
+        """
+        Args:
+            max_entries: Entradas máximas en memoria (se descartan las menos usadas)
+            cache_dir: Directorio para persistir los resultados (None = solo memoria)
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+
+        self._lock = threading.Lock()
+        # clave -> (expira_en | None, valor)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[float], Any]]" = OrderedDict()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(args: Dict[str, Any]) -> str:
+        """Hash estable de los argumentos (independiente del orden)."""
+        payload = json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, tool_name: str, key: str) -> str:
+        return os.path.join(self.cache_dir, tool_name, f"{key}.json")
+
+    def _count(self, tool_name: str, outcome: str):
+        counts = self._counts.setdefault(tool_name, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    def _read_disk(self, tool_name: str, key: str) -> Any:
+        try:
+            with open(self._path(tool_name, key), encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return MISSING
+        return record
+
+    def _write_disk(self, tool_name: str, key: str, expires_at: Optional[float], value: Any):
+        path = self._path(tool_name, key)
+        try:
+            payload = json.dumps({"expires_at": expires_at, "value": value}, ensure_ascii=False)
+        except (TypeError, ValueError):
+            # Valores no serializables solo se cachean en memoria
+            return
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Directorio de solo lectura, disco lleno o TOOL_CACHE_DIR inválido:
+            # el resultado ya está en memoria y la herramienta no debe fallar
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
+    def get(self, tool_name: str, key: str) -> Any:
+        """Valor cacheado o ``MISSING``; registra el acierto o fallo."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((tool_name, key))
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end((tool_name, key))
+                    self._count(tool_name, "hits")
+                    return value
+                del self._entries[(tool_name, key)]
+
+        if self.cache_dir:
+            record = self._read_disk(tool_name, key)
+            if record is not MISSING:
+                expires_at = record.get("expires_at")
+                if expires_at is None or expires_at > now:
+                    with self._lock:
+                        self._remember(tool_name, key, expires_at, record["value"])
+                        self._count(tool_name, "hits")
+                    return record["value"]
+
+        with self._lock:
+            self._count(tool_name, "misses")
+        return MISSING
+
+    def _remember(self, tool_name: str, key: str, expires_at: Optional[float], value: Any):
+        self._entries[(tool_name, key)] = (expires_at, value)
+        self._entries.move_to_end((tool_name, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, tool_name: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        """Guarda un resultado (``ttl_seconds=None`` = no expira)."""
+        expires_at = time.time() + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            self._remember(tool_name, key, expires_at, value)
+        if self.cache_dir:
+            self._write_disk(tool_name, key, expires_at, value)
+
+    def clear(self, tool_name: Optional[str] = None):
+        """Vacía la cache en memoria de una herramienta (o de todas)."""
+        with self._lock:
+            if tool_name is None:
+                self._entries.clear()
+            else:
+                for entry_key in [k for k in self._entries if k[0] == tool_name]:
+                    del self._entries[entry_key]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Aciertos, fallos y tasa de aciertos por herramienta."""
+        with self._lock:
+            result = {}
+            for tool_name, counts in self._counts.items():
+                lookups = counts["hits"] + counts["misses"]
+                result[tool_name] = {
+                    **counts,
+                    "entries": sum(1 for k in self._entries if k[0] == tool_name),
+                    "hit_rate": counts["hits"] / lookups if lookups else 0.0
+                }
+            return result
+
+
+# Cache compartida por todas las herramientas del proceso
+default_tool_cache = ToolCache(cache_dir=tool_cache_dir())
+
+
+def _emit(tool_name: str, hit: bool):
+    """Avisa a los callbacks (p. ej. GraphInstrumentationHandler)."""
+    try:
+        dispatch_custom_event(TOOL_CACHE_EVENT, {"tool": tool_name, "hit": hit})
+    except RuntimeError:
+        # Llamada directa a la función, fuera de un run de LangChain
+        pass
+
+
+def cached_tool(
+    pure: bool = False,
+    ttl_seconds: Optional[float] = None,
+    cache: Optional[ToolCache] = None,
+    name: Optional[str] = None,
+    version: str = "1"
+) -> Callable:
+    """
+    Declara una función de herramienta como cacheable.
+
+    Se aplica debajo de ``@tool`` para que la herramienta conserve el
+    nombre, la firma y el docstring originales.
+
+    Args:
+        pure: El resultado depende solo de los argumentos (no expira)
+        ttl_seconds: Validez de un resultado (obligatorio si no es pura)
+        cache: Cache a usar (por defecto la compartida del proceso)
+        name: Nombre en la cache (por defecto el de la función)
+        version: Cambiarla invalida los resultados persistidos en disco
+                 cuando cambia la implementación de la herramienta
+    """
+    if not pure and ttl_seconds is None:
+        raise ValueError("Una herramienta no pura necesita ttl_seconds")
+
+    def decorator(func: Callable) -> Callable:
+        tool_name = name or func.__name__
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target = cache if cache is not None else default_tool_cache
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = target.make_key({"__version__": version, **bound.arguments})
+
+            value = target.get(tool_name, key)
+            if value is not MISSING:
+                _emit(tool_name, hit=True)
+                return value
+
+            _emit(tool_name, hit=False)
+            value = func(*args, **kwargs)
+            target.set(tool_name, key, value, ttl_seconds=ttl_seconds)
+            return value
+
+        wrapper.cache_policy = {"pure": pure, "ttl_seconds": ttl_seconds, "version": version}
+        return wrapper
+
+    return decorator
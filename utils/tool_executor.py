@@ -0,0 +1,175 @@
+"""
+Tool Executor
+
+Ejecuta en paralelo las tool calls que un modelo pide en un mismo turno.
+Cuando el modelo solicita varias búsquedas a la vez, la latencia del
+turno pasa a ser la de la herramienta más lenta y no la suma de todas.
+
+- El índice nombre → herramienta se construye una sola vez.
+- Cada herramienta puede tener su propio timeout, contado desde que la
+  herramienta empieza a ejecutarse (no desde que espera un hilo libre).
+- Un hilo no se puede interrumpir: la herramienta que excede su timeout
+  sigue corriendo en segundo plano, pero devuelve su hueco y no bloquea
+  las llamadas siguientes.
+- Los resultados se devuelven como ToolMessages en el mismo orden que
+  las tool calls, con status="error" si la herramienta falló, no existe
+  o excedió su timeout.
+- Cada hilo copia el contexto del nodo, así que callbacks y tracing de
+  LangGraph/LangSmith siguen atribuyendo las herramientas a ese nodo.
+
+Ejemplo:
+    >>> executor = ToolExecutor(tools, timeouts={"search_web": 10.0})
+    >>> tool_messages = executor.execute(response.tool_calls)
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Optional, Dict, Any, List, Sequence
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+
+
+class _ToolRun:
+    """Una tool call en curso y su resultado."""
+
+    def __init__(self, tool: BaseTool, args: Any):
+        self.tool = tool
+        self.args = args
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.start_time: Optional[float] = None
+        self.output: Any = None
+        self.error: Optional[Exception] = None
+        # El hueco del ejecutor se libera una sola vez: al terminar o al expirar
+        self.slot_held = False
+        self.lock = threading.Lock()
+
+
+class ToolExecutor:
+    """Ejecutor concurrente de tool calls con timeouts por herramienta."""
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        max_workers: int = 8,
+        default_timeout: Optional[float] = 30.0,
+        timeouts: Optional[Dict[str, float]] = None
+    ):
+        """
+        Args:
+            tools: Herramientas disponibles
+            max_workers: Herramientas ejecutándose a la vez como máximo
+            default_timeout: Timeout en segundos (None = sin límite)
+            timeouts: Timeouts específicos por nombre de herramienta
+        """
+        self.tools_by_name: Dict[str, BaseTool] = {tool.name: tool for tool in tools}
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self._slots = threading.Semaphore(max_workers)
+
+    def timeout_for(self, tool_name: str) -> Optional[float]:
+        return self.timeouts.get(tool_name, self.default_timeout)
+
+    @staticmethod
+    def _message(tool_call: Dict[str, Any], content: Any, error: bool = False) -> ToolMessage:
+        return ToolMessage(
+            content=str(content),
+            name=tool_call["name"],
+            tool_call_id=tool_call.get("id") or "",
+            status="error" if error else "success"
+        )
+
+    def _release(self, run: _ToolRun):
+        with run.lock:
+            if run.slot_held:
+                run.slot_held = False
+                self._slots.release()
+
+    def _work(self, run: _ToolRun):
+        self._slots.acquire()
+        with run.lock:
+            run.slot_held = True
+        # El timeout cuenta desde aquí, no desde que la llamada entró en cola
+        run.start_time = time.monotonic()
+        run.started.set()
+        try:
+            run.output = run.tool.invoke(run.args)
+        except Exception as e:
+            run.error = e
+        finally:
+            self._release(run)
+            run.done.set()
+
+    def execute(self, tool_calls: Sequence[Dict[str, Any]]) -> List[ToolMessage]:
+        """
+        Ejecuta las tool calls concurrentemente (como mucho ``max_workers``
+        a la vez).
+
+        Returns:
+            Un ToolMessage por tool call, en el mismo orden
+        """
+        runs: List[Optional[_ToolRun]] = []
+        for tool_call in tool_calls:
+            tool = self.tools_by_name.get(tool_call["name"])
+            if tool is None:
+                runs.append(None)
+                continue
+            run = _ToolRun(tool, tool_call["args"])
+            # Cada hilo copia el contexto del nodo (callbacks, tracing)
+            context = contextvars.copy_context()
+            threading.Thread(target=context.run, args=(self._work, run), name="tool", daemon=True).start()
+            runs.append(run)
+
+        results = []
+        for tool_call, run in zip(tool_calls, runs):
+            name = tool_call["name"]
+            if run is None:
+                results.append(self._message(tool_call, f"Error: herramienta desconocida '{name}'", error=True))
+                continue
+
+            timeout = self.timeout_for(name)
+            run.started.wait()
+            remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - run.start_time))
+            if not run.done.wait(remaining):
+                # El hilo no se puede interrumpir: se ignora su resultado y se libera su hueco
+                self._release(run)
+                results.append(self._message(
+                    tool_call, f"Error: '{name}' excedió el timeout de {timeout:.1f}s", error=True
+                ))
+            elif run.error is not None:
+                results.append(self._message(tool_call, f"Error en '{name}': {run.error}", error=True))
+            else:
+                results.append(self._message(tool_call, run.output))
+
+        return results
+
+    async def aexecute(self, tool_calls: Sequence[Dict[str, Any]]) -> List[ToolMessage]:
+        """Versión asíncrona: usa ``tool.ainvoke`` y asyncio.gather."""
+
+        async def run(tool_call: Dict[str, Any]) -> ToolMessage:
+            name = tool_call["name"]
+            tool = self.tools_by_name.get(name)
+            if tool is None:
+                return self._message(tool_call, f"Error: herramienta desconocida '{name}'", error=True)
+
+            timeout = self.timeout_for(name)
+            try:
+                output = await asyncio.wait_for(tool.ainvoke(tool_call["args"]), timeout)
+                return self._message(tool_call, output)
+            except asyncio.TimeoutError:
+                return self._message(
+                    tool_call, f"Error: '{name}' excedió el timeout de {timeout:.1f}s", error=True
+                )
+            except Exception as e:
+                return self._message(tool_call, f"Error en '{name}': {e}", error=True)
+
+        return list(await asyncio.gather(*(run(tool_call) for tool_call in tool_calls)))
+
+    def shutdown(self, wait: bool = False):
+        """
+        Sin pool que liberar: cada llamada usa su propio hilo daemon. Se
+        conserva por compatibilidad.
+        """
@@ -0,0 +1,141 @@
+"""
+Trace Sampling
+
+Políticas de muestreo para no trazar el 100% del tráfico en producción.
+
+- Head-based: se decide al iniciar el run raíz (tasa fija o por tag).
+- Tail-based: al terminar el run raíz se conserva siempre si fue lento,
+  falló o su salida tiene una bandera como ``should_escalate``.
+
+La decisión se toma una sola vez por run raíz y se guarda en un
+ContextVar, así que los spans hijos (trace_section, trace_agent anidados)
+la heredan.
+"""
+
+import random
+import threading
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Callable, Iterable
+
+
+class SamplingPolicy:
+    """
+    Política de muestreo de traces.
+
+    Ejemplo:
+        >>> policy = SamplingPolicy(
+        ...     rate=0.05,                          # 5% del tráfico normal
+        ...     tag_rates={"vip": 1.0, "debug": 1.0},
+        ...     keep_latency_ms=5000,               # siempre conservar runs lentos
+        ...     keep_output_flags=["should_escalate"]
+        ... )
+        >>> config = LangSmithConfig(sampling=policy)
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        tag_rates: Optional[Dict[str, float]] = None,
+        keep_latency_ms: Optional[float] = None,
+        keep_on_error: bool = True,
+        keep_output_flags: Iterable[str] = ("should_escalate",),
+        keep_if: Optional[Callable[[Any], bool]] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            rate: Fracción de runs raíz trazados (0-1)
+            tag_rates: Tasas por tag; si un run tiene varios tags se usa la mayor
+            keep_latency_ms: Conservar siempre runs más lentos que este umbral
+            keep_on_error: Conservar siempre runs que terminaron con error
+            keep_output_flags: Claves de la salida que, si son verdaderas,
+                               obligan a conservar el run
+            keep_if: Predicado adicional sobre la salida del run raíz
+            seed: Semilla para decisiones reproducibles
+        """
+        for value in [rate, *(tag_rates or {}).values()]:
+            if not 0.0 <= value <= 1.0:
+                raise ValueError(f"Las tasas de muestreo deben estar entre 0 y 1 (recibido {value})")
+
+        self.rate = rate
+        self.tag_rates = dict(tag_rates or {})
+        self.keep_latency_ms = keep_latency_ms
+        self.keep_on_error = keep_on_error
+        self.keep_output_flags = list(keep_output_flags)
+        self.keep_if = keep_if
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counts = {"head_kept": 0, "tail_kept": 0, "dropped": 0}
+
+    @property
+    def has_tail_rules(self) -> bool:
+        """True si alguna regla tail-based puede rescatar un run no muestreado."""
+        return bool(
+            self.keep_latency_ms is not None
+            or self.keep_on_error
+            or self.keep_output_flags
+            or self.keep_if
+        )
+
+    def rate_for(self, tags: Optional[List[str]] = None) -> float:
+        """Tasa aplicable a un run con estos tags."""
+        matching = [self.tag_rates[tag] for tag in (tags or []) if tag in self.tag_rates]
+        return max(matching) if matching else self.rate
+
+    def sample_head(self, tags: Optional[List[str]] = None) -> bool:
+        """Decisión head-based para un run raíz."""
+        rate = self.rate_for(tags)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def tail_keep(
+        self,
+        latency_ms: Optional[float],
+        error: Optional[str],
+        outputs: Any
+    ) -> bool:
+        """Decisión tail-based al terminar un run raíz no muestreado."""
+        if self.keep_on_error and error:
+            return True
+        if (
+            self.keep_latency_ms is not None
+            and latency_ms is not None
+            and latency_ms > self.keep_latency_ms
+        ):
+            return True
+        if isinstance(outputs, dict) and any(outputs.get(flag) for flag in self.keep_output_flags):
+            return True
+        if self.keep_if is not None:
+            try:
+                return bool(self.keep_if(outputs))
+            except Exception:
+                return False
+        return False
+
+    def record(self, outcome: str):
+        """Cuenta un resultado: "head_kept", "tail_kept" o "dropped"."""
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de decisiones tomadas."""
+        with self._lock:
+            return dict(self._counts)
+
+
+class SamplingState:
+    """Decisión de muestreo del run raíz en curso."""
+
+    def __init__(self, sampled: bool):
+        self.sampled = sampled
+        # Salida del run raíz, usada por las reglas tail-based
+        self.outputs: Any = None
+
+
+current_sampling_state: ContextVar[Optional[SamplingState]] = ContextVar(
+    "current_sampling_state", default=None
+)